@@ -0,0 +1,52 @@
+"""Compare `util.sigfigs` with the previous element-wise implementation.
+
+Run with::
+
+    python benchmarks/bench_sigfigs.py
+"""
+
+import timeit
+
+import numpy
+import pandas
+
+from swmmnetwork.util import sigfigs
+
+
+def sigfigs_loop(x, n):
+    # the implementation prior to vectorization, kept for reference
+    if isinstance(x, numpy.ndarray):
+        tmp = numpy.floor(numpy.log10(numpy.abs(x), where=(x != 0)))
+        tmp[~numpy.isfinite(tmp)] = 0
+        rnd = n - tmp - 1
+        return numpy.array(list(map(numpy.around, x, rnd.astype(int))))
+    if isinstance(x, pandas.Series):
+        return pandas.Series(data=sigfigs_loop(x.values, n), index=x.index,
+                             name=x.name)
+    if isinstance(x, pandas.DataFrame):
+        out = []
+        nums = x.select_dtypes(include=numpy.number).copy()
+        others = x.select_dtypes(exclude=numpy.number).copy()
+        for c in nums:
+            out.append(sigfigs_loop(nums[c], n))
+        out.append(others)
+        df = pandas.concat(out, axis=1)
+        return df.reindex(x.columns, axis=1)
+
+
+def main(rows=100000, cols=10, number=3):
+    rs = numpy.random.RandomState(0)
+    df = pandas.DataFrame(rs.lognormal(0, 5, size=(rows, cols)),
+                          columns=['c{}'.format(i) for i in range(cols)])
+    df['id'] = ['node-{}'.format(i) for i in range(rows)]
+
+    pandas.testing.assert_frame_equal(sigfigs(df, 3), sigfigs_loop(df, 3))
+
+    for name, fxn in [('loop', sigfigs_loop), ('vectorized', sigfigs)]:
+        t = min(timeit.repeat(lambda: fxn(df, 3), number=number, repeat=3))
+        print('{:>10}: {:8.4f} s per DataFrame of {} values'.format(
+            name, t / number, rows * cols))
+
+
+if __name__ == '__main__':
+    main()
@@ -54,6 +54,12 @@ setup(
     package_data=package_data,
     include_package_data=True,
     install_requires=requirements,
+    entry_points={
+        'console_scripts': [
+            'swmmnetwork=swmmnetwork.cli:main',
+            'swmmnetwork-serve=swmmnetwork.server:main',
+        ],
+    },
     license="BSD license",
     zip_safe=False,
     keywords='swmmnetwork',
@@ -14,5 +14,7 @@ from .convert import (
     pandas_edgelist_to_edgelist,
     pandas_node_attrs_from_swmm_inp,
 )
-from .scenario import Scenario
+from .scenario import Scenario, MultiEventScenario
+from .compiled import CompiledNetwork
+from .parallel import run_scenarios
 from .tests import test
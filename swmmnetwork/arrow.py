@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""Export of solved results to Apache Arrow and Parquet.
+
+Requires pyarrow.
+"""
+
+import numpy
+
+from .cache import _column_array
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pyarrow = None
+    pq = None
+
+
+def _require_pyarrow():
+    if pyarrow is None:  # pragma: no cover
+        e = 'Exporting to arrow or parquet requires pyarrow.'
+        raise ImportError(e)
+
+
+def _arrow_column(values):
+    """a typed arrow array of one attribute column. Missing values are
+    nulls, and columns of mixed types are stored as strings.
+    """
+    packed = _column_array(values)
+    if packed is None:
+        values = [None if v is None else str(v) for v in values]
+        return pyarrow.array(values, type=pyarrow.string())
+    arr, present = packed
+    mask = None if present.all() else ~present
+    return pyarrow.array(arr, mask=mask)
+
+
+def _attr_table(names, records, columns=None):
+    if columns is None:
+        columns = sorted(set([k for r in records for k in r]))
+    arrays = [pyarrow.array(names, type=pyarrow.string())]
+    arrays += [_arrow_column([r.get(c) for r in records]) for c in columns]
+    return arrays, list(columns)
+
+
+def graph_table(G, kind='node', columns=None):
+    """the node or edge attributes of a solved graph as an arrow table.
+
+    Each attribute is one typed column; missing values are nulls rather
+    than NaN coerced object columns.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+    kind : {'node', 'edge'}, optional (default='node')
+    columns : list, optional (default=None)
+        the attributes to export. Defaults to all of them.
+
+    Returns
+    -------
+    pyarrow.Table
+        with a 'node' column, or 'from', 'to' and 'key' columns for edges,
+        holding the names as strings.
+    """
+    _require_pyarrow()
+
+    if kind == 'node':
+        nodes = list(G.nodes())
+        arrays, names = _attr_table(
+            [str(n) for n in nodes], [G.node[n] for n in nodes],
+            columns=columns)
+        return pyarrow.Table.from_arrays(arrays, names=['node'] + names)
+
+    elif kind == 'edge':
+        edges = list(G.edges(keys=True, data=True))
+        arrays, names = _attr_table(
+            [str(e[0]) for e in edges], [e[3] for e in edges],
+            columns=columns)
+        arrays[1:1] = [
+            pyarrow.array([str(e[1]) for e in edges], type=pyarrow.string()),
+            pyarrow.array([str(e[2]) for e in edges], type=pyarrow.string()),
+        ]
+        return pyarrow.Table.from_arrays(
+            arrays, names=['from', 'to', 'key'] + names)
+
+    raise ValueError("`kind` must be one of 'node' or 'edge'.")
+
+
+RESULT_ATTRS = ['node_load_in', 'node_load_eff']
+
+
+def _default_attrs(result, attrs, edges):
+    if attrs is None:
+        attrs = ['edge_load_eff'] if edges else RESULT_ATTRS
+        # e.g., results that were not kept by the solve
+        attrs = [a for a in attrs if getattr(result, a) is not None]
+    return attrs
+
+
+def _batch_schema(result, attrs, edges):
+    fields = [
+        pyarrow.field('scenario', pyarrow.string()),
+        pyarrow.field('edge' if edges else 'node', pyarrow.string()),
+    ]
+    if not edges:
+        fields.append(pyarrow.field(
+            'volume_in', pyarrow.from_numpy_dtype(result.node_vol_in.dtype)))
+    fields += [
+        pyarrow.field('{}_{}'.format(c, attr.split('_', 1)[1]),
+                      pyarrow.from_numpy_dtype(getattr(result, attr).dtype))
+        for attr in attrs for c in result.network.load_cols
+    ]
+    return pyarrow.schema(fields)
+
+
+def record_batches(result, attrs=None, edges=False):
+    """one arrow record batch per scenario of a `compiled.BatchResult`.
+
+    The columns are taken from the result arrays of each scenario; only
+    the slice of one scenario is held in arrow memory at a time.
+
+    Parameters
+    ----------
+    result : compiled.BatchResult
+    attrs : list, optional (default=None)
+        the node results to export, e.g., 'node_load_eff'. Defaults to
+        the kept results of `RESULT_ATTRS`, or to ['edge_load_eff'] if
+        `edges` is True.
+    edges : bool, optional (default=False)
+        export edge rather than node results.
+
+    Yields
+    ------
+    pyarrow.RecordBatch
+        with 'scenario' and 'node' (or 'edge') columns, the node
+        'volume_in', and a '<pollutant>_<result>' column per pollutant and
+        result, e.g., 'TSS_load_eff'.
+    """
+    _require_pyarrow()
+
+    network = result.network
+    attrs = _default_attrs(result, attrs, edges)
+    if edges:
+        if result.edge_load_eff is None:
+            raise ValueError('The result has no edge loads.')
+        names = [str(e) for e in network.edge_ids]
+    else:
+        names = [str(n) for n in result.nodes]
+
+    schema = _batch_schema(result, attrs, edges)
+    name_col = pyarrow.array(names, type=pyarrow.string())
+    for s, scenario in enumerate(result.scenarios):
+        arrays = [
+            pyarrow.array([str(scenario)] * len(names),
+                          type=pyarrow.string()),
+            name_col,
+        ]
+        if not edges:
+            arrays.append(pyarrow.array(result.node_vol_in[s]))
+        for attr in attrs:
+            # one contiguous copy of the scenario so that every pollutant
+            # column is a zero copy view
+            values = numpy.ascontiguousarray(getattr(result, attr)[s].T)
+            arrays += [pyarrow.array(v) for v in values]
+        yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def batch_table(result, attrs=None, edges=False):
+    """the results of every scenario as one arrow table. See
+    `record_batches`.
+    """
+    _require_pyarrow()
+    schema = _batch_schema(
+        result, _default_attrs(result, attrs, edges), edges)
+    return pyarrow.Table.from_batches(
+        list(record_batches(result, attrs=attrs, edges=edges)),
+        schema=schema)
+
+
+def write_parquet(obj, path, kind='node', **kwargs):
+    """write solved results to a parquet file.
+
+    Parameters
+    ----------
+    obj : networkx.MultiDiGraph or compiled.BatchResult
+        a solved graph, or a batch of scenarios, which is streamed to the
+        file one row group per scenario.
+    path : string
+    kind : {'node', 'edge'}, optional (default='node')
+    **kwargs
+        passed to `graph_table` or `record_batches`, e.g., `columns` or
+        `attrs`.
+    """
+    _require_pyarrow()
+
+    from .compiled import BatchResult
+
+    if not isinstance(obj, BatchResult):
+        pq.write_table(graph_table(obj, kind=kind, **kwargs), path)
+        return
+
+    writer = None
+    try:
+        for batch in record_batches(obj, edges=kind == 'edge', **kwargs):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(pyarrow.Table.from_batches([batch]))
+    finally:
+        if writer is not None:
+            writer.close()
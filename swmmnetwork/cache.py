@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+import os
+import glob
+import hashlib
+import numbers
+import tempfile
+
+import numpy
+import pandas
+
+from . import core
+from .util import _to_list
+
+
+# bump this if the layout of the cache files changes
+CACHE_FORMAT = '3'
+
+# the keyword arguments of `core.solve_network` that change its results
+SOLVE_KEY_ARGS = [
+    ('edge_name_col', 'id'),
+    ('split_on', '-'),
+    ('vol_col', 'volume'),
+    ('tmnt_flags', ['TR']),
+    ('vol_reduced_flags', ['INF']),
+    ('ck_vol_col', None),
+    ('load_cols', None),
+    ('check_mass_balance', True),
+]
+
+
+def solved_columns(vol_col='volume', load_cols=None, ck_vol_col=None):
+    """the node and edge attributes that `core.solve_network` writes. Only
+    these are stored and restored by the cache; every other attribute,
+    e.g., a node 'xtype' or a label, is left as it is.
+    """
+    nodes = [vol_col + s for s in
+             ['_in', '_out', '_eff', '_reduced', '_pct_reduced', '_treated',
+              '_pct_treated', '_capture', '_pct_capture']]
+    nodes.append('node_vol_gain')
+    if ck_vol_col is not None:
+        nodes.append(vol_col + '_diff_ck')
+    loads = [c + s for c in _to_list(load_cols) for s in
+             ['_load_in', '_load_eff', '_load_reduced', '_load_pct_reduced',
+              '_conc_in', '_conc_eff', '_conc_pct_reduced']]
+    return nodes + loads, ['_bmp_tmnt_flag'] + loads
+
+
+def _canonical_nodes(G):
+    return sorted(G.nodes(), key=repr)
+
+
+def _canonical_edges(G):
+    return sorted(G.edges(keys=True, data=True),
+                  key=lambda e: (repr(e[0]), repr(e[1]), repr(e[2])))
+
+
+def _column_array(values):
+    """pack one attribute column into a typed array and a presence mask.
+    Returns None for columns that cannot be stored without pickling.
+    """
+    present = numpy.array([v is not None for v in values], dtype=bool)
+    # classify the distinct types rather than every value
+    types = set(map(type, values))
+    types.discard(type(None))
+
+    if all([issubclass(t, (bool, numpy.bool_)) for t in types]):
+        dtype, fill = bool, False
+    elif all([issubclass(t, numbers.Integral) for t in types]):
+        dtype, fill = numpy.int64, 0
+    elif all([issubclass(t, numbers.Real) for t in types]):
+        dtype, fill = float, numpy.nan
+    elif all([issubclass(t, str) for t in types]):
+        dtype, fill = str, ''
+    else:
+        return None
+
+    arr = numpy.array([fill if v is None else v for v in values], dtype=dtype)
+    return arr, present
+
+
+def _table_arrays(prefix, records, columns=None):
+    """columnar arrays of a list of attribute dicts."""
+    if columns is None:
+        columns = set([k for r in records for k in r])
+    cols = sorted(columns)
+    arrays = {}
+    for col in cols:
+        packed = _column_array([r.get(col) for r in records])
+        if packed is not None:
+            arr, present = packed
+            arrays['{}/{}'.format(prefix, col)] = arr
+            arrays['{}/{}/mask'.format(prefix, col)] = present
+    return arrays
+
+
+def _table_columns(arrays, prefix):
+    head = prefix + '/'
+    return [k[len(head):] for k in arrays
+            if k.startswith(head) and not k.endswith('/mask')]
+
+
+def _table_records(arrays, prefix, n):
+    records = [{} for _ in range(n)]
+    head = prefix + '/'
+    for key in arrays:
+        if not key.startswith(head) or key.endswith('/mask'):
+            continue
+        col = key[len(head):]
+        values = arrays[key].tolist()
+        present = arrays[key + '/mask']
+        for i in numpy.flatnonzero(present):
+            records[i][col] = values[i]
+    return records
+
+
+class ResultCache(object):
+    """Disk-backed memoization of `core.solve_network`.
+
+    Each solve is keyed on a hash of the network structure, the edge and
+    node volumes, the node loads, the treatment flags and a caller supplied
+    `version` tag for the `bmp_performance_mapping_conc` functions, which
+    cannot be hashed themselves. The solved node and edge attribute tables
+    are stored column by column in one uncompressed ``.npz`` file per key.
+    When the files exceed `max_bytes` in total, the least recently used
+    ones are removed.
+
+    Parameters
+    ----------
+    directory : string
+        folder for the cache files. Created if it does not exist.
+    max_bytes : int, optional (default=2**30)
+        size limit of the cache folder.
+
+    """
+
+    def __init__(self, directory, max_bytes=2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def key(self, G, version=None, **solve_kwargs):
+        """hash of everything that determines the results of a solve."""
+        kwargs = {k: solve_kwargs.get(k, default)
+                  for k, default in SOLVE_KEY_ARGS}
+        load_cols = _to_list(kwargs['load_cols'])
+        vol_col = kwargs['vol_col']
+        edge_name_col = kwargs['edge_name_col']
+        node_cols = [vol_col, kwargs['ck_vol_col'] or '_ck_volume'] + load_cols
+
+        mapping = solve_kwargs.get('bmp_performance_mapping_conc') or {}
+
+        h = hashlib.sha256()
+        h.update(repr((CACHE_FORMAT, str(version))).encode())
+        h.update(repr(sorted(kwargs.items(), key=lambda kv: kv[0])).encode())
+        h.update(repr(sorted(
+            [(k, sorted(v)) for k, v in mapping.items()])).encode())
+        for node in _canonical_nodes(G):
+            data = G.node[node]
+            h.update(repr(
+                (node, [data.get(c) for c in node_cols])).encode())
+        for _from, _to, key, data in _canonical_edges(G):
+            h.update(repr(
+                (_from, _to, key, data.get(edge_name_col), data.get(vol_col))
+            ).encode())
+
+        return h.hexdigest()
+
+    def get(self, key):
+        """the stored arrays for `key`, or None if there is no entry."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with numpy.load(path) as f:
+            arrays = {k: f[k] for k in f.files}
+        os.utime(path, None)  # mark as recently used
+        return arrays
+
+    def put(self, key, arrays):
+        """store `arrays` for `key` and evict old entries if needed."""
+        fd, tmp = tempfile.mkstemp(suffix='.npz', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            numpy.savez(f, **arrays)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """remove the least recently used entries beyond `max_bytes`."""
+        paths = glob.glob(os.path.join(self.directory, '*.npz'))
+        stats = sorted([(os.path.getmtime(p), os.path.getsize(p), p)
+                        for p in paths])
+        total = sum([s[1] for s in stats])
+        for _, size, path in stats:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, '*.npz')):
+            os.remove(path)
+
+    @property
+    def size(self):
+        return sum([os.path.getsize(p) for p in
+                    glob.glob(os.path.join(self.directory, '*.npz'))])
+
+    @staticmethod
+    def snapshot(G, **solve_kwargs):
+        """columnar arrays of the solved node and edge attributes of `G`,
+        see `solved_columns`, and of its diagnostic tables.
+        """
+        kwargs = {k: solve_kwargs.get(k, default)
+                  for k, default in SOLVE_KEY_ARGS}
+        node_cols, edge_cols = solved_columns(
+            vol_col=kwargs['vol_col'], load_cols=kwargs['load_cols'],
+            ck_vol_col=kwargs['ck_vol_col'])
+
+        nodes = _canonical_nodes(G)
+        edges = _canonical_edges(G)
+        arrays = {}
+        arrays.update(_table_arrays(
+            'node', [G.node[n] for n in nodes], columns=node_cols))
+        arrays.update(_table_arrays(
+            'edge', [e[3] for e in edges], columns=edge_cols))
+
+        diagnostics = G.graph.get('treatment_diagnostics')
+        if diagnostics is not None:
+            arrays.update(_table_arrays(
+                'diagnostics', diagnostics.to_dict('records')))
+            arrays['diagnostics_rows'] = numpy.array(len(diagnostics))
+
+        balance = G.graph.get('mass_balance')
+        if balance is not None:
+            arrays.update(_table_arrays(
+                'mass_balance', balance.reset_index().to_dict('records')))
+            arrays['mass_balance_rows'] = numpy.array(len(balance))
+            arrays['mass_balance_columns'] = numpy.array(
+                balance.columns.tolist(), dtype=str)
+
+        return arrays
+
+    @staticmethod
+    def restore(G, arrays):
+        """write stored tables back onto a network with the same structure.
+
+        Only the stored columns are written. A stored column that was
+        missing from a node or edge when it was solved, e.g., the
+        '_bmp_tmnt_flag' of an untreated edge, is removed from it.
+        """
+        nodes = _canonical_nodes(G)
+        edges = _canonical_edges(G)
+        tables = [
+            ('node', [G.node[n] for n in nodes]),
+            ('edge', [e[3] for e in edges]),
+        ]
+        for prefix, targets in tables:
+            cols = _table_columns(arrays, prefix)
+            records = _table_records(arrays, prefix, len(targets))
+            for data, record in zip(targets, records):
+                for col in cols:
+                    if col not in record:
+                        data.pop(col, None)
+                data.update(record)
+
+        if 'diagnostics_rows' in arrays:
+            n = int(arrays['diagnostics_rows'])
+            G.graph['treatment_diagnostics'] = pandas.DataFrame(
+                _table_records(arrays, 'diagnostics', n),
+                columns=['flag', 'pollutant', 'edges'])
+
+        if 'mass_balance_rows' in arrays:
+            n = int(arrays['mass_balance_rows'])
+            columns = arrays['mass_balance_columns'].tolist()
+            G.graph['mass_balance'] = (
+                pandas.DataFrame(_table_records(arrays, 'mass_balance', n),
+                                 columns=['node'] + columns)
+                .set_index('node'))
+
+    def solve(self, G, version=None, **solve_kwargs):
+        """solve `G` in place, reusing stored results when the inputs match.
+
+        Parameters
+        ----------
+        G : networkx.MultiDiGraph
+        version : string, optional (default=None)
+            a tag identifying the `bmp_performance_mapping_conc` functions.
+            Change it whenever the functions change.
+        **solve_kwargs
+            passed to `core.solve_network`.
+
+        Returns
+        -------
+        bool
+            True if the results were read from the cache.
+        """
+        key = self.key(G, version=version, **solve_kwargs)
+        arrays = self.get(key)
+        if arrays is not None:
+            self.restore(G, arrays)
+            return True
+
+        core.solve_network(G, **solve_kwargs)
+        self.put(key, self.snapshot(G, **solve_kwargs))
+        return False
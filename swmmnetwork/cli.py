@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+"""Command line batch runner.
+
+    swmmnetwork MANIFEST OUTPUT_DIR [--processes N] [--resume]
+
+The manifest is a csv (or json list of records) with a row per scenario:
+
+name
+    unique name of the scenario; the results are written to
+    ``OUTPUT_DIR/<name>.csv``.
+inp, rpt
+    the SWMM input and report files.
+load or concentration
+    the path of the scenario's load or concentration table. Exactly one of
+    the two is given per row. Tables are streamed, see
+    `scenario.read_pollutant_table`.
+value_col (optional)
+    the value column of the table. Defaults to 'load' or 'concentration'.
+performance (optional)
+    a csv of bmp performance curves, see `read_performance_curves`.
+
+Relative paths are relative to the manifest.
+"""
+
+from __future__ import division, print_function
+
+import os
+import sys
+import argparse
+import functools
+import traceback
+
+import numpy
+import pandas
+
+from .parallel import _pool_context
+from .util import _is_blank
+
+
+MANIFEST_COLUMNS = ['name', 'inp', 'rpt']
+
+PATH_COLUMNS = ['inp', 'rpt', 'load', 'concentration', 'performance']
+
+
+def read_manifest(path):
+    """read a batch manifest and resolve its paths.
+
+    Parameters
+    ----------
+    path : string
+        a csv or json manifest, see the module docstring.
+
+    Returns
+    -------
+    pandas.DataFrame
+        one row per scenario with absolute paths and the `kind` ('load' or
+        'concentration'), `table` and `value_col` of each scenario.
+    """
+
+    if path.lower().endswith('.json'):
+        manifest = pandas.read_json(path, orient='records', dtype=False)
+    else:
+        manifest = pandas.read_csv(path, dtype=str)
+
+    missing = [c for c in MANIFEST_COLUMNS if c not in manifest.columns]
+    if missing:
+        e = 'The manifest is missing the columns: {}'.format(missing)
+        raise ValueError(e)
+
+    duplicated = manifest['name'][manifest['name'].duplicated()].tolist()
+    if duplicated:
+        e = 'Scenario names must be unique: {}'.format(duplicated)
+        raise ValueError(e)
+
+    root = os.path.dirname(os.path.abspath(path))
+    manifest = manifest.copy()
+    for col in PATH_COLUMNS:
+        if col not in manifest.columns:
+            manifest[col] = None
+        manifest[col] = [
+            None if _is_blank(v) else os.path.join(root, v)
+            for v in manifest[col]
+        ]
+
+    kinds = []
+    for row in manifest.itertuples():
+        if (row.load is None) == (row.concentration is None):
+            e = ('Scenario {!r} must give exactly one of a load or a '
+                 'concentration table.'.format(row.name))
+            raise ValueError(e)
+        kinds.append('load' if row.load is not None else 'concentration')
+
+    manifest['kind'] = kinds
+    manifest['table'] = [getattr(row, row.kind)
+                         for row in manifest.itertuples()]
+    if 'value_col' not in manifest.columns:
+        manifest['value_col'] = None
+    manifest['value_col'] = [
+        kind if _is_blank(v) else v
+        for v, kind in zip(manifest['value_col'], manifest['kind'])
+    ]
+    return manifest
+
+
+def read_performance_curves(path):
+    """build the `bmp_performance_mapping_conc` of a table of curves.
+
+    Parameters
+    ----------
+    path : string or pandas.DataFrame
+        a table with 'bmp', 'pollutant', 'influent' and 'effluent'
+        columns. The (influent, effluent) points of each bmp and pollutant
+        define a piecewise linear performance curve that is held constant
+        beyond its first and last points.
+
+    Returns
+    -------
+    dict
+        {'bmp': {'pollutant': fxn}}
+    """
+
+    curves = path
+    if not isinstance(curves, pandas.DataFrame):
+        curves = pandas.read_csv(path)
+
+    mapping = {}
+    for (bmp, poc), df in curves.groupby(['bmp', 'pollutant']):
+        df = df.sort_values('influent')
+        mapping.setdefault(bmp, {})[poc] = functools.partial(
+            numpy.interp,
+            xp=df['influent'].values.astype(float),
+            fp=df['effluent'].values.astype(float),
+        )
+    return mapping
+
+
+def result_path(output_dir, name):
+    return os.path.join(output_dir, '{}.csv'.format(name))
+
+
+def _write_result(df, path):
+    # results are written whole or not at all so that a resumed batch never
+    # mistakes a partial file for a finished scenario.
+    tmp = path + '.tmp'
+    df.to_csv(tmp)
+    os.replace(tmp, path)
+
+
+def build_network(row, base=None):
+    """the unsolved network of one manifest row.
+
+    Parameters
+    ----------
+    row : dict
+        a row of `read_manifest`.
+    base : scenario.ScenarioBase, optional (default=None)
+        the parsed hydrology of the row's model, if already read.
+
+    Returns
+    -------
+    G : SwmmNetwork
+    load_cols : list
+        the pollutants of the row's table.
+    mapping : dict
+        the `bmp_performance_mapping_conc` of the row's performance curves.
+    """
+    from .scenario import ScenarioBase
+    from .swmmnetwork import SwmmNetwork
+
+    if base is None:
+        base = ScenarioBase(row['inp'], row['rpt'])
+    sc = base.scenario(**{
+        row['kind'] + '_df': row['table'],
+        'pollutant_value_col': row['value_col'],
+    })
+    mapping = {}
+    if row['performance'] is not None:
+        mapping = read_performance_curves(row['performance'])
+    return SwmmNetwork(scenario=sc), sc.pocs, mapping
+
+
+def _run_model(args):
+    """solve every scenario of one model, sharing its parsed hydrology."""
+    from .scenario import ScenarioBase
+
+    inp, rpt, rows, output_dir = args
+    status = []
+    try:
+        base = ScenarioBase(inp, rpt).compute_hydrology()
+    except Exception:
+        error = traceback.format_exc()
+        return [(row['name'], error) for row in rows]
+
+    for row in rows:
+        try:
+            G, load_cols, mapping = build_network(row, base=base)
+            G.solve_network(load_cols=load_cols,
+                            bmp_performance_mapping_conc=mapping)
+            _write_result(G.to_dataframe(index_col='id'),
+                          result_path(output_dir, row['name']))
+            status.append((row['name'], None))
+        except Exception:
+            status.append((row['name'], traceback.format_exc()))
+    return status
+
+
+def _model_tasks(manifest, output_dir, processes):
+    """the `_run_model` tasks of a manifest.
+
+    The scenarios of each (inp, rpt) model are split into chunks, about
+    one per worker and in proportion to the model's share of the
+    scenarios, so that a manifest of many scenarios of a few models keeps
+    every worker busy. Each chunk parses its model once.
+    """
+    cols = ['name', 'kind', 'table', 'value_col', 'performance']
+    groups = list(manifest.groupby(['inp', 'rpt'], sort=False))
+    total = sum([len(df) for _, df in groups])
+
+    tasks = []
+    for (inp, rpt), df in groups:
+        n_chunks = int(round(processes * len(df) / total))
+        n_chunks = max(1, min(n_chunks, len(df)))
+        rows = df.loc[:, cols].to_dict('records')
+        for chunk in numpy.array_split(numpy.arange(len(rows)), n_chunks):
+            tasks.append(
+                (inp, rpt, [rows[i] for i in chunk], output_dir))
+    return tasks
+
+
+def run_manifest(manifest, output_dir, processes=None, resume=False,
+                 log=None):
+    """solve every scenario of a manifest on a process pool.
+
+    The scenarios of each (inp, rpt) model are split into chunks across
+    the workers, and each chunk parses the model once. Each result table
+    is written as soon as its scenario is solved.
+
+    Parameters
+    ----------
+    manifest : string or pandas.DataFrame
+        the manifest path, or a manifest returned by `read_manifest`.
+    output_dir : string
+        created if it does not exist.
+    processes : int, optional (default=None)
+        number of worker processes. Defaults to the number of cores.
+    resume : bool, optional (default=False)
+        skip the scenarios whose results were already written, e.g., by an
+        interrupted run of the same manifest.
+    log : callable, optional (default=None)
+        called with a progress message as each chunk finishes.
+
+    Returns
+    -------
+    pandas.DataFrame
+        the 'status' ('done', 'skipped' or 'failed') and 'error' of each
+        scenario, indexed by name.
+    """
+
+    if not isinstance(manifest, pandas.DataFrame):
+        manifest = read_manifest(manifest)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    status = pandas.DataFrame(index=manifest['name'],
+                              columns=['status', 'error'])
+    todo = manifest
+    if resume:
+        done = numpy.array([os.path.exists(result_path(output_dir, n))
+                            for n in manifest['name']], dtype=bool)
+        status.loc[manifest['name'][done], 'status'] = 'skipped'
+        todo = manifest.loc[~done]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(todo)))
+    if not len(todo):
+        return status
+    tasks = _model_tasks(todo, output_dir, processes)
+    processes = min(processes, len(tasks))
+
+    if processes == 1:
+        results = map(_run_model, tasks)
+        pool = None
+    else:
+        pool = _pool_context().Pool(processes)
+        results = pool.imap_unordered(_run_model, tasks)
+
+    try:
+        for finished in results:
+            for name, error in finished:
+                status.loc[name] = ['done' if error is None else 'failed',
+                                    error]
+                if log is not None:
+                    log('{}: {}'.format(name, status.loc[name, 'status']))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='swmmnetwork',
+        description='Solve the scenarios of a manifest on a process pool.')
+    parser.add_argument('manifest', help='csv or json scenario manifest')
+    parser.add_argument('output_dir', help='directory for the result tables')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip scenarios that already have results')
+    args = parser.parse_args(argv)
+
+    def log(msg):
+        print(msg, file=sys.stderr)
+
+    status = run_manifest(args.manifest, args.output_dir,
+                          processes=args.processes, resume=args.resume,
+                          log=log)
+
+    failed = status.query('status == "failed"')
+    for name, error in failed['error'].items():
+        log('\n{} failed:\n{}'.format(name, error))
+    return 1 if len(failed) else 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
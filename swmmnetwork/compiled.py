@@ -0,0 +1,738 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy
+import pandas
+import networkx as nx
+
+from .core import _edge_treatment, resolve_treatment_table
+from .dag import NetworkDag
+from .util import _to_list, validate_swmmnetwork
+
+
+NETWORK_ARRAYS = [
+    'node_volume',
+    'node_load',
+    'level_ptr',
+    'edge_src',
+    'edge_dst',
+    'edge_volume',
+    'edge_bmp',
+    'edge_treated',
+    'edge_vol_reduced',
+]
+
+RESULT_ARRAYS = ['node_load_in', 'node_load_eff', 'edge_load_eff']
+
+
+def _scenario_slice(arr, start, stop):
+    """rows `start:stop` of a per scenario array; arrays shared by every
+    scenario are returned whole.
+    """
+    if arr is None:
+        return None
+    arr = numpy.asarray(arr)
+    if arr.ndim >= 2 and len(arr) > 1:
+        return arr[start:stop]
+    return arr
+
+
+def _apply_fxn(fxn, x):
+    """call a performance function on an array of concentrations, falling
+    back to an element-wise loop for functions that only accept scalars.
+    """
+    try:
+        res = numpy.asarray(fxn(x), dtype=float)
+        if res.shape == x.shape:
+            return res
+    except Exception:
+        pass
+    return numpy.array([fxn(i) for i in x], dtype=float).reshape(x.shape)
+
+
+def _fxn_slope(fxn, x):
+    """local slope of a performance function at each concentration in `x`.
+
+    Functions with a `derivative` attribute are asked for it directly,
+    otherwise a central difference is used, one-sided at zero so that the
+    function is never evaluated at a negative concentration.
+    """
+    derivative = getattr(fxn, 'derivative', None)
+    if derivative is not None:
+        return _apply_fxn(derivative, x)
+
+    h = 1e-6 * numpy.maximum(numpy.abs(x), 1)
+    lo = numpy.maximum(x - h, 0)
+    hi = x + h
+    return (_apply_fxn(fxn, hi) - _apply_fxn(fxn, lo)) / (hi - lo)
+
+
+class CompiledNetwork(object):
+    """Integer indexed arrays of a network's topology, volumes, loads and
+    treatment flags.
+
+    Nodes are numbered 0..N-1 in topological order and grouped into levels
+    such that every edge leaves a node in an earlier level than the one it
+    enters. Edges are numbered 0..E-1 sorted by their source node so that
+    the out edges of each level are a contiguous slice. This lets the
+    solver work on whole levels of the network and many load scenarios at
+    once.
+
+    Parameters
+    ----------
+    arrays : dict of numpy.ndarray
+        the arrays listed in `NETWORK_ARRAYS`. These contain no python
+        objects so that they can be placed in shared memory.
+    nodes : list, optional (default=None)
+        node names in index order.
+    edges : list, optional (default=None)
+        (from, to, key) tuples of the source graph in edge index order.
+    edge_ids : list, optional (default=None)
+        the `edge_name_col` value of each edge in edge index order.
+    load_cols : list of strings, optional (default=None)
+        the pollutants, in the order of the last axis of the load arrays.
+    flags : list of strings, optional (default=None)
+        the bmp flags referred to by the `edge_bmp` codes.
+    treatment_table : dict, optional (default=None)
+        the resolved performance function table, see
+        `core.resolve_treatment_table`.
+
+    """
+
+    def __init__(self, arrays, nodes=None, edges=None, edge_ids=None,
+                 load_cols=None, flags=None, treatment_table=None):
+
+        self.arrays = arrays
+        for name in NETWORK_ARRAYS:
+            setattr(self, name, arrays[name])
+
+        self.nodes = nodes
+        self.edges = edges
+        self.edge_ids = edge_ids
+        self.load_cols = _to_list(load_cols)
+        self.flags = _to_list(flags)
+        self.treatment_table = treatment_table or {}
+
+        self._node_index = None
+
+    @classmethod
+    def from_graph(cls, G, edge_name_col='id', split_on='-',
+                   vol_col='volume', tmnt_flags=['TR'],
+                   vol_reduced_flags=['INF'], load_cols=None,
+                   bmp_performance_mapping_conc=None, dag=None, **kwargs):
+        """compile a networkx.MultiDiGraph.
+
+        The parameters are the same as those of `core.solve_network`.
+        """
+
+        if dag is None and isinstance(getattr(G, 'dag', None), NetworkDag):
+            dag = G.dag
+        if dag is None:
+            validate_swmmnetwork(G)
+
+        load_cols = _to_list(load_cols)
+        tmnt_flags = _to_list(tmnt_flags)
+        vol_reduced_flags = _to_list(vol_reduced_flags)
+
+        if bmp_performance_mapping_conc is None:
+            bmp_performance_mapping_conc = {}
+
+        # group nodes by their longest distance from a source node.
+        if dag is None:
+            topo = list(nx.topological_sort(G))
+            level = {}
+            for node in topo:
+                level[node] = max(
+                    [level[p] + 1 for p in G.predecessors(node)] or [0])
+            topo_level = numpy.array([level[n] for n in topo], dtype=int)
+        else:
+            topo = dag.topological_sort()
+            topo_level = dag.levels[dag.topo]
+        order = numpy.argsort(topo_level, kind='stable')
+        nodes = [topo[i] for i in order]
+        node_index = {n: i for i, n in enumerate(nodes)}
+        n_levels = topo_level.max() + 1 if len(nodes) else 0
+        level_ptr = numpy.searchsorted(
+            topo_level[order], numpy.arange(n_levels + 1)).astype(numpy.int64)
+
+        node_volume = numpy.array(
+            [G.node[n].get(vol_col, 0) for n in nodes], dtype=float)
+        node_load = numpy.array(
+            [[G.node[n].get(c, 0) for c in load_cols] for n in nodes],
+            dtype=float).reshape(len(nodes), len(load_cols))
+
+        edge_records = sorted(
+            G.edges(keys=True, data=True),
+            key=lambda e: node_index[e[0]])
+
+        flags = []
+        edges, edge_ids, edge_bmp = [], [], []
+        edge_treated, edge_vol_reduced, edge_volume = [], [], []
+        for _from, _to, key, data in edge_records:
+            name_flags = str(data.get(edge_name_col)).split(split_on)
+            vol_reduced, flag = _edge_treatment(
+                name_flags, tmnt_flags, vol_reduced_flags,
+                bmp_performance_mapping_conc)
+            if flag is not None and flag not in flags:
+                flags.append(flag)
+
+            edges.append((_from, _to, key))
+            edge_ids.append(data.get(edge_name_col))
+            edge_bmp.append(-1 if flag is None else flags.index(flag))
+            edge_vol_reduced.append(vol_reduced)
+            edge_treated.append(any([i in name_flags for i in tmnt_flags]))
+            edge_volume.append(data.get(vol_col, 0))
+
+        arrays = {
+            'node_volume': node_volume,
+            'node_load': node_load,
+            'level_ptr': level_ptr,
+            'edge_src': numpy.array(
+                [node_index[e[0]] for e in edges], dtype=numpy.int64),
+            'edge_dst': numpy.array(
+                [node_index[e[1]] for e in edges], dtype=numpy.int64),
+            'edge_volume': numpy.array(edge_volume, dtype=float),
+            'edge_bmp': numpy.array(edge_bmp, dtype=numpy.int64),
+            'edge_treated': numpy.array(edge_treated, dtype=bool),
+            'edge_vol_reduced': numpy.array(edge_vol_reduced, dtype=bool),
+        }
+
+        treatment_table, _ = resolve_treatment_table(
+            bmp_performance_mapping_conc, load_cols, flags=flags)
+
+        return cls(arrays, nodes=nodes, edges=edges, edge_ids=edge_ids,
+                   load_cols=load_cols, flags=flags,
+                   treatment_table=treatment_table)
+
+    @property
+    def n_nodes(self):
+        return len(self.node_volume)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_src)
+
+    @property
+    def n_levels(self):
+        return len(self.level_ptr) - 1
+
+    @property
+    def node_index(self):
+        if self._node_index is None:
+            self._node_index = {n: i for i, n in enumerate(self.nodes)}
+        return self._node_index
+
+    @property
+    def edge_ptr(self):
+        """edge offsets of each level. Edges are sorted by source node, so
+        the out edges of level `i` are ``edge_ptr[i]:edge_ptr[i + 1]``.
+        """
+        return numpy.searchsorted(self.edge_src, self.level_ptr)
+
+    @property
+    def node_edge_volume_in(self):
+        return numpy.bincount(self.edge_dst, weights=self.edge_volume,
+                              minlength=self.n_nodes)
+
+    def load_matrix(self, loads=None):
+        """align node loads to the compiled node index.
+
+        Parameters
+        ----------
+        loads : optional (default=None)
+            None to use the loads of the compiled graph, a wide
+            pandas.DataFrame indexed by node name with a column for each of
+            `load_cols`, a list of such DataFrames (one per scenario), or an
+            array shaped (nodes, pollutants) or (scenarios, nodes,
+            pollutants). Nodes missing from a DataFrame have zero load.
+
+        Returns
+        -------
+        numpy.ndarray shaped (scenarios, nodes, pollutants)
+        """
+
+        if loads is None:
+            return self.node_load[numpy.newaxis, ...]
+
+        if isinstance(loads, pandas.DataFrame):
+            loads = [loads]
+
+        if isinstance(loads, list):
+            arr = numpy.zeros((len(loads), self.n_nodes, len(self.load_cols)))
+            for i, df in enumerate(loads):
+                idx = pandas.Index(self.nodes).get_indexer(df.index)
+                found = idx >= 0
+                arr[i, idx[found], :] = (
+                    df.reindex(columns=self.load_cols)
+                    .fillna(0)
+                    .values[found]
+                )
+            return arr
+
+        loads = numpy.asarray(loads, dtype=float)
+        if loads.ndim == 2:
+            loads = loads[numpy.newaxis, ...]
+        if loads.shape[1:] != (self.n_nodes, len(self.load_cols)):
+            e = 'Load array shape {} does not match (scenarios, {}, {}).'
+            raise ValueError(e.format(
+                loads.shape, self.n_nodes, len(self.load_cols)))
+        return loads
+
+    def volume_matrix(self, edge_volume=None, node_volume=None,
+                      n_scenarios=1):
+        """per scenario node and edge volumes.
+
+        Parameters
+        ----------
+        edge_volume, node_volume : numpy.ndarray, optional (default=None)
+            (scenarios, edges) and (scenarios, nodes) volumes. The compiled
+            volumes are used if None.
+        n_scenarios : int, optional (default=1)
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            the edge volumes shaped (edges, scenarios) and the total node
+            inflow volumes shaped (nodes, scenarios). These are read only
+            broadcast views if the compiled volumes are used.
+        """
+        if edge_volume is None:
+            edge_volume = self.edge_volume
+        if node_volume is None:
+            node_volume = self.node_volume
+
+        edge_volume = numpy.atleast_2d(edge_volume)
+        node_volume = numpy.atleast_2d(node_volume)
+        n_scenarios = max(n_scenarios, len(edge_volume), len(node_volume))
+
+        edge_volume = numpy.broadcast_to(
+            edge_volume, (n_scenarios, self.n_edges)).T
+        vol_in = numpy.broadcast_to(
+            node_volume, (n_scenarios, self.n_nodes)).T.copy()
+        numpy.add.at(vol_in, self.edge_dst, edge_volume)
+
+        return edge_volume, vol_in
+
+    @property
+    def scenario_nbytes(self):
+        """approximate working memory of `solve` per scenario, in bytes."""
+        n_poll = len(self.load_cols)
+        edge_ptr = self.edge_ptr
+        level_edges = numpy.diff(edge_ptr).max() if self.n_levels else 0
+        # node loads in and out, edge loads, node volumes and the
+        # temporaries of the widest level.
+        n_values = (2 * self.n_nodes * n_poll + self.n_edges * n_poll +
+                    self.n_nodes + 4 * level_edges * n_poll)
+        return 8 * int(n_values)
+
+    def chunk_size(self, memory_budget):
+        """the number of scenarios per chunk of a solve whose working memory
+        is limited to `memory_budget` bytes.
+        """
+        return max(1, int(memory_budget // max(1, self.scenario_nbytes)))
+
+    def solve(self, loads=None, out=None, edge_volume=None,
+              node_volume=None, edge_bmp=None, edge_vol_reduced=None,
+              edge_removal=None, dtype=None, results=None,
+              result_nodes=None, memory_budget=None):
+        """solve the loads of many scenarios at once.
+
+        Parameters
+        ----------
+        loads : optional (default=None)
+            the scenario loads, see `load_matrix`.
+        edge_volume, node_volume : numpy.ndarray, optional (default=None)
+            (scenarios, edges) and (scenarios, nodes) volumes, e.g., of
+            different storm events. Defaults to the compiled volumes.
+        edge_bmp, edge_vol_reduced : numpy.ndarray, optional (default=None)
+            (scenarios, edges) bmp codes and volume reduction flags, e.g.,
+            of alternative bmp placements. Defaults to the compiled ones.
+        edge_removal : numpy.ndarray, optional (default=None)
+            (scenarios, edges) or (scenarios, edges, pollutants) fractions
+            of the effluent concentration removed by each edge in addition
+            to its treatment, e.g., trial bmp efficiencies.
+        out : dict of numpy.ndarray, optional (default=None)
+            preallocated (scenarios, nodes, pollutants) arrays for
+            'node_load_in' and 'node_load_eff', and optionally a
+            (scenarios, edges, pollutants) array for 'edge_load_eff', into
+            which the results are written.
+        dtype : numpy.dtype, optional (default=None)
+            the dtype in which the results are stored, e.g., numpy.float32
+            to halve their memory. The loads are always solved in float64
+            and rounded once when stored, so each float32 result is within
+            a relative error of about 6e-8 (2 ** -24) of the float64
+            result.
+        results : list, optional (default=None)
+            the result arrays to keep, a subset of `RESULT_ARRAYS`. The
+            others are None in the returned result.
+        result_nodes : list, optional (default=None)
+            the nodes whose results are kept, e.g., the outfalls. The node
+            arrays of the result follow the order of this list.
+        memory_budget : int, optional (default=None)
+            bytes of working memory. The scenarios are solved in chunks of
+            `chunk_size` scenarios, and only the kept results of each chunk
+            are stored. The stored results are in addition to the budget.
+
+        Returns
+        -------
+        BatchResult
+        """
+
+        solve_kwargs = dict(
+            edge_volume=edge_volume, node_volume=node_volume,
+            edge_bmp=edge_bmp, edge_vol_reduced=edge_vol_reduced,
+            edge_removal=edge_removal)
+
+        if (dtype is None and results is None and result_nodes is None and
+                memory_budget is None):
+            return self._solve(loads, out=out, **solve_kwargs)
+
+        keep = RESULT_ARRAYS if results is None else _to_list(results)
+        unknown = [k for k in keep if k not in RESULT_ARRAYS]
+        if unknown:
+            e = 'Unknown results {}; choose from {}.'
+            raise ValueError(e.format(unknown, RESULT_ARRAYS))
+
+        nodes = self.nodes
+        node_idx = slice(None)
+        if result_nodes is not None:
+            nodes = list(result_nodes)
+            node_idx = numpy.array([self.node_index[n] for n in nodes],
+                                   dtype=numpy.int64)
+
+        loads = self.load_matrix(loads)
+        n_scenarios = self._n_scenarios(loads, **solve_kwargs)
+        chunksize = n_scenarios
+        if memory_budget is not None:
+            chunksize = self.chunk_size(memory_budget)
+
+        if dtype is None:
+            dtype = float
+        n_nodes = self.n_nodes if result_nodes is None else len(nodes)
+        shapes = {
+            'node_load_in': (n_scenarios, n_nodes, len(self.load_cols)),
+            'node_load_eff': (n_scenarios, n_nodes, len(self.load_cols)),
+            'edge_load_eff': (n_scenarios, self.n_edges, len(self.load_cols)),
+        }
+        if out is None:
+            out = {}
+        stored = {k: out[k] if k in out else numpy.empty(shapes[k], dtype)
+                  for k in keep}
+        vol_in = numpy.empty((n_scenarios, n_nodes), dtype)
+
+        for start in range(0, n_scenarios, chunksize):
+            stop = min(start + chunksize, n_scenarios)
+            chunk = self._solve(
+                loads if len(loads) == 1 else loads[start:stop],
+                n_scenarios=stop - start,
+                **{k: _scenario_slice(v, start, stop)
+                   for k, v in solve_kwargs.items()})
+            for key in keep:
+                arr = getattr(chunk, key)
+                if key.startswith('node'):
+                    arr = arr[:, node_idx]
+                stored[key][start:stop] = arr
+            vol_in[start:stop] = chunk.node_vol_in[:, node_idx]
+
+        return BatchResult(self, node_vol_in=vol_in, nodes=nodes,
+                           **{k: stored.get(k) for k in RESULT_ARRAYS})
+
+    @staticmethod
+    def _n_scenarios(loads, edge_volume=None, node_volume=None,
+                     edge_bmp=None, edge_vol_reduced=None,
+                     edge_removal=None):
+        n_scenarios = loads.shape[0]
+        for arr in [edge_volume, node_volume, edge_bmp, edge_vol_reduced,
+                    edge_removal]:
+            if arr is not None:
+                n_scenarios = max(n_scenarios, len(numpy.atleast_2d(arr)))
+        return n_scenarios
+
+    def _solve(self, loads=None, out=None, edge_volume=None,
+               node_volume=None, edge_bmp=None, edge_vol_reduced=None,
+               edge_removal=None, n_scenarios=1):
+
+        loads = self.load_matrix(loads)
+        n_scenarios = max(n_scenarios, loads.shape[0])
+        if edge_bmp is not None:
+            n_scenarios = max(n_scenarios, len(numpy.atleast_2d(edge_bmp)))
+        if edge_vol_reduced is not None:
+            n_scenarios = max(
+                n_scenarios, len(numpy.atleast_2d(edge_vol_reduced)))
+        if edge_removal is not None:
+            edge_removal = numpy.asarray(edge_removal, dtype=float)
+            if edge_removal.ndim == 3:
+                n_scenarios = max(n_scenarios, len(edge_removal))
+                # node major like the loads
+                edge_removal = edge_removal.transpose(1, 0, 2)
+            else:
+                edge_removal = numpy.atleast_2d(edge_removal)
+                n_scenarios = max(n_scenarios, len(edge_removal))
+                edge_removal = edge_removal.T[:, :, numpy.newaxis]
+
+        edge_vol, vol_in = self.volume_matrix(
+            edge_volume, node_volume, n_scenarios=n_scenarios)
+        n_scenarios = vol_in.shape[1]
+
+        if edge_bmp is None:
+            edge_bmp = self.edge_bmp
+        if edge_vol_reduced is None:
+            edge_vol_reduced = self.edge_vol_reduced
+        shape = (n_scenarios, self.n_edges)
+        edge_bmp = numpy.broadcast_to(
+            numpy.atleast_2d(edge_bmp), shape).T
+        edge_vol_reduced = numpy.broadcast_to(
+            numpy.atleast_2d(edge_vol_reduced), shape).T
+        loads = numpy.broadcast_to(
+            loads, (n_scenarios, ) + loads.shape[1:])
+
+        # the solve is node major so that the accumulation into the
+        # downstream nodes is a single `add.at` per level.
+        load_in = numpy.array(loads.transpose(1, 0, 2), order='C')
+        edge_load = numpy.zeros(
+            (self.n_edges, n_scenarios, len(self.load_cols)))
+
+        edge_ptr = self.edge_ptr
+
+        for lvl in range(self.n_levels):
+            e0, e1 = edge_ptr[lvl], edge_ptr[lvl + 1]
+            if e0 == e1:
+                continue
+
+            src = self.edge_src[e0:e1]
+            src_vol = vol_in[src][:, :, numpy.newaxis]
+            src_load = load_in[src]
+
+            has_load = (src_vol > 0) & (src_load > 0)
+            conc = numpy.zeros_like(src_load)
+            numpy.divide(src_load, src_vol, out=conc, where=has_load)
+
+            conc_eff = conc
+            bmp = edge_bmp[e0:e1]
+            treated = bmp >= 0
+            if treated.any():
+                conc_eff = conc.copy()
+                for code in numpy.unique(bmp[treated]):
+                    sel = bmp == code
+                    fxns = self.treatment_table[self.flags[code]]
+                    for p, load_col in enumerate(self.load_cols):
+                        pos = sel & has_load[:, :, p]
+                        res = conc_eff[:, :, p]
+                        res[sel] = 0
+                        res[pos] = _apply_fxn(
+                            fxns[load_col], conc[:, :, p][pos])
+
+            if edge_removal is not None:
+                conc_eff = conc_eff * (1 - edge_removal[e0:e1])
+
+            conc_eff[edge_vol_reduced[e0:e1]] = 0
+
+            edge_load[e0:e1] = conc_eff * edge_vol[e0:e1, :, numpy.newaxis]
+            numpy.add.at(load_in, self.edge_dst[e0:e1], edge_load[e0:e1])
+
+        # outfalls get no load reduction credit, so out = in
+        load_eff = load_in.copy()
+        has_out = numpy.bincount(self.edge_src, minlength=self.n_nodes) > 0
+        load_eff[has_out] = 0
+        numpy.add.at(load_eff, self.edge_src, edge_load)
+
+        results = {
+            'node_load_in': load_in.transpose(1, 0, 2),
+            'node_load_eff': load_eff.transpose(1, 0, 2),
+            'edge_load_eff': edge_load.transpose(1, 0, 2),
+        }
+
+        if out is not None:
+            for key, arr in out.items():
+                arr[...] = results[key]
+                results[key] = arr
+
+        return BatchResult(self, node_vol_in=vol_in.T, **results)
+
+    def sensitivities(self, node, loads=None, edge_volume=None,
+                      node_volume=None):
+        """derivatives of the load into `node` with respect to every node
+        load and every edge's effluent concentration.
+
+        The loads are solved forward once, then the derivatives are carried
+        upstream in one reverse sweep over the levels of the network
+        (reverse mode differentiation). Each edge passes on the fraction
+        ``edge_volume / node_volume_in`` of the sensitivity of the node it
+        enters, scaled by the local slope of its performance function. The
+        cost is about that of one solve regardless of the number of nodes
+        and bmps, rather than one solve per parameter.
+
+        Parameters
+        ----------
+        node : hashable
+            the node whose inflow load is differentiated. For an outfall,
+            this is its `*_load_eff`.
+        loads, edge_volume, node_volume : optional (default=None)
+            the scenario loads and volumes, see `solve`.
+
+        Returns
+        -------
+        dict of numpy.ndarray
+            'node_load' : (scenarios, nodes, pollutants)
+                d load_in[node] / d load of each node.
+            'edge_conc_eff' : (scenarios, edges, pollutants)
+                d load_in[node] / d effluent concentration of each edge.
+        """
+
+        result = self.solve(loads, edge_volume=edge_volume,
+                            node_volume=node_volume)
+        edge_vol, vol_in = self.volume_matrix(
+            edge_volume, node_volume, n_scenarios=result.n_scenarios)
+        load_in = result.node_load_in.transpose(1, 0, 2)
+
+        # the slope of each edge's effluent load to the load of its source
+        src_vol = vol_in[self.edge_src][:, :, numpy.newaxis]
+        has_vol = numpy.broadcast_to(src_vol > 0, load_in[self.edge_src].shape)
+        conc = numpy.zeros_like(load_in[self.edge_src])
+        numpy.divide(load_in[self.edge_src], src_vol, out=conc,
+                     where=has_vol)
+
+        slope = numpy.ones_like(conc)
+        treated = self.edge_bmp >= 0
+        for code in numpy.unique(self.edge_bmp[treated]):
+            sel = numpy.flatnonzero(self.edge_bmp == code)
+            fxns = self.treatment_table[self.flags[code]]
+            for p, load_col in enumerate(self.load_cols):
+                c = conc[sel, :, p]
+                pos = has_vol[sel, :, p]
+                res = numpy.ones_like(c)
+                res[pos] = _fxn_slope(fxns[load_col], c[pos])
+                slope[sel, :, p] = res
+        slope[self.edge_vol_reduced] = 0
+
+        weight = numpy.zeros_like(conc)
+        numpy.divide(edge_vol[:, :, numpy.newaxis] * slope, src_vol,
+                     out=weight, where=has_vol)
+
+        # reverse sweep; every node downstream of a level is final before
+        # the level is visited.
+        adjoint = numpy.zeros_like(load_in)
+        adjoint[self.node_index[node]] = 1
+        edge_ptr = self.edge_ptr
+        for lvl in reversed(range(self.n_levels)):
+            e0, e1 = edge_ptr[lvl], edge_ptr[lvl + 1]
+            if e0 == e1:
+                continue
+            numpy.add.at(
+                adjoint, self.edge_src[e0:e1],
+                adjoint[self.edge_dst[e0:e1]] * weight[e0:e1])
+
+        edge_conc_eff = (
+            adjoint[self.edge_dst] * edge_vol[:, :, numpy.newaxis])
+        edge_conc_eff[self.edge_vol_reduced] = 0
+
+        return {
+            'node_load': adjoint.transpose(1, 0, 2),
+            'edge_conc_eff': edge_conc_eff.transpose(1, 0, 2),
+        }
+
+
+class BatchResult(object):
+    """The loads of a batch of scenarios solved on a `CompiledNetwork`.
+
+    Attributes
+    ----------
+    network : CompiledNetwork
+    node_vol_in : numpy.ndarray shaped (scenarios, nodes)
+    node_load_in, node_load_eff : numpy.ndarray
+        shaped (scenarios, nodes, pollutants)
+    edge_load_eff : numpy.ndarray
+        shaped (scenarios, edges, pollutants)
+    scenarios : list
+        a name for each scenario. Defaults to 0..S-1.
+    nodes : list
+        the nodes of the node arrays. Defaults to every node of the
+        network, in compiled order.
+
+    """
+
+    def __init__(self, network, node_vol_in, node_load_in, node_load_eff,
+                 edge_load_eff=None, scenarios=None, nodes=None):
+        self.network = network
+        self.node_vol_in = node_vol_in
+        self.node_load_in = node_load_in
+        self.node_load_eff = node_load_eff
+        self.edge_load_eff = edge_load_eff
+        if scenarios is None:
+            scenarios = list(range(node_vol_in.shape[0]))
+        self.scenarios = list(scenarios)
+        if nodes is None:
+            nodes = network.nodes
+        self.nodes = nodes
+
+    @property
+    def n_scenarios(self):
+        return self.node_vol_in.shape[0]
+
+    @property
+    def node_load_reduced(self):
+        return self.node_load_in - self.node_load_eff
+
+    def node_frame(self, attr='node_load_eff', scenario=0):
+        """a wide pandas.DataFrame of one node result for one scenario."""
+        return pandas.DataFrame(
+            getattr(self, attr)[scenario],
+            index=self.nodes,
+            columns=self.network.load_cols,
+        )
+
+    def to_frame(self, attr='node_load_eff'):
+        """a long pandas.DataFrame of one node result for every scenario,
+        indexed by (scenario, node) with a column per pollutant.
+        """
+        values = getattr(self, attr)
+        index = pandas.MultiIndex.from_product(
+            [self.scenarios, self.nodes], names=['scenario', 'node'])
+        return pandas.DataFrame(
+            values.reshape(-1, values.shape[-1]),
+            index=index,
+            columns=self.network.load_cols,
+        )
+
+    def aggregate(self, attr='node_load_eff'):
+        """a wide pandas.DataFrame of one node result summed over all
+        scenarios, e.g., the total load of a series of storm events.
+        """
+        return pandas.DataFrame(
+            getattr(self, attr).sum(axis=0),
+            index=self.nodes,
+            columns=self.network.load_cols,
+        )
+
+    def rollup(self, by='outfall', edge_volume=None, edge_vol_reduced=None,
+               edge_treated=None):
+        """totals of the node results of every scenario by terminal outfall
+        or by a {node: group} mapping. See `rollup.batch_rollup`.
+        """
+        from .rollup import batch_rollup
+        return batch_rollup(self, by=by, edge_volume=edge_volume,
+                            edge_vol_reduced=edge_vol_reduced,
+                            edge_treated=edge_treated)
+
+    def compare(self, base, other, attrs=None):
+        """the differences of the node results of scenario `other` from
+        scenario `base`. See `delta.batch_delta`.
+        """
+        from .delta import batch_delta
+        return batch_delta(self, base, other, attrs=attrs)
+
+    def to_arrow(self, attrs=None, edges=False):
+        """the results as a pyarrow.Table with one record batch per
+        scenario. See `arrow.record_batches`.
+        """
+        from .arrow import batch_table
+        return batch_table(self, attrs=attrs, edges=edges)
+
+    def to_parquet(self, path, attrs=None, edges=False):
+        """stream the results to a parquet file, one row group per
+        scenario. See `arrow.record_batches`.
+        """
+        from .arrow import write_parquet
+        write_parquet(self, path, kind='edge' if edges else 'node',
+                      attrs=attrs)
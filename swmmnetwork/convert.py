@@ -1,4 +1,5 @@
 
+import numpy
 import pandas
 import networkx as nx
 
@@ -212,20 +213,22 @@ def from_swmm_inp(inp, create_using=None):
     return G
 
 
-def swmm_inp_layout_to_pos(inp):
-    """Reads and converts swmm node coordinates and subcatchment from inp
-    file to networkx drawing `pos` format, i.e., a dict of node names with
-    x, y coordinates as values.
+def swmm_inp_layout(inp):
+    """Reads the node coordinates and subcatchment polygons of a SWMM input
+    file as one array of positions.
+
     Parameters
     ----------
     inp : string or hymo.SwmmInputFile
         this file will be read to pull the node coordinates and subcatchment
         positions. Polygons are converted to coordinate pairs through their
-        centroid.
+        centroid, the mean of their vertices.
 
     Returns
     -------
-    dict suitable for use as the `pos` kwarg of networkx drawing methods.
+    names : list of strings
+        the upper cased node and subcatchment names.
+    xy : numpy.ndarray shaped (len(names), 2)
     """
 
     inp = _validate_hymo_inp(inp)
@@ -233,16 +236,38 @@ def swmm_inp_layout_to_pos(inp):
     coords = inp.coordinates.pipe(_upper_case_column, include_index=True)
     polys = inp.polygons.pipe(_upper_case_column, include_index=True)
 
-    pos = (
-        coords
-        .astype(float)
-        .append(
-            polys
-            .astype(float)
-            .groupby(polys.index)
-            .mean())
-        .T
-        .to_dict('list')
-    )
+    codes, poly_names = pandas.factorize(polys.index)
+    counts = numpy.bincount(codes, minlength=len(poly_names))
+    vertices = polys.iloc[:, :2].values.astype(float)
+    centroids = numpy.column_stack([
+        numpy.bincount(codes, weights=vertices[:, i],
+                       minlength=len(poly_names))
+        for i in range(2)
+    ]) / counts[:, numpy.newaxis]
+
+    names = [str(n) for n in coords.index] + [str(n) for n in poly_names]
+    xy = numpy.concatenate([
+        coords.iloc[:, :2].values.astype(float).reshape(-1, 2),
+        centroids.reshape(-1, 2),
+    ])
+    return names, xy
+
+
+def swmm_inp_layout_to_pos(inp):
+    """Reads and converts swmm node coordinates and subcatchment from inp
+    file to networkx drawing `pos` format, i.e., a dict of node names with
+    x, y coordinates as values.
+    Parameters
+    ----------
+    inp : string or hymo.SwmmInputFile
+        this file will be read to pull the node coordinates and subcatchment
+        positions. Polygons are converted to coordinate pairs through their
+        centroid.
+
+    Returns
+    -------
+    dict suitable for use as the `pos` kwarg of networkx drawing methods.
+    """
 
-    return {str(k): list(map(float, v)) for k, v in pos.items()}
+    names, xy = swmm_inp_layout(inp)
+    return dict(zip(names, xy.tolist()))
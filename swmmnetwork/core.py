@@ -2,12 +2,199 @@ from __future__ import division
 
 import warnings
 
+import numpy
 import pandas
 import networkx as nx
 
 from .util import _safe_divide, _to_list, validate_swmmnetwork
 
 
+def _identity(x):
+    return x
+
+
+def _edge_treatment(link_name_flags, tmnt_flags, vol_reduced_flags,
+                    bmp_performance_mapping_conc):
+    """classify a link from the flags in its name
+
+    Parameters
+    ----------
+    link_name_flags : list of strings
+        the link name split into its flags
+    tmnt_flags : list of strings
+    vol_reduced_flags : list of strings
+    bmp_performance_mapping_conc : dict mapping
+
+    Returns
+    -------
+    tuple (bool, string or None)
+        whether the link eliminates volume, and the bmp flag whose
+        performance functions treat the link. If multiple flags are present
+        in the link name, then the last one found in the
+        `bmp_performance_mapping_conc` is the one that has an effect on the
+        concentration.
+    """
+
+    if any([i in link_name_flags for i in vol_reduced_flags]):
+        return True, None
+
+    if any([i in link_name_flags for i in tmnt_flags]):
+        for flag in reversed(link_name_flags):
+            if flag in bmp_performance_mapping_conc:
+                return False, flag
+
+    return False, None
+
+
+def resolve_treatment_table(bmp_performance_mapping_conc, load_cols,
+                            flags=None):
+    """resolve the (flag, pollutant) pairs to performance functions once
+    so that the load loop only needs to do a lookup.
+
+    Parameters
+    ----------
+    bmp_performance_mapping_conc : dict mapping
+        lookup table of performance functions, see `solve_node`.
+    load_cols : list of strings
+        the pollutants that will be calculated.
+    flags : list of strings, optional (default=None)
+        the bmp flags to resolve. Defaults to all of the keys in the
+        `bmp_performance_mapping_conc`.
+
+    Returns
+    -------
+    table : dict
+        {'tmnt_flag': {'load_col': fxn}} with an entry for every pair. Pairs
+        without a performance function map to the identity function, i.e.,
+        no reduction is applied.
+    missing : list of tuples
+        the (flag, load_col) pairs that had no performance function.
+    """
+
+    if flags is None:
+        flags = list(bmp_performance_mapping_conc.keys())
+
+    table = {}
+    missing = []
+    for flag in flags:
+        fxns = bmp_performance_mapping_conc.get(flag, {})
+        table[flag] = {}
+        for load_col in load_cols:
+            try:
+                fxn = fxns[load_col]
+            except (KeyError, TypeError, IndexError):
+                fxn = _identity
+                missing.append((flag, load_col))
+            table[flag][load_col] = fxn
+
+    return table, missing
+
+
+def treatment_diagnostics(G, missing, tmnt_flag_col='_bmp_tmnt_flag'):
+    """summarize the treated edges of a solved network which had no
+    performance function for one or more pollutants.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        a solved network.
+    missing : list of tuples
+        the (flag, load_col) pairs that had no performance function, as
+        returned by `resolve_treatment_table`.
+    tmnt_flag_col : string, optional (default='_bmp_tmnt_flag')
+        the edge attribute holding the bmp flag that treated the edge.
+
+    Returns
+    -------
+    pandas.DataFrame
+        one row per (flag, pollutant) pair with the number of edges that
+        received no reduction for that pollutant.
+    """
+
+    counts = {}
+    for _from, _to, data in G.edges(data=True):
+        flag = data.get(tmnt_flag_col)
+        if flag is not None:
+            counts[flag] = counts.get(flag, 0) + 1
+
+    records = [
+        {'flag': flag, 'pollutant': load_col, 'edges': counts[flag]}
+        for flag, load_col in missing if counts.get(flag, 0) > 0
+    ]
+
+    return pandas.DataFrame(records, columns=['flag', 'pollutant', 'edges'])
+
+
+def _warn_missing_treatment(diagnostics):
+    if len(diagnostics) > 0:
+        warnings.warn(
+            'No performance function provided for the following bmp types '
+            'and pollutants. No reduction was applied.\n{}'.format(
+                diagnostics.to_string(index=False)))
+
+
+def mass_balance(G, vol_col='volume', ck_vol_col='_ck_volume', atol=1e-3,
+                 rtol=0.05):
+    """compare the solved inflow volume of every node against a known
+    volume, e.g., the inflow volumes reported by SWMM.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        a solved network.
+    vol_col : string, optional (default='volume')
+    ck_vol_col : string, optional (default='_ck_volume')
+        the node attribute with the known inflow volume. Nodes without it
+        are not checked.
+    atol, rtol : float, optional (default=1e-3, 0.05)
+        a node exceeds the tolerance if
+        ``abs(volume_in - ck_volume) > atol + rtol * abs(ck_volume)``.
+
+    Returns
+    -------
+    pandas.DataFrame
+        indexed by node, with the solved and known volumes, their difference,
+        the difference relative to the known volume and whether it exceeds
+        the tolerance, sorted from the largest absolute difference.
+    """
+
+    vol_in_col = vol_col + '_in'
+    records = [
+        (node, data.get(vol_in_col, numpy.nan), data[ck_vol_col])
+        for node, data in G.nodes(data=True)
+        if data.get(ck_vol_col) is not None
+    ]
+    names = [r[0] for r in records]
+    vol_in = numpy.array([r[1] for r in records], dtype=float)
+    ck_vol = numpy.array([r[2] for r in records], dtype=float)
+
+    diff = vol_in - ck_vol
+    abs_diff = numpy.abs(diff)
+    rel_diff = numpy.full_like(diff, numpy.nan)
+    numpy.divide(diff, ck_vol, out=rel_diff, where=ck_vol != 0)
+    exceeds = ~(abs_diff <= atol + rtol * numpy.abs(ck_vol))
+
+    order = numpy.argsort(-numpy.nan_to_num(abs_diff), kind='stable')
+
+    return pandas.DataFrame({
+        vol_in_col: vol_in[order],
+        ck_vol_col: ck_vol[order],
+        'diff': diff[order],
+        'rel_diff': rel_diff[order],
+        'exceeds': exceeds[order],
+    }, index=pandas.Index([names[i] for i in order], name='node'),
+        columns=[vol_in_col, ck_vol_col, 'diff', 'rel_diff', 'exceeds'])
+
+
+def _warn_mass_balance(table, n=10):
+    exceeds = table[table['exceeds']]
+    if len(exceeds) > 0:
+        warnings.warn(
+            'The solved inflow volume of {} node(s) differs from the check '
+            'volume. The largest differences are:\n{}'.format(
+                len(exceeds), exceeds.head(n).to_string()))
+
+
 def _sum_edge_attr(G, node, attr, method='edges', filter_key=None, split_on='-',
                    include_filter_flags=None, exclude_filter_flags=None):
     """accumulate attributes for one node_id in network G
@@ -72,7 +259,7 @@ def _sum_edge_attr(G, node, attr, method='edges', filter_key=None, split_on='-',
 def solve_node(G, node_name, edge_name_col='id', split_on='-',
                vol_col='volume', ck_vol_col=None, tmnt_flags=None,
                vol_reduced_flags=None, load_cols=None,
-               bmp_performance_mapping_conc=None):
+               bmp_performance_mapping_conc=None, treatment_table=None):
     '''
     Parameters
     ----------
@@ -111,13 +298,20 @@ def solve_node(G, node_name, edge_name_col='id', split_on='-',
                     'load_col' : fxn(inf_conc) #function returns eff_conc
                 }
             }
+    treatment_table : dict mapping, optional (default=None)
+        the resolved lookup table from `resolve_treatment_table`. Pass this
+        when solving many nodes so that the table is built once. If None,
+        the table is resolved for the flags of this node's out edges and a
+        single warning lists any pollutants without a performance function.
 
     Returns
     -------
     None
         The operation occurs inplace, assigning new variables to the node
         and edge attribute dictionaries as needed. User must introspect
-        on the `G` graph object to retrieve results.
+        on the `G` graph object to retrieve results. Treated edges are
+        tagged with the bmp flag that treated them in the
+        `_bmp_tmnt_flag` attribute.
     '''
 
     node_obj = G.node[node_name]
@@ -153,7 +347,28 @@ def solve_node(G, node_name, edge_name_col='id', split_on='-',
     vol_eff = edge_vol_out
     vol_treated = 0
 
-    out_edges = G.out_edges(node_name, data=True)
+    out_edges = list(G.out_edges(node_name, data=True))
+
+    # classify each out edge once rather than once per pollutant.
+    edge_treatment = []
+    for _from, _to, data in out_edges:
+        vol_reduced, flag = _edge_treatment(
+            str(data[edge_name_col]).split(split_on), tmnt_flags,
+            vol_reduced_flags, bmp_performance_mapping_conc)
+        if flag is None:
+            data.pop('_bmp_tmnt_flag', None)
+        else:
+            data['_bmp_tmnt_flag'] = flag
+        edge_treatment.append((vol_reduced, flag))
+
+    if treatment_table is None:
+        flags = sorted(set([f for _, f in edge_treatment if f is not None]))
+        treatment_table, missing = resolve_treatment_table(
+            bmp_performance_mapping_conc, load_cols, flags=flags)
+        if missing:
+            _warn_missing_treatment(pandas.DataFrame(
+                missing, columns=['flag', 'pollutant']))
+
     if out_edges:
         edge_vol_out = _sum_edge_attr(
             G, node_name, vol_col, method='out_edges', split_on=split_on)
@@ -167,14 +382,14 @@ def solve_node(G, node_name, edge_name_col='id', split_on='-',
             vol_treated = _sum_edge_attr(G, node_name, vol_col, method='out_edges', split_on=split_on,
                                          filter_key=edge_name_col, include_filter_flags=tmnt_flags)
 
+    vol_in = node_vol + edge_vol_in
+
     if ck_vol_col is not None:
         vol_diff_ck_col = vol_col + "_diff_ck"
         ck_vol = node_obj.get(ck_vol_col, node_vol)
         vol_diff_ck = vol_in - ck_vol
         node_obj[vol_diff_ck_col] = vol_diff_ck
 
-    vol_in = node_vol + edge_vol_in
-
     node_obj[vol_in_col] = vol_in
     node_obj[vol_out_col] = edge_vol_out
     node_obj[vol_gain_col] = edge_vol_out - edge_vol_in
@@ -224,7 +439,7 @@ def solve_node(G, node_name, edge_name_col='id', split_on='-',
 
             if out_edges:  # this means it's not an outfall
 
-                for edge in out_edges:
+                for edge, (vol_reduced, flag) in zip(out_edges, edge_treatment):
                     _from, _to, data = edge
 
                     data[conc_in_col] = node_conc_in
@@ -233,43 +448,15 @@ def solve_node(G, node_name, edge_name_col='id', split_on='-',
                     # assume no treatment base-case
                     link_conc_eff = node_conc_in
 
-                    # apply treatment to link via treatment function
-                    link_name_flags = str(data[
-                        edge_name_col]).split(split_on)
-
-                    if any([i in link_name_flags for i in vol_reduced_flags]):
+                    if vol_reduced:
                         # if the link eliminates volume, then the load is
                         # eliminated too.
                         link_conc_eff = 0
 
-                    # checks to see if we will apply treatment
-                    elif any([i in link_name_flags for i in tmnt_flags]):
-
-                        for flag in link_name_flags:
-                            # checks to see if there is a function for treating this
-                            # type of bmp and this type of load. if multiple flags are
-                            # present in the link name, then the last one will be the
-                            # one that has an effect on the concentration.
-                            if flag in bmp_performance_mapping_conc:
-                                # note: an error like this should likely be
-                                # logged in a log file.
-                                try:
-                                    fxn = bmp_performance_mapping_conc[
-                                        flag][load_col]
-                                except:
-                                    fxn = lambda x: x
-                                    warnings.warn(
-                                        'No performance function provided for bmp type: '
-                                        '{} for pollutant: {}. No reduction was applied.'.format(flag, load_col))
-                                    flag = '_no_tmnt_fxn'
-
-                                if data.get('_bmp_tmnt_flag') is None:
-                                    data['_bmp_tmnt_flag'] = {}
-                                if data['_bmp_tmnt_flag'].get(flag) is None:
-                                    data['_bmp_tmnt_flag'].update({flag: []})
-                                data['_bmp_tmnt_flag'][flag].append(load_col)
-
-                                link_conc_eff = fxn(node_conc_in)
+                    elif flag is not None:
+                        # apply treatment to link via treatment function
+                        link_conc_eff = treatment_table[flag][
+                            load_col](node_conc_in)
 
                     data[conc_eff_col] = link_conc_eff
                     data[pct_conc_red_col] = 100 * \
@@ -292,6 +479,14 @@ def solve_node(G, node_name, edge_name_col='id', split_on='-',
 
         else:  # this means there was no influent or no influent loading.
                # in either case, effluent must be zero.
+            for _from, _to, data in out_edges:
+                # clear the loads left on the out edges by a previous solve
+                if load_eff_col in data:
+                    for col in [conc_in_col, load_in_col, conc_eff_col,
+                                pct_conc_red_col, load_eff_col,
+                                load_red_col, pct_load_red_col]:
+                        data[col] = 0
+
             node_load_eff = 0
             node_conc_in = 0
             node_conc_eff = 0
@@ -315,9 +510,43 @@ def solve_node(G, node_name, edge_name_col='id', split_on='-',
 def solve_network(G, edge_name_col='id', split_on='-',
                   vol_col='volume', tmnt_flags=['TR'],
                   vol_reduced_flags=['INF'], ck_vol_col=None,
-                  load_cols=None, bmp_performance_mapping_conc=None):
+                  load_cols=None, bmp_performance_mapping_conc=None,
+                  nodes=None, check_mass_balance=True, dag=None):
+    """solve every node of `G` in topological order.
+
+    See `solve_node` for a description of the parameters. If `nodes` is
+    given, only those nodes are solved and every other node keeps the
+    results of its last solve. This supports targeted solves (a node and
+    all of its ancestors) and incremental solves (changed nodes and all of
+    their descendants). The performance
+    functions are resolved once for the whole network, and any treated
+    edges whose bmp flag has no function for a pollutant are reported
+    after the solve as a single warning. The same table is stored in
+    ``G.graph['treatment_diagnostics']``.
+
+    If a `dag.NetworkDag` of `G` is given, the nodes are ordered and their
+    edges are looked up through its integer index instead of the graph.
+
+    If `check_mass_balance` is True, the solved inflow volumes are compared
+    with the check volumes of the nodes (`ck_vol_col`, or '_ck_volume' if
+    it is None) by `mass_balance`. The table is stored in
+    ``G.graph['mass_balance']`` and nodes beyond the tolerance are reported
+    as a single warning.
 
-    validate_swmmnetwork(G)
+    Returns
+    -------
+    None
+        The operation occurs inplace.
+    """
+
+    if dag is None:
+        validate_swmmnetwork(G)
+        view = G
+        order = nx.topological_sort(G)
+    else:
+        # the dag was validated when it was built
+        view = dag
+        order = dag.topological_sort()
 
     load_cols = _to_list(load_cols)
     tmnt_flags = _to_list(tmnt_flags)
@@ -326,8 +555,15 @@ def solve_network(G, edge_name_col='id', split_on='-',
     if bmp_performance_mapping_conc is None:
         bmp_performance_mapping_conc = {}
 
-    for node in nx.topological_sort(G):
-        solve_node(G, node,
+    treatment_table, missing = resolve_treatment_table(
+        bmp_performance_mapping_conc, load_cols)
+
+    if nodes is not None:
+        nodes = set(nodes)
+        order = [node for node in order if node in nodes]
+
+    for node in order:
+        solve_node(view, node,
                    edge_name_col=edge_name_col,
                    split_on=split_on,
                    vol_col=vol_col,
@@ -336,6 +572,17 @@ def solve_network(G, edge_name_col='id', split_on='-',
                    ck_vol_col=ck_vol_col,
                    load_cols=load_cols,
                    bmp_performance_mapping_conc=bmp_performance_mapping_conc,
+                   treatment_table=treatment_table,
                    )
 
+    diagnostics = treatment_diagnostics(G, missing)
+    G.graph['treatment_diagnostics'] = diagnostics
+    _warn_missing_treatment(diagnostics)
+
+    if check_mass_balance:
+        balance = mass_balance(
+            G, vol_col=vol_col, ck_vol_col=ck_vol_col or '_ck_volume')
+        G.graph['mass_balance'] = balance
+        _warn_mass_balance(balance)
+
     return
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import numpy
+
+from .util import validate_swmmnetwork
+
+
+class NetworkDag(object):
+    """Integer indexed structure of a directed acyclic MultiDiGraph.
+
+    Nodes are interned as 0..N-1 and edges as 0..E-1, numbered by source
+    node in the order networkx reports each node's out edges. The in and
+    out edges of every node are stored as compressed sparse rows, so that
+    adjacency lookups are array slices rather than walks of the nested
+    dicts of the graph. The node and edge attribute dicts are shared with
+    the graph rather than copied, so reads and writes through either view
+    stay in sync. The structure itself is a snapshot; it must be rebuilt
+    if nodes or edges are added or removed.
+
+    The `in_edges`, `out_edges`, `predecessors`, `successors` and `node`
+    members mirror those of networkx, so the dag can stand in for the graph
+    in `core.solve_node`.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+    order : list, optional (default=None)
+        the nodes of `G` in a known topological order, e.g., that of
+        `SwmmNetwork.topological_sort`. If None, the order is computed.
+
+    """
+
+    def __init__(self, G, order=None):
+        self.nodes = list(G.nodes())
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        self.node = G.node
+
+        edges = [e for n in self.nodes
+                 for e in G.out_edges(n, keys=True, data=True)]
+        self.keys = [e[2] for e in edges]
+        self.edge_data = [e[3] for e in edges]
+        self.src = numpy.array([self.index[e[0]] for e in edges],
+                               dtype=numpy.int64).reshape(len(edges))
+        self.dst = numpy.array([self.index[e[1]] for e in edges],
+                               dtype=numpy.int64).reshape(len(edges))
+
+        n_nodes = len(self.nodes)
+        self.out_ptr = numpy.zeros(n_nodes + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(self.src, minlength=n_nodes),
+                     out=self.out_ptr[1:])
+
+        # in edges in the order networkx reports them
+        edge_id = {(e[0], e[1], e[2]): i for i, e in enumerate(edges)}
+        in_idx = [edge_id[e] for n in self.nodes
+                  for e in G.in_edges(n, keys=True)]
+        self.in_idx = numpy.array(in_idx, dtype=numpy.int64)
+        self.in_ptr = numpy.zeros(n_nodes + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(self.dst, minlength=n_nodes),
+                     out=self.in_ptr[1:])
+
+        if order is None:
+            self.topo = self._topological_order(G)
+        else:
+            self.topo = numpy.array([self.index[n] for n in order],
+                                    dtype=numpy.int64)
+
+    def _topological_order(self, G):
+        """Kahn's algorithm over the edge arrays. Cycles are reported by
+        `util.validate_swmmnetwork`.
+        """
+        n_nodes = len(self.nodes)
+        indegree = numpy.bincount(self.dst, minlength=n_nodes)
+        succ = self.dst.tolist()
+        ptr = self.out_ptr.tolist()
+        indegree = indegree.tolist()
+
+        order = [i for i in range(n_nodes) if indegree[i] == 0]
+        for i in order:
+            for j in succ[ptr[i]:ptr[i + 1]]:
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    order.append(j)
+
+        if len(order) < n_nodes:
+            validate_swmmnetwork(G)  # raises with the cycles listed
+        return numpy.array(order, dtype=numpy.int64)
+
+    @property
+    def n_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def n_edges(self):
+        return len(self.src)
+
+    def topological_sort(self):
+        """node names in topological order."""
+        return [self.nodes[i] for i in self.topo]
+
+    @property
+    def levels(self):
+        """longest distance of each node from a source node, in node index
+        order.
+        """
+        level = numpy.zeros(self.n_nodes, dtype=numpy.int64)
+        dst = self.dst
+        for i in self.topo:
+            e0, e1 = self.out_ptr[i], self.out_ptr[i + 1]
+            if e1 > e0:
+                d = dst[e0:e1]
+                level[d] = numpy.maximum(level[d], level[i] + 1)
+        return level
+
+    def _out_ids(self, node):
+        i = self.index[node]
+        return range(self.out_ptr[i], self.out_ptr[i + 1])
+
+    def _in_ids(self, node):
+        i = self.index[node]
+        return self.in_idx[self.in_ptr[i]:self.in_ptr[i + 1]]
+
+    def _edge_tuples(self, ids, data=False, keys=False):
+        nodes, src, dst = self.nodes, self.src, self.dst
+        res = []
+        for e in ids:
+            edge = (nodes[src[e]], nodes[dst[e]])
+            if keys:
+                edge += (self.keys[e], )
+            if data:
+                edge += (self.edge_data[e], )
+            res.append(edge)
+        return res
+
+    def out_edges(self, node, data=False, keys=False):
+        return self._edge_tuples(self._out_ids(node), data=data, keys=keys)
+
+    def in_edges(self, node, data=False, keys=False):
+        return self._edge_tuples(self._in_ids(node), data=data, keys=keys)
+
+    # directed graphs report their out edges as their edges
+    edges = out_edges
+
+    def successors(self, node):
+        seen = []
+        for e in self._out_ids(node):
+            n = self.nodes[self.dst[e]]
+            if n not in seen:
+                seen.append(n)
+        return seen
+
+    def predecessors(self, node):
+        seen = []
+        for e in self._in_ids(node):
+            n = self.nodes[self.src[e]]
+            if n not in seen:
+                seen.append(n)
+        return seen
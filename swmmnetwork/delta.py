@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""Differences of the results of two solved states of one network, e.g.,
+the 'existing' and 'proposed' conditions of a design review.
+"""
+
+import numpy
+import pandas
+
+from .cache import _column_array
+
+
+STATS = ['base', 'other', 'diff', 'pct_change']
+
+
+class Delta(object):
+    """The differences of result columns between two solved states.
+
+    Attributes
+    ----------
+    index : list
+        the nodes or edges compared.
+    columns : list
+        the result columns compared, e.g., 'load1_load_eff'.
+    base, other : numpy.ndarray shaped (items, columns)
+        the results of each state. Missing results are NaN.
+
+    """
+
+    def __init__(self, index, columns, base, other):
+        self.index = list(index)
+        self.columns = list(columns)
+        self.base = numpy.asarray(base, dtype=float)
+        self.other = numpy.asarray(other, dtype=float)
+        if self.base.shape != self.other.shape:
+            raise ValueError('Both states must have the same shape.')
+
+    @property
+    def diff(self):
+        """`other` minus `base`."""
+        return self.other - self.base
+
+    @property
+    def pct_change(self):
+        """the change relative to `base`, in percent. Changes from zero are
+        infinite, and zero to zero is no change.
+        """
+        diff = self.diff
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            pct = 100 * diff / numpy.abs(self.base)
+        pct[diff == 0] = 0.0
+        return pct
+
+    def changed(self, abs_tol=0.0, pct_tol=0.0):
+        """whether each item changed meaningfully.
+
+        An item changed if, for any column, its difference exceeds
+        `abs_tol` in magnitude and its percent change exceeds `pct_tol`,
+        or if the result is missing in only one of the states.
+
+        Returns
+        -------
+        numpy.ndarray of bool shaped (items,)
+        """
+        with numpy.errstate(invalid='ignore'):
+            big = ((numpy.abs(self.diff) > abs_tol) &
+                   (numpy.abs(self.pct_change) > pct_tol))
+        missing = numpy.isnan(self.base) != numpy.isnan(self.other)
+        return (big | missing).any(axis=1)
+
+    def to_frame(self, abs_tol=None, pct_tol=None):
+        """a pandas.DataFrame of the base and other values, difference and
+        percent change of each column.
+
+        Parameters
+        ----------
+        abs_tol, pct_tol : float, optional (default=None)
+            if either is given, only the items that changed by more than
+            both, see `changed`, are returned.
+
+        Returns
+        -------
+        pandas.DataFrame
+            with a '<column>_base', '_other', '_diff' and '_pct_change'
+            column per result column.
+        """
+        stats = [self.base, self.other, self.diff, self.pct_change]
+        values = numpy.stack(stats, axis=-1).reshape(len(self.index), -1)
+        index = pandas.Index(self.index)
+        if abs_tol is not None or pct_tol is not None:
+            keep = self.changed(abs_tol=abs_tol or 0.0, pct_tol=pct_tol or 0.0)
+            values = values[keep]
+            index = index[keep]
+        return pandas.DataFrame(
+            values,
+            index=index,
+            columns=['{}_{}'.format(c, s) for c in self.columns
+                     for s in STATS],
+        )
+
+
+def _records(G, kind, edge_name_col):
+    if kind == 'node':
+        return list(G.nodes()), [G.node[n] for n in G.nodes()]
+    elif kind == 'edge':
+        edges = list(G.edges(data=True))
+        return [d.get(edge_name_col) for _, _, d in edges], [
+            d for _, _, d in edges]
+    raise ValueError("`kind` must be one of 'node' or 'edge'.")
+
+
+def _numeric_columns(records):
+    cols = sorted(set([k for r in records for k in r]))
+    numeric = []
+    for col in cols:
+        packed = _column_array([r.get(col) for r in records])
+        if packed is not None and packed[0].dtype.kind in 'if':
+            numeric.append(col)
+    return numeric
+
+
+def _values(records, columns):
+    return numpy.array(
+        [[numpy.nan if r.get(c) is None else r.get(c) for c in columns]
+         for r in records],
+        dtype=float).reshape(len(records), len(columns))
+
+
+def graph_delta(G, other, columns=None, kind='node', edge_name_col='id'):
+    """compare the solved results of two networks with the same nodes and
+    edges, e.g., a network and a copy of it solved with other loads or
+    treatment.
+
+    The results are read from the node or edge attributes of each graph
+    and aligned by node or edge name, without building a table of either.
+
+    Parameters
+    ----------
+    G, other : networkx.MultiDiGraph
+        the base and the other solved state.
+    columns : list, optional (default=None)
+        the results to compare. Defaults to every numeric attribute of
+        `G`, e.g., 'volume_eff' or 'load1_load_eff'.
+    kind : {'node', 'edge'}, optional (default='node')
+    edge_name_col : string, optional (default='id')
+        the edge attribute that names each edge.
+
+    Returns
+    -------
+    Delta
+    """
+
+    names, records = _records(G, kind, edge_name_col)
+    other_names, other_records = _records(other, kind, edge_name_col)
+    if len(set(names)) != len(names):
+        raise ValueError('The {}s must have unique names.'.format(kind))
+    lookup = dict(zip(other_names, other_records))
+    if len(lookup) != len(names) or any([n not in lookup for n in names]):
+        e = 'Both networks must have the same {}s.'.format(kind)
+        raise ValueError(e)
+
+    if columns is None:
+        columns = _numeric_columns(records)
+    columns = list(columns)
+    return Delta(
+        names,
+        columns,
+        _values(records, columns),
+        _values([lookup[n] for n in names], columns),
+    )
+
+
+def _scenario_position(result, scenario):
+    try:
+        return result.scenarios.index(scenario)
+    except ValueError:
+        raise KeyError('No scenario {!r} in the result.'.format(scenario))
+
+
+def _batch_columns(result, attrs):
+    cols = []
+    for attr in attrs:
+        suffix = attr.split('_', 1)[1]
+        cols += ['{}_{}'.format(c, suffix) for c in result.network.load_cols]
+    return cols
+
+
+def batch_delta(result, base, other, attrs=None):
+    """compare the node results of two scenarios of a
+    `compiled.BatchResult`.
+
+    The arrays of each scenario are sliced from the result without a copy
+    of the batch.
+
+    Parameters
+    ----------
+    result : compiled.BatchResult
+    base, other : scenario names
+        the base and the other state, from `result.scenarios`.
+    attrs : list, optional (default=None)
+        the node results to compare, e.g., 'node_load_in'. Defaults to
+        ['node_load_eff']. The inflow volume is always compared.
+
+    Returns
+    -------
+    Delta
+        with a 'volume_in' column and a '<pollutant>_<result>' column per
+        pollutant and result, e.g., 'TSS_load_eff'.
+    """
+    attrs = ['node_load_eff'] if attrs is None else list(attrs)
+    states = []
+    for scenario in (base, other):
+        s = _scenario_position(result, scenario)
+        arrays = [result.node_vol_in[s][:, numpy.newaxis]]
+        arrays += [getattr(result, attr)[s] for attr in attrs]
+        states.append(numpy.concatenate(arrays, axis=1))
+
+    columns = ['volume_in'] + _batch_columns(result, attrs)
+    return Delta(result.nodes, columns, *states)
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import os
+
+import numpy
+import pandas
+
+from .compiled import CompiledNetwork
+from .core import resolve_treatment_table
+from .parallel import _pool_context
+from .util import _to_list
+
+
+# per process state of the pool workers
+_WORKER = {}
+
+
+def _init_worker(network, objective):
+    _WORKER['network'] = network
+    _WORKER['objective'] = objective
+
+
+def _evaluate_chunk(args):
+    edge_bmp, edge_vol_reduced = args
+    result = _WORKER['network'].solve(
+        edge_bmp=edge_bmp, edge_vol_reduced=edge_vol_reduced)
+    return _WORKER['objective'](result.node_load_eff)
+
+
+class _Evaluator(object):
+    """score many bmp placements per batched solve, optionally split over
+    a pool of worker processes.
+    """
+
+    def __init__(self, network, objective, processes=1, chunksize=256):
+        self.network = network
+        self.objective = objective
+        self.processes = processes
+        self.chunksize = chunksize
+        self.pool = None
+        if processes > 1:
+            self.pool = _pool_context().Pool(
+                processes, initializer=_init_worker,
+                initargs=(network, objective))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __call__(self, edge_bmp, edge_vol_reduced):
+        n = len(edge_bmp)
+        chunksize = self.chunksize
+        if self.pool is not None:
+            chunksize = min(chunksize, -(-n // self.processes))
+        chunks = [(edge_bmp[i:i + chunksize],
+                   edge_vol_reduced[i:i + chunksize])
+                  for i in range(0, n, chunksize)]
+
+        if self.pool is None:
+            _init_worker(self.network, self.objective)
+            try:
+                scores = [_evaluate_chunk(c) for c in chunks]
+            finally:
+                _WORKER.clear()
+        else:
+            scores = self.pool.map(_evaluate_chunk, chunks)
+        return numpy.concatenate(scores)
+
+
+def _outfall_objective(node_index, weights):
+    def objective(node_load_eff):
+        return (node_load_eff[:, node_index, :] * weights).sum(axis=(1, 2))
+    return objective
+
+
+def site_bmps(G, candidates, budget, outfalls, weights=None,
+              load_cols=None, bmp_performance_mapping_conc=None,
+              vol_reduced_flags=['INF'], local_search=True,
+              max_iterations=100, processes=None, **kwargs):
+    """choose bmp placements that remove the most load at `outfalls`
+    within a budget.
+
+    Placements are added greedily by their marginal load removed per unit
+    cost. Greedy steps can miss one costly placement that removes more
+    than several cheap ones, so the best single placement is kept instead
+    if it removes more. The selection is then improved by local search,
+    which swaps one selected placement for an unselected one while the
+    load removed increases. After each of these changes, any budget left
+    over is spent greedily again. Every round evaluates all its trial
+    placements in batched solves of the compiled network, split over
+    `processes`.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+    candidates : pandas.DataFrame or list of dicts
+        one row per candidate with the columns 'edge' (the `edge_name_col`
+        value of the link), 'flag' (the bmp type) and 'cost'. An edge may
+        have several candidate bmp types; at most one is chosen.
+    budget : float
+        the maximum total cost.
+    outfalls : list
+        the nodes whose effluent load is minimized.
+    weights : dict, optional (default=None)
+        weight of each pollutant in the objective. Defaults to 1 each.
+    load_cols : list of strings
+    bmp_performance_mapping_conc : dict, optional (default=None)
+        the performance function of each bmp flag and pollutant. Flags in
+        `vol_reduced_flags` remove all load instead.
+    vol_reduced_flags : list of strings, optional (default=['INF'])
+    local_search : bool, optional (default=True)
+    max_iterations : int, optional (default=100)
+        limit of local search swaps.
+    processes : int, optional (default=None)
+        number of worker processes. Defaults to the number of cores.
+    **kwargs
+        passed to `compiled.CompiledNetwork.from_graph`.
+
+    Returns
+    -------
+    selected : pandas.DataFrame
+        the chosen rows of `candidates`. The 'load_removed' column is the
+        removal lost if that placement alone were dropped.
+    frontier : pandas.DataFrame
+        the total 'cost' and 'load_removed' after each greedy step, i.e.,
+        the cost-effectiveness frontier, with the 'edge' added at each
+        step. If the best single placement or local search improved on
+        the greedy steps, a last row without an 'edge' holds the totals
+        of `selected`, so the last row is always the returned selection.
+    """
+
+    load_cols = _to_list(load_cols)
+    vol_reduced_flags = _to_list(vol_reduced_flags)
+    outfalls = _to_list(outfalls)
+    if bmp_performance_mapping_conc is None:
+        bmp_performance_mapping_conc = {}
+
+    candidates = pandas.DataFrame(candidates).reset_index(drop=True)
+    missing = [c for c in ['edge', 'flag', 'cost'] if c not in candidates]
+    if missing:
+        e = 'Candidates are missing the columns {}.'.format(missing)
+        raise ValueError(e)
+
+    network = CompiledNetwork.from_graph(
+        G, load_cols=load_cols, vol_reduced_flags=vol_reduced_flags,
+        bmp_performance_mapping_conc=bmp_performance_mapping_conc, **kwargs)
+
+    # add the candidate bmp types to the compiled flags
+    for flag in candidates.flag.unique():
+        if flag not in vol_reduced_flags and flag not in network.flags:
+            network.flags.append(flag)
+    network.treatment_table, _ = resolve_treatment_table(
+        bmp_performance_mapping_conc, load_cols, flags=network.flags)
+
+    edge_pos = pandas.Index(network.edge_ids).get_indexer(candidates.edge)
+    if (edge_pos < 0).any():
+        e = 'Candidate edges not in the network: {}'.format(
+            candidates.edge[edge_pos < 0].tolist())
+        raise ValueError(e)
+
+    is_inf = candidates.flag.isin(vol_reduced_flags).values
+    codes = numpy.array([
+        -1 if inf else network.flags.index(flag)
+        for flag, inf in zip(candidates.flag, is_inf)])
+    cost = candidates.cost.values.astype(float)
+
+    if weights is None:
+        weights = {}
+    w = numpy.array([weights.get(c, 1.0) for c in load_cols])
+    objective = _outfall_objective(
+        [network.node_index[o] for o in outfalls], w)
+
+    def placements(selections):
+        bmp = numpy.tile(network.edge_bmp, (len(selections), 1))
+        inf = numpy.tile(network.edge_vol_reduced, (len(selections), 1))
+        for i, sel in enumerate(selections):
+            sel = list(sel)
+            bmp[i, edge_pos[sel]] = numpy.where(
+                is_inf[sel], bmp[i, edge_pos[sel]], codes[sel])
+            inf[i, edge_pos[sel]] |= is_inf[sel]
+        return bmp, inf
+
+    def allowed(sel, spent):
+        used = set(edge_pos[list(sel)])
+        return [j for j in range(len(candidates))
+                if j not in sel and edge_pos[j] not in used and
+                spent + cost[j] <= budget]
+
+    def fill(selected, spent, current, steps=None):
+        # greedy: add the best removal per unit cost until nothing fits.
+        first = None
+        while True:
+            trials = allowed(selected, spent)
+            if not trials:
+                break
+            scores = evaluate(*placements([selected + [j] for j in trials]))
+            if first is None:
+                first = trials, scores
+            gain = current - scores
+            ratio = gain / numpy.maximum(cost[trials], 1e-12)
+            best = int(numpy.argmax(ratio))
+            if gain[best] <= 0:
+                break
+            j = trials[best]
+            selected = selected + [j]
+            spent += cost[j]
+            current = scores[best]
+            if steps is not None:
+                steps.append({'step': len(selected),
+                              'edge': candidates.edge[j],
+                              'cost': spent,
+                              'load_removed': base - current})
+        return selected, spent, current, first
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    evaluate = _Evaluator(network, objective, processes=processes)
+    try:
+        base = evaluate(*placements([[]]))[0]
+
+        frontier = [{'step': 0, 'edge': None, 'cost': 0.,
+                     'load_removed': 0.}]
+        selected, spent, current, singles = fill([], 0., base, frontier)
+        improved = False
+
+        if singles is not None:
+            trials, scores = singles
+            best = int(numpy.argmin(scores))
+            if scores[best] < current:
+                j = trials[best]
+                selected, spent, current, _ = fill(
+                    [j], cost[j], scores[best])
+                improved = True
+
+        # local search: swap one placement for another while it helps,
+        # then spend any budget the swap freed up.
+        for _ in range(max_iterations if local_search else 0):
+            trials = []
+            for i in selected:
+                rest = [k for k in selected if k != i]
+                rest_cost = spent - cost[i]
+                trials.extend([rest + [j] for j in allowed(rest, rest_cost)
+                               if j != i])
+            if not trials:
+                break
+            scores = evaluate(*placements(trials))
+            best = int(numpy.argmin(scores))
+            if scores[best] >= current - 1e-12 * max(abs(current), 1):
+                break
+            selected, spent, current, _ = fill(
+                trials[best], cost[trials[best]].sum(), scores[best])
+            improved = True
+
+        if improved:
+            frontier.append({'step': len(selected), 'edge': None,
+                             'cost': spent, 'load_removed': base - current})
+
+        # the removal lost without each placement
+        if selected:
+            drop = evaluate(*placements(
+                [[k for k in selected if k != i] for i in selected]))
+            share = drop - current
+        else:
+            share = []
+    finally:
+        evaluate.close()
+
+    selected = candidates.loc[selected].assign(load_removed=share)
+    frontier = pandas.DataFrame(
+        frontier, columns=['step', 'edge', 'cost', 'load_removed'])
+
+    return selected, frontier
+
+
+def required_removal(G, targets, edges, per_edge=False, load_cols=None,
+                     bmp_performance_mapping_conc=None, tol=1e-4,
+                     trials=16, **kwargs):
+    """the smallest removal efficiency at `edges` that brings the effluent
+    load of each outfall down to its target.
+
+    The efficiency is applied to the effluent concentration of the edges
+    on top of any treatment they already have. Each (outfall, pollutant)
+    pair is bracketed on [0, 1] and the bracket is narrowed by evaluating
+    `trials` evenly spaced efficiencies for every pair in one batched solve
+    per iteration, so only about ``log(1 / tol) / log(trials + 1)`` solves
+    are needed.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+    targets : pandas.DataFrame or dict
+        the target load of each outfall, indexed by outfall with a column
+        per pollutant, e.g., TMDL allocations.
+    edges : list
+        the `edge_name_col` values of the candidate bmp edges.
+    per_edge : bool, optional (default=False)
+        if False, one efficiency is applied to all of `edges` at once.
+        If True, the efficiency needed is found for each edge acting alone.
+    load_cols : list of strings, optional (default=None)
+        the pollutants. Defaults to the columns of `targets`.
+    bmp_performance_mapping_conc : dict, optional (default=None)
+    tol : float, optional (default=1e-4)
+        width of the final bracket.
+    trials : int, optional (default=16)
+        number of efficiencies evaluated per pair and iteration.
+    **kwargs
+        passed to `compiled.CompiledNetwork.from_graph`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        the required efficiency, indexed by outfall (or by edge and outfall
+        if `per_edge`) with a column per pollutant. It is 0 where the target
+        is already met and NaN where it cannot be met even by removing all
+        of the load at the edges.
+    """
+
+    targets = pandas.DataFrame(targets)
+    if load_cols is None:
+        load_cols = targets.columns.tolist()
+    load_cols = _to_list(load_cols)
+    targets = targets.reindex(columns=load_cols)
+
+    network = CompiledNetwork.from_graph(
+        G, load_cols=load_cols,
+        bmp_performance_mapping_conc=bmp_performance_mapping_conc, **kwargs)
+
+    edges = _to_list(edges)
+    edge_pos = pandas.Index(network.edge_ids).get_indexer(edges)
+    if (edge_pos < 0).any():
+        e = 'Edges not in the network: {}'.format(
+            [n for n, i in zip(edges, edge_pos) if i < 0])
+        raise ValueError(e)
+
+    # the edges treated together in each group
+    groups = [[i] for i in edge_pos] if per_edge else [list(edge_pos)]
+
+    outfalls = targets.index.tolist()
+    outfall_pos = numpy.array([network.node_index[o] for o in outfalls])
+    target = targets.values.astype(float)  # (outfalls, pollutants)
+
+    n_groups, n_out, n_poll = len(groups), len(outfalls), len(load_cols)
+    group_mask = numpy.zeros((n_groups, network.n_edges), dtype=bool)
+    for g, pos in enumerate(groups):
+        group_mask[g, pos] = True
+
+    def outfall_loads(efficiency):
+        """outfall loads of (groups, trials, pollutants) efficiencies,
+        shaped (groups, trials, outfalls, pollutants).
+        """
+        k = efficiency.shape[1]
+        removal = (
+            group_mask[:, numpy.newaxis, :, numpy.newaxis] *
+            efficiency[:, :, numpy.newaxis, :]
+        ).reshape(n_groups * k, network.n_edges, n_poll)
+        res = network.solve(edge_removal=removal)
+        return res.node_load_eff[:, outfall_pos, :].reshape(
+            n_groups, k, n_out, n_poll)
+
+    ends = numpy.broadcast_to(
+        numpy.array([0., 1.])[numpy.newaxis, :, numpy.newaxis],
+        (n_groups, 2, n_poll))
+    bounds = outfall_loads(ends)
+    met_at_zero = bounds[:, 0] <= target
+    feasible = bounds[:, 1] <= target
+
+    lo = numpy.zeros((n_groups, n_out, n_poll))
+    hi = numpy.ones((n_groups, n_out, n_poll))
+    steps = numpy.arange(1, trials + 1) / (trials + 1)
+    ends_steps = numpy.concatenate([[0.], steps, [1.]])
+    active = feasible & ~met_at_zero
+    while active.any() and (hi - lo)[active].max() > tol:
+        # every (group, outfall, pollutant) bracket gets its own trials;
+        # the outfalls are spread over the trial axis of one solve.
+        eff = lo[:, :, numpy.newaxis, :] + (
+            (hi - lo)[:, :, numpy.newaxis, :] *
+            steps[numpy.newaxis, numpy.newaxis, :, numpy.newaxis])
+        loads = outfall_loads(eff.reshape(n_groups, n_out * trials, n_poll))
+        loads = loads.reshape(n_groups, n_out, trials, n_out, n_poll)
+        own = loads[:, numpy.arange(n_out), :, numpy.arange(n_out), :]
+        own = own.transpose(1, 0, 2, 3)  # (groups, outfalls, trials, polls)
+
+        ok = own <= target[numpy.newaxis, :, numpy.newaxis, :]
+        # loads fall as the efficiency rises, so the first passing trial
+        # is the new upper end and the one before it the new lower end.
+        first = numpy.where(ok.any(axis=2), ok.argmax(axis=2), trials)
+        width = hi - lo
+        new_lo = lo + width * ends_steps[first]
+        new_hi = lo + width * ends_steps[first + 1]
+        hi = numpy.where(active, new_hi, hi)
+        lo = numpy.where(active, new_lo, lo)
+        active = active & ((hi - lo) > tol)
+
+    result = numpy.where(met_at_zero, 0., numpy.where(feasible, hi, numpy.nan))
+
+    if per_edge:
+        index = pandas.MultiIndex.from_product(
+            [edges, outfalls], names=['edge', 'outfall'])
+    else:
+        index = pandas.Index(outfalls, name='outfall')
+    return pandas.DataFrame(
+        result.reshape(-1, n_poll), index=index, columns=load_cols)
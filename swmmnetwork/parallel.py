@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import os
+import multiprocessing
+
+import numpy
+
+from .compiled import (CompiledNetwork, BatchResult, NETWORK_ARRAYS,
+                       RESULT_ARRAYS)
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover
+    shared_memory = None
+
+
+class SharedArrays(object):
+    """A dict of numpy arrays packed into one `multiprocessing.shared_memory`
+    block.
+
+    Parameters
+    ----------
+    layout : list of tuples
+        (name, dtype string, shape, offset) of each array in the block.
+    name : string, optional (default=None)
+        the name of an existing block to attach to. If None, a new block is
+        created that is large enough for the layout.
+
+    """
+
+    def __init__(self, layout, name=None):
+        if shared_memory is None:  # pragma: no cover
+            e = 'Shared memory requires python 3.8 or later.'
+            raise RuntimeError(e)
+
+        self.layout = layout
+        size = max([1] + [
+            offset + numpy.dtype(dtype).itemsize * int(numpy.prod(shape))
+            for _, dtype, shape, offset in layout])
+
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.arrays = {
+            key: numpy.ndarray(shape, dtype=dtype, buffer=self.shm.buf,
+                               offset=offset)
+            for key, dtype, shape, offset in layout
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """allocate a block for `arrays` and copy them into it."""
+        layout = cls.make_layout(
+            [(k, v.dtype.str, v.shape) for k, v in arrays.items()])
+        shared = cls(layout)
+        for key, arr in arrays.items():
+            shared.arrays[key][...] = arr
+        return shared
+
+    @staticmethod
+    def make_layout(specs):
+        """compute 64-byte aligned offsets for (name, dtype, shape) specs."""
+        layout = []
+        offset = 0
+        for key, dtype, shape in specs:
+            layout.append((key, dtype, tuple(shape), offset))
+            nbytes = numpy.dtype(dtype).itemsize * int(numpy.prod(shape))
+            offset += -(-nbytes // 64) * 64
+        return layout
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+# per process state of the pool workers
+_WORKER = {}
+
+
+def _init_worker(in_name, in_layout, out_name, out_layout, load_cols,
+                 flags, treatment_table):
+    shared_in = SharedArrays(in_layout, name=in_name)
+    shared_out = SharedArrays(out_layout, name=out_name)
+    _WORKER['in'] = shared_in
+    _WORKER['out'] = shared_out
+    _WORKER['network'] = CompiledNetwork(
+        shared_in.arrays, load_cols=load_cols, flags=flags,
+        treatment_table=treatment_table)
+
+
+def _solve_slice(bounds):
+    start, stop = bounds
+    network = _WORKER['network']
+    loads = _WORKER['in'].arrays['loads'][start:stop]
+    out = {k: v[start:stop] for k, v in _WORKER['out'].arrays.items()}
+    network.solve(loads, out=out)
+    return bounds
+
+
+def _pool_context():
+    # fork lets the workers inherit the performance functions, which are
+    # often lambdas that cannot be pickled.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()  # pragma: no cover
+
+
+def run_scenarios(network, loads, processes=None, chunksize=None,
+                  edge_results=False, dtype=None, **solve_kwargs):
+    """solve many load scenarios on one network with a process pool.
+
+    The compiled network arrays and the scenario loads are written once to
+    a shared memory block that every worker maps read-only, so neither the
+    graph nor the load vectors are serialized per task. Workers receive
+    only the bounds of a slice of scenarios and write their results into a
+    second shared block.
+
+    Parameters
+    ----------
+    network : CompiledNetwork or networkx.MultiDiGraph
+        the network to solve. Graphs are compiled with `solve_kwargs`.
+    loads : array or list of pandas.DataFrame
+        the scenario loads, see `CompiledNetwork.load_matrix`.
+    processes : int, optional (default=None)
+        number of worker processes. Defaults to the number of cores.
+    chunksize : int, optional (default=None)
+        number of scenarios solved per task. Defaults to an even split of
+        the scenarios over the workers.
+    edge_results : bool, optional (default=False)
+        whether to also return the (scenarios, edges, pollutants) edge
+        effluent loads.
+    dtype : numpy.dtype, optional (default=None)
+        the dtype of the stored results, e.g., numpy.float32. See
+        `CompiledNetwork.solve`.
+    **solve_kwargs
+        passed to `CompiledNetwork.from_graph`, e.g., `load_cols`,
+        `tmnt_flags` and `bmp_performance_mapping_conc`.
+
+    Returns
+    -------
+    BatchResult
+    """
+
+    if not isinstance(network, CompiledNetwork):
+        network = CompiledNetwork.from_graph(network, **solve_kwargs)
+
+    loads = network.load_matrix(loads)
+    n_scenarios = loads.shape[0]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, n_scenarios))
+
+    results = RESULT_ARRAYS if edge_results else RESULT_ARRAYS[:2]
+    if processes == 1:
+        return network.solve(loads, dtype=dtype, results=results)
+
+    if chunksize is None:
+        chunksize = -(-n_scenarios // processes)
+
+    arrays = {k: network.arrays[k] for k in NETWORK_ARRAYS}
+    arrays['loads'] = loads
+    n_poll = len(network.load_cols)
+    dtype = numpy.dtype(float if dtype is None else dtype).str
+    shapes = {
+        'node_load_in': (n_scenarios, network.n_nodes, n_poll),
+        'node_load_eff': (n_scenarios, network.n_nodes, n_poll),
+        'edge_load_eff': (n_scenarios, network.n_edges, n_poll),
+    }
+    out_specs = [(k, dtype, shapes[k]) for k in results]
+
+    shared_in = SharedArrays.from_arrays(arrays)
+    shared_out = SharedArrays(SharedArrays.make_layout(out_specs))
+    try:
+        initargs = (shared_in.name, shared_in.layout, shared_out.name,
+                    shared_out.layout, network.load_cols, network.flags,
+                    network.treatment_table)
+        bounds = [(i, min(i + chunksize, n_scenarios))
+                  for i in range(0, n_scenarios, chunksize)]
+
+        pool = _pool_context().Pool(
+            processes, initializer=_init_worker, initargs=initargs)
+        try:
+            for _ in pool.imap_unordered(_solve_slice, bounds):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+
+        stored = {k: v.copy() for k, v in shared_out.arrays.items()}
+
+    finally:
+        shared_in.unlink()
+        shared_out.unlink()
+
+    _, vol_in = network.volume_matrix(n_scenarios=n_scenarios)
+    return BatchResult(network, node_vol_in=vol_in.T.astype(dtype), **stored)
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+"""Edits of an existing network from a diff table or SWMM input fragments.
+
+A patch is a table with a row per link or node to change:
+
+type
+    'link' (default) or 'node'.
+id
+    the name of the link (its `edge_name_col` attribute) or node.
+action (optional)
+    'set' (default) adds the link or node, or updates it if it exists.
+    'remove' removes it; removing a node removes its links.
+new_id (optional)
+    renames a link, e.g., to add a treatment flag.
+inlet_node, outlet_node (optional)
+    the ends of a new link, or the new ends of a rerouted link.
+
+Every other column is an attribute, e.g., 'volume' or 'xtype'. Blank
+values leave the attribute unchanged.
+"""
+
+import os
+import functools
+
+import pandas
+
+from .convert import SWMM_LINK_TYPES, SWMM_NODE_TYPES
+from .util import _is_blank, _to_list
+
+
+PATCH_COLUMNS = ['type', 'id', 'action', 'new_id', 'inlet_node',
+                 'outlet_node']
+
+
+def _xtype(section):
+    return section if section[-1] != 's' else section[:-1]
+
+
+LINK_SECTIONS = {s.upper(): _xtype(s) for s in SWMM_LINK_TYPES}
+
+NODE_SECTIONS = {s.upper(): _xtype(s) for s in SWMM_NODE_TYPES
+                 if s != 'subcatchments'}
+
+
+def _inp_sections(text):
+    """the rows of each section of SWMM input text, as lists of fields."""
+    sections = {}
+    section = None
+    for line in text.splitlines():
+        line = line.split(';', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            section = line[1:-1].strip().upper()
+            sections.setdefault(section, [])
+        elif section is not None:
+            sections[section].append(line.split())
+    return sections
+
+
+def read_inp_patch(inp, rename=None, remove=None):
+    """the patch table of a fragment of a SWMM input file.
+
+    The links and nodes of the [SUBCATCHMENTS], [JUNCTIONS], [OUTFALLS],
+    [DIVIDERS], [STORAGE], [CONDUITS], [WEIRS], [ORIFICES], [OUTLETS] and
+    [PUMPS] sections are added, or rerouted if they exist. Other sections
+    are ignored. Names are upper cased as by `convert.from_swmm_inp`.
+
+    Parameters
+    ----------
+    inp : string
+        the path of the fragment, or its text.
+    rename : dict, optional (default=None)
+        {old link name: new link name}, applied before the fragment.
+    remove : list, optional (default=None)
+        link names to remove, applied before the fragment.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+
+    if os.path.isfile(inp):
+        with open(inp) as f:
+            inp = f.read()
+
+    rows = []
+    for old, new in (rename or {}).items():
+        rows.append({'id': str(old).upper(), 'new_id': str(new).upper()})
+    for name in _to_list(remove):
+        rows.append({'id': str(name).upper(), 'action': 'remove'})
+
+    for section, fields in _inp_sections(inp).items():
+        for row in fields:
+            row = [f.upper() for f in row]
+            if section == 'SUBCATCHMENTS':
+                rows.append({'type': 'node', 'id': row[0],
+                             'xtype': 'subcatchment'})
+                rows.append({'id': '^' + row[0], 'inlet_node': row[0],
+                             'outlet_node': row[2], 'xtype': 'dt'})
+            elif section in NODE_SECTIONS:
+                rows.append({'type': 'node', 'id': row[0],
+                             'xtype': NODE_SECTIONS[section]})
+            elif section in LINK_SECTIONS:
+                rows.append({'id': row[0], 'inlet_node': row[1],
+                             'outlet_node': row[2],
+                             'xtype': LINK_SECTIONS[section]})
+
+    return pandas.DataFrame(rows, columns=PATCH_COLUMNS + ['xtype'])
+
+
+def _get(row, col, default=None):
+    value = row.get(col)
+    return default if _is_blank(value) else value
+
+
+class _Patcher(object):
+    """applies the rows of one patch, recording how to undo each edit."""
+
+    def __init__(self, G, edge_name_col, vol_col):
+        self.G = G
+        self.edge_name_col = edge_name_col
+        self.vol_col = vol_col
+        self.links = {
+            str(d.get(edge_name_col)): (u, v, k)
+            for u, v, k, d in G.edges(keys=True, data=True)
+        }
+        self.dirty = set()
+        self.undo = []
+
+    def _add_edge(self, u, v, key=None, **data):
+        for n in (u, v):
+            if n not in self.G:
+                self.undo.append(functools.partial(self.G.remove_node, n))
+        key = self.G.add_edge(u, v, key=key, **data)
+        self.undo.append(functools.partial(self.G.remove_edge, u, v, key))
+        return key
+
+    def _remove_edge(self, u, v, key):
+        data = self.G[u][v][key]
+        self.G.remove_edge(u, v, key)
+        self.undo.append(functools.partial(
+            self.G.add_edge, u, v, key=key, **data))
+        return data
+
+    def _update(self, data, values):
+        old = dict(data)
+        data.update(values)
+
+        def restore():
+            data.clear()
+            data.update(old)
+        self.undo.append(restore)
+
+    def set_link(self, row, values):
+        name = str(row['id'])
+        new_id = _get(row, 'new_id')
+        inlet = _get(row, 'inlet_node')
+        outlet = _get(row, 'outlet_node')
+
+        if name not in self.links:
+            if inlet is None or outlet is None:
+                e = 'The new link {!r} needs an inlet and an outlet node.'
+                raise ValueError(e.format(name))
+            data = {self.edge_name_col: row['id'], self.vol_col: 0.0}
+            data.update(values)
+            if new_id is not None:
+                data[self.edge_name_col] = new_id
+            key = self._add_edge(inlet, outlet, **data)
+            self.links[str(data[self.edge_name_col])] = (inlet, outlet, key)
+            self.dirty.add(inlet)
+            return
+
+        u, v, key = self.links[name]
+        inlet = u if inlet is None else inlet
+        outlet = v if outlet is None else outlet
+        if (inlet, outlet) != (u, v):
+            # the link keeps its attributes; its old outlet loses the flow
+            data = self._remove_edge(u, v, key)
+            self.dirty.update([u, v])
+            u, v = inlet, outlet
+            key = self._add_edge(u, v, **data)
+
+        data = self.G[u][v][key]
+        if new_id is not None and str(new_id) != name:
+            if str(new_id) in self.links:
+                e = 'Cannot rename {!r}; the link {!r} already exists.'
+                raise ValueError(e.format(name, new_id))
+            values = dict(values)
+            values[self.edge_name_col] = new_id
+            del self.links[name]
+            name = str(new_id)
+        self._update(data, values)
+        self.links[name] = (u, v, key)
+        self.dirty.add(u)
+
+    def remove_link(self, row):
+        name = str(row['id'])
+        if name not in self.links:
+            raise KeyError('No link {!r} in the network.'.format(name))
+        u, v, key = self.links.pop(name)
+        self._remove_edge(u, v, key)
+        self.dirty.update([u, v])
+
+    def set_node(self, row, values):
+        node = row['id']
+        if _get(row, 'new_id') is not None:
+            raise ValueError('Nodes cannot be renamed by a patch.')
+        if node in self.G:
+            self._update(self.G.node[node], values)
+        else:
+            self.G.add_node(node, **values)
+            self.undo.append(functools.partial(self.G.remove_node, node))
+        self.dirty.add(node)
+
+    def remove_node(self, row):
+        node = row['id']
+        if node not in self.G:
+            raise KeyError('No node {!r} in the network.'.format(node))
+        edges = (list(self.G.in_edges(node, keys=True, data=True)) +
+                 list(self.G.out_edges(node, keys=True, data=True)))
+        for u, v, key, data in edges:
+            self.links.pop(str(data.get(self.edge_name_col)), None)
+            self._remove_edge(u, v, key)
+            self.dirty.update([u, v])
+
+        data = self.G.node[node]
+        self.G.remove_node(node)
+        self.undo.append(functools.partial(self.G.add_node, node, **data))
+
+    def rollback(self):
+        for fxn in reversed(self.undo):
+            fxn()
+
+
+def apply_patch(G, patch, edge_name_col='id', vol_col='volume'):
+    """edit a network in place and return the nodes that need a re-solve.
+
+    The edits update the graph, the link volumes and, for a `SwmmNetwork`,
+    its topological order, which rejects links that would close a cycle.
+    The patch is applied whole or not at all: if any row fails, the edits
+    of the rows before it are undone before the error is raised.
+
+    Renamed links keep their volume and are classified by their new flags
+    when the network is next solved or compiled. New links have no volume
+    unless the patch gives one. The `scenario` of a network is not
+    changed.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+    patch : pandas.DataFrame or string
+        a patch table, see the module docstring, or a SWMM input fragment,
+        see `read_inp_patch`.
+    edge_name_col : string, optional (default='id')
+    vol_col : string, optional (default='volume')
+
+    Returns
+    -------
+    set
+        the nodes whose inflows or outflows changed. Solving these and
+        everything downstream of them, e.g., with
+        ``G.solve_network(changed=dirty)``, updates every result that the
+        patch affects. For a `SwmmNetwork` they are also added to its
+        `dirty_nodes`.
+    """
+
+    if not isinstance(patch, pandas.DataFrame):
+        patch = read_inp_patch(patch)
+    if 'id' not in patch.columns:
+        raise ValueError("The patch needs an 'id' column.")
+
+    attrs = [c for c in patch.columns if c not in PATCH_COLUMNS]
+    patcher = _Patcher(G, edge_name_col, vol_col)
+    try:
+        for row in patch.to_dict('records'):
+            kind = _get(row, 'type', 'link')
+            action = _get(row, 'action', 'set')
+            values = {c: row[c] for c in attrs if not _is_blank(row[c])}
+            if kind not in ('link', 'node'):
+                raise ValueError("`type` must be one of 'link' or 'node'.")
+            if action not in ('set', 'remove'):
+                raise ValueError("`action` must be one of 'set' or 'remove'.")
+
+            if kind == 'link' and action == 'set':
+                patcher.set_link(row, values)
+            elif kind == 'link':
+                patcher.remove_link(row)
+            elif action == 'set':
+                patcher.set_node(row, values)
+            else:
+                patcher.remove_node(row)
+    except Exception:
+        patcher.rollback()
+        raise
+
+    dirty = set([n for n in patcher.dirty if n in G])
+    if hasattr(G, 'dirty_nodes'):
+        G.dirty_nodes.update(dirty)
+    return dirty
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_right
+
+import numpy
+import networkx as nx
+
+from .util import validate_swmmnetwork
+
+
+def _postorder(G, nodes, neighbors):
+    """iterative depth first postorder of `nodes` following `neighbors`."""
+    order = []
+    seen = set()
+    for root in nodes:
+        if root in seen:
+            continue
+        seen.add(root)
+        stack = [(root, iter(neighbors(root)))]
+        while stack:
+            parent, children = stack[-1]
+            for child in children:
+                if child not in seen:
+                    seen.add(child)
+                    stack.append((child, iter(neighbors(child))))
+                    break
+            else:
+                stack.pop()
+                order.append(parent)
+    return order
+
+
+def _merge(intervals):
+    intervals = sorted(intervals)
+    merged = [intervals[0]]
+    for lo, hi in intervals[1:]:
+        _lo, _hi = merged[-1]
+        if lo <= _hi:
+            if hi > _hi:
+                merged[-1] = (_lo, hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+class _IntervalLabels(object):
+    """reachable sets of a DAG in one direction stored as intervals of a
+    depth first postorder numbering.
+
+    Every node reachable from `v` (including `v`) has a postorder number
+    inside one of the intervals of `v`. For tree-like drainage networks
+    most nodes need a single interval, so the labels are compact and a set
+    query is a few slices of the postorder array.
+    """
+
+    def __init__(self, G, topo, neighbors):
+        order = _postorder(G, topo, neighbors)
+        self.order = numpy.empty(len(order), dtype=object)
+        self.order[:] = order
+        self.post = {n: i for i, n in enumerate(order)}
+
+        # reachable sets are complete once every neighbor is labeled, i.e.,
+        # in reverse topological order of the direction being followed.
+        self.intervals = {}
+        for node in reversed(topo):
+            i = self.post[node]
+            intervals = [(i, i + 1)]
+            for nbr in neighbors(node):
+                intervals.extend(self.intervals[nbr])
+            self.intervals[node] = _merge(intervals)
+
+        self._lows = {n: [lo for lo, _ in iv]
+                      for n, iv in self.intervals.items()}
+
+    def reachable(self, node, include_self=False):
+        res = set()
+        for lo, hi in self.intervals[node]:
+            res.update(self.order[lo:hi])
+        if not include_self:
+            res.discard(node)
+        return res
+
+    def contains(self, node, other):
+        i = self.post[other]
+        iv = self.intervals[node]
+        j = bisect_right(self._lows[node], i) - 1
+        return j >= 0 and i < iv[j][1]
+
+
+class ReachabilityIndex(object):
+    """Precomputed ancestor and descendant sets of a directed acyclic
+    network.
+
+    The index uses interval labeling (see `_IntervalLabels`) in both
+    directions of the graph. Membership queries are a binary search over
+    a node's intervals and set queries cost time proportional to the size
+    of the result rather than a traversal of the graph.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        the network to index. The index is a snapshot; it must be rebuilt
+        if edges or nodes are added or removed.
+    dag : dag.NetworkDag, optional (default=None)
+        the integer indexed structure of `G`. If given, the graph is
+        traversed through it.
+
+    """
+
+    def __init__(self, G, dag=None):
+        if dag is None:
+            validate_swmmnetwork(G)
+            topo = list(nx.topological_sort(G))
+            view = G
+        else:
+            topo = dag.topological_sort()
+            view = dag
+        self._down = _IntervalLabels(G, topo, view.successors)
+        self._up = _IntervalLabels(G, topo[::-1], view.predecessors)
+
+    def __contains__(self, node):
+        return node in self._down.post
+
+    def descendants(self, node, include_self=False):
+        """set of all nodes downstream of `node`."""
+        return self._down.reachable(node, include_self=include_self)
+
+    def ancestors(self, node, include_self=False):
+        """set of all nodes upstream of `node`."""
+        return self._up.reachable(node, include_self=include_self)
+
+    def is_upstream(self, node, other):
+        """True if `node` drains to `other`."""
+        return node != other and self._down.contains(node, other)
+
+    def is_downstream(self, node, other):
+        """True if `other` drains to `node`."""
+        return node != other and self._up.contains(node, other)
+
+    def all_descendants(self, nodes, include_self=True):
+        res = set()
+        for node in nodes:
+            res |= self.descendants(node, include_self=include_self)
+        return res
+
+    def all_ancestors(self, nodes, include_self=True):
+        res = set()
+        for node in nodes:
+            res |= self.ancestors(node, include_self=include_self)
+        return res
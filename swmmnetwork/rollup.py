@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+"""Totals of solved results by outfall, node or edge attribute, or any
+grouping of the nodes.
+"""
+
+import numpy
+import pandas
+import networkx as nx
+
+
+OUTFALL = 'outfall'
+
+
+def group_sum(values, codes, n_groups):
+    """sum the rows of `values` by group.
+
+    Parameters
+    ----------
+    values : numpy.ndarray shaped (items, ...)
+    codes : numpy.ndarray of int shaped (items,)
+        the group of each item, 0..n_groups-1, or -1 to leave it out.
+    n_groups : int
+
+    Returns
+    -------
+    numpy.ndarray shaped (n_groups, ...)
+    """
+    values = numpy.asarray(values, dtype=float)
+    codes = numpy.asarray(codes)
+    out = numpy.zeros((n_groups,) + values.shape[1:])
+
+    keep = numpy.flatnonzero(codes >= 0)
+    if len(keep) == 0:
+        return out
+    order = keep[numpy.argsort(codes[keep], kind='stable')]
+    sorted_codes = codes[order]
+    starts = numpy.flatnonzero(
+        numpy.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    out[sorted_codes[starts]] = numpy.add.reduceat(
+        values[order], starts, axis=0)
+    return out
+
+
+def _factorize(labels):
+    """integer codes and sorted group names of a list of labels. Missing
+    labels get the code -1.
+    """
+    labels = [numpy.nan if v is None else v for v in labels]
+    try:
+        codes, groups = pandas.factorize(labels, sort=True)
+    except TypeError:
+        # e.g., a mix of string and integer node names
+        codes, groups = pandas.factorize(labels)
+    return codes, list(groups)
+
+
+def terminal_nodes(network):
+    """the index of the terminal node, e.g., the outfall, that each node of
+    a `compiled.CompiledNetwork` drains to.
+
+    Nodes that split their flow are followed along their largest out edge
+    by volume, so every node drains to exactly one terminal node. Terminal
+    nodes drain to themselves.
+
+    Returns
+    -------
+    numpy.ndarray of int shaped (nodes,)
+    """
+    n_nodes = network.n_nodes
+    src, dst = network.edge_src, network.edge_dst
+
+    main = numpy.full(n_nodes, -1, dtype=numpy.int64)
+    if len(src):
+        order = numpy.lexsort((-network.edge_volume, src))
+        first = numpy.r_[True, src[order][1:] != src[order][:-1]]
+        main[src[order][first]] = dst[order][first]
+
+    # every edge enters a later level, so sweeping the levels from the last
+    # resolves each node from its already resolved main successor.
+    term = numpy.arange(n_nodes)
+    ptr = network.level_ptr
+    for i in reversed(range(network.n_levels)):
+        idx = numpy.arange(ptr[i], ptr[i + 1])
+        idx = idx[main[idx] >= 0]
+        term[idx] = term[main[idx]]
+    return term
+
+
+def _graph_terminals(G, vol_col='volume'):
+    if hasattr(G, 'topological_sort'):
+        order = G.topological_sort()
+    else:
+        order = list(nx.topological_sort(G))
+
+    term = {}
+    for node in reversed(order):
+        out_edges = list(G.out_edges(node, data=True))
+        if out_edges:
+            main = max(out_edges, key=lambda e: e[2].get(vol_col, 0))
+            term[node] = term[main[1]]
+        else:
+            term[node] = node
+    return term
+
+
+def node_groups(G, by=OUTFALL, vol_col='volume'):
+    """the group of each node of `G`.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+    by : string or dict, optional (default='outfall')
+        'outfall' for the terminal node that each node drains to, see
+        `terminal_nodes`, a node attribute, e.g., 'xtype', or a
+        {node: group} mapping, e.g., of drainage areas.
+    vol_col : string, optional (default='volume')
+        the edge volumes that choose the main path of split flows.
+
+    Returns
+    -------
+    dict
+        {node: group}. Nodes without a group map to None.
+    """
+    if by == OUTFALL:
+        return _graph_terminals(G, vol_col=vol_col)
+    if isinstance(by, str):
+        return {n: d.get(by) for n, d in G.nodes(data=True)}
+    return {n: by.get(n) for n in G.nodes()}
+
+
+def _group_name(by):
+    return by if isinstance(by, str) else 'group'
+
+
+def _load_cols(G):
+    cols = set()
+    for _, data in G.nodes(data=True):
+        cols.update([k[:-len('_load_in')] for k in data
+                     if k.endswith('_load_in')])
+    return sorted(cols)
+
+
+def rollup(G, by=OUTFALL, kind='node', load_cols=None, vol_col='volume'):
+    """totals of the solved results of `G` by group.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        a solved network.
+    by : string or dict, optional (default='outfall')
+        the grouping of the nodes, see `node_groups`. For edges, a string
+        other than 'outfall' is an edge attribute, e.g., 'xtype' or
+        '_bmp_tmnt_flag', and the other groupings apply to the node each
+        edge enters.
+    kind : {'node', 'edge'}, optional (default='node')
+    load_cols : list of strings, optional (default=None)
+        the pollutants. Defaults to all of the solved pollutants.
+    vol_col : string, optional (default='volume')
+
+    Returns
+    -------
+    pandas.DataFrame
+        indexed by group. Node totals have the inflow, effluent, reduced,
+        treated and captured volumes, e.g., 'volume_capture', and the
+        '<pollutant>_load_in', '_load_eff' and '_load_reduced' of each
+        pollutant. Edge totals have the volume and the same loads.
+
+    Notes
+    -----
+    Each column is the sum over the members of a group. The volumes and
+    loads reduced or captured add up across nodes, while a load that
+    passes through several nodes of a group is counted by each of them.
+    """
+
+    if load_cols is None:
+        load_cols = _load_cols(G)
+    load_cols = list(load_cols)
+    loads = [suffix.format(c) for c in load_cols
+             for suffix in ['{}_load_in', '{}_load_eff', '{}_load_reduced']]
+
+    if kind == 'node':
+        cols = [vol_col + s for s in
+                ['_in', '_eff', '_reduced', '_treated', '_capture']] + loads
+        records = list(G.nodes(data=True))
+        groups = node_groups(G, by=by, vol_col=vol_col)
+        labels = [groups[n] for n, _ in records]
+
+    elif kind == 'edge':
+        cols = [vol_col] + loads
+        records = [(e[1], e[2]) for e in G.edges(data=True)]
+        if isinstance(by, str) and by != OUTFALL:
+            labels = [d.get(by) for _, d in records]
+        else:
+            groups = node_groups(G, by=by, vol_col=vol_col)
+            labels = [groups[n] for n, _ in records]
+
+    else:
+        raise ValueError("`kind` must be one of 'node' or 'edge'.")
+
+    codes, names = _factorize(labels)
+    values = numpy.array(
+        [[d.get(c) or 0 for c in cols] for _, d in records],
+        dtype=float).reshape(len(records), len(cols))
+
+    return pandas.DataFrame(
+        group_sum(values, codes, len(names)),
+        index=pandas.Index(names, name=_group_name(by)),
+        columns=cols,
+    )
+
+
+def _edge_mask(mask, shape):
+    """a (edges,) or (scenarios, edges) edge mask as (edges, scenarios)."""
+    mask = numpy.asarray(mask, dtype=bool)
+    return numpy.broadcast_to(numpy.atleast_2d(mask), shape[::-1]).T
+
+
+def _node_volumes(network, n_scenarios=1, edge_volume=None,
+                  edge_vol_reduced=None, edge_treated=None):
+    """the per scenario volume that enters each node through its in edges,
+    the effluent and treated volume that leaves it through its out edges,
+    all shaped (nodes, scenarios), and whether each node has out edges.
+    """
+    edge_vol, _ = network.volume_matrix(edge_volume, n_scenarios=n_scenarios)
+    n_nodes = network.n_nodes
+    src, dst = network.edge_src, network.edge_dst
+
+    if edge_vol_reduced is None:
+        edge_vol_reduced = network.edge_vol_reduced
+    if edge_treated is None:
+        edge_treated = network.edge_treated
+    reduced = _edge_mask(edge_vol_reduced, edge_vol.shape)
+    treated = _edge_mask(edge_treated, edge_vol.shape)
+
+    vol_edge_in = group_sum(edge_vol, dst, n_nodes)
+    vol_eff = group_sum(numpy.where(reduced, 0, edge_vol), src, n_nodes)
+    vol_treated = group_sum(numpy.where(treated, edge_vol, 0), src, n_nodes)
+    has_out = numpy.bincount(src, minlength=n_nodes) > 0
+    return vol_edge_in, vol_eff, vol_treated, has_out
+
+
+def batch_rollup(result, by=OUTFALL, edge_volume=None, edge_vol_reduced=None,
+                 edge_treated=None):
+    """totals of the node results of every scenario of a
+    `compiled.BatchResult` by group.
+
+    The groups are summed for all of the scenarios at once.
+
+    Parameters
+    ----------
+    result : compiled.BatchResult
+    by : string or dict, optional (default='outfall')
+        'outfall', see `terminal_nodes`, or a {node: group} mapping, e.g.,
+        `node_groups` of a node attribute.
+    edge_volume : numpy.ndarray, optional (default=None)
+        the (scenarios, edges) volumes of the solve, if they were given.
+    edge_vol_reduced, edge_treated : numpy.ndarray, optional (default=None)
+        the (edges,) or (scenarios, edges) masks of the edges that reduce
+        volume and that are treated, e.g., the `edge_vol_reduced` of a
+        solve of siting alternatives. Default to those of the network.
+
+    Returns
+    -------
+    pandas.DataFrame
+        indexed by (scenario, group), with the columns of `rollup`.
+    """
+    network = result.network
+    idx = numpy.array([network.node_index[n] for n in result.nodes],
+                      dtype=numpy.int64)
+
+    if isinstance(by, str):
+        if by != OUTFALL:
+            e = "`by` must be 'outfall' or a mapping of nodes to groups."
+            raise ValueError(e)
+        labels = [network.nodes[i] for i in terminal_nodes(network)[idx]]
+    else:
+        labels = [by.get(n) for n in result.nodes]
+    codes, names = _factorize(labels)
+
+    # (nodes, scenarios) volumes as computed by `core.solve_node`, where
+    # nodes without out edges pass on their edge inflow.
+    vol_in = numpy.asarray(result.node_vol_in, dtype=float).T
+    vol_edge_in, vol_eff, vol_treated, has_out = _node_volumes(
+        network, n_scenarios=result.n_scenarios, edge_volume=edge_volume,
+        edge_vol_reduced=edge_vol_reduced, edge_treated=edge_treated)
+    vol_eff = numpy.where(has_out[idx, numpy.newaxis], vol_eff[idx],
+                          vol_edge_in[idx])
+    vol_treated = vol_treated[idx]
+    vol_reduced = vol_in - vol_eff
+    volumes = numpy.stack([vol_in, vol_eff, vol_reduced, vol_treated,
+                           vol_treated + vol_reduced], axis=-1)
+
+    # (nodes, scenarios, pollutants, 3) loads
+    loads = numpy.stack([result.node_load_in, result.node_load_eff,
+                         result.node_load_reduced], axis=-1)
+    loads = loads.transpose(1, 0, 2, 3).reshape(
+        len(idx), result.n_scenarios, -1)
+
+    values = numpy.concatenate([volumes, loads], axis=-1)
+    totals = group_sum(values, codes, len(names))
+
+    cols = ['volume_in', 'volume_eff', 'volume_reduced', 'volume_treated',
+            'volume_capture']
+    cols += [suffix.format(c) for c in network.load_cols
+             for suffix in ['{}_load_in', '{}_load_eff', '{}_load_reduced']]
+    index = pandas.MultiIndex.from_product(
+        [result.scenarios, names],
+        names=['scenario', _group_name(by)])
+    return pandas.DataFrame(
+        totals.transpose(1, 0, 2).reshape(-1, len(cols)),
+        index=index,
+        columns=cols,
+    )
@@ -2,6 +2,8 @@
 
 from __future__ import division
 
+import os
+
 import numpy
 import pandas
 
@@ -9,6 +11,9 @@ from hymo import SWMMInpFile, SWMMReportFile
 
 from .unit_conversions import UnitConverter
 from . import convert
+from .swmmnetwork import SwmmNetwork
+from .parallel import _pool_context
+from .spatial import GridIndex
 from .util import (
     _upper_case_column,
     _validate_hymo_inp,
@@ -16,39 +21,62 @@ from .util import (
 )
 
 
-def load_rpt_link_flows(df, proxy_keyword, conc_val, conc_unit,
-                        out_unit, unit_converter=None):
-    if unit_converter is None:
-        unit_converter = UnitConverter()
+def _proxy_column(columns, proxy_keyword):
+    proxy_cols = [c for c in columns if proxy_keyword.lower() in c.lower()]
 
-    proxy_cols = list(
-        filter(lambda c: proxy_keyword.lower() in c.lower(), df.columns)
-    )
-
-    if len(proxy_cols) > 1 or 0:
+    if len(proxy_cols) != 1:
         e = ("ERROR: The keyword '{}' is either missing or is not unique "
              "in SWMM Report File Link Pollutant Load Summary".format(
                  proxy_keyword)
              )
         raise ValueError(e)
 
-    proxy_col = proxy_cols[0]
+    return proxy_cols[0]
+
+
+def _upper_case_index(index):
+    return pandas.Index(index.map(str)).str.upper()
+
+
+def load_rpt_link_flows(df, proxy_keyword, conc_val, conc_unit,
+                        out_unit, unit_converter=None):
+    """the volume of each link from the load of a proxy pollutant with a
+    constant concentration.
+
+    Returns
+    -------
+    pandas.DataFrame
+        the 'volume' and 'unit' of each link, indexed by the upper cased
+        link name.
+    """
+    if unit_converter is None:
+        unit_converter = UnitConverter()
+
+    proxy_col = _proxy_column(df.columns, proxy_keyword)
     in_unit = proxy_col.split('_')[-1]
 
     _in_unit, _conc_unit, _out_unit = [unit_converter.pint_alias.get(i, i)
                                        for i in [in_unit, conc_unit, out_unit]]
 
-    conversion = (1 * unit_converter.ureg(_in_unit) /
-                  (conc_val * unit_converter.ureg(_conc_unit))).to(_out_unit).m
+    conversion = unit_converter.factor(
+        '({}) / ({})'.format(_in_unit, _conc_unit), _out_unit) / conc_val
 
-    res = (
-        df
-        .pipe(_upper_case_column, include_index=True)
-        .assign(volume=lambda df: df[proxy_col] * conversion)
-        .assign(unit=out_unit)
+    return pandas.DataFrame(
+        {'volume': df[proxy_col].values * conversion, 'unit': out_unit},
+        index=_upper_case_index(df.index),
+        columns=['volume', 'unit'],
     )
 
-    return res
+
+def _positions(index, keys):
+    """the position of each key in `index`, or -1 if it is missing. The
+    first of repeated index values is used.
+    """
+    if index.is_unique:
+        return index.get_indexer(keys)
+    first = numpy.flatnonzero(~index.duplicated())
+    pos = index[first].get_indexer(keys)
+    return numpy.where(pos >= 0, first[pos], -1)
 
 
 def load_rpt_subcatchment_vol(df, area_col, area_unit, depth_col,
@@ -93,7 +121,132 @@ def load_rpt_node_inflow_vol(df, vol_value_col, vol_unit,
     return res
 
 
+def _iter_chunks(source, columns, chunksize):
+    """DataFrame chunks of a csv or parquet file or of an iterable of
+    DataFrames, restricted to `columns`.
+    """
+    if isinstance(source, str):
+        if source.lower().endswith(('.parquet', '.pq')):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:  # pragma: no cover
+                e = 'Reading parquet files requires pyarrow.'
+                raise ImportError(e)
+            f = pq.ParquetFile(source)
+            for batch in f.iter_batches(batch_size=chunksize,
+                                        columns=columns):
+                yield batch.to_pandas()
+        else:
+            for chunk in pandas.read_csv(source, usecols=columns,
+                                         chunksize=chunksize):
+                yield chunk
+    else:
+        for chunk in source:
+            yield chunk.loc[:, columns]
+
+
+def read_pollutant_table(source, value_col, node_name_col='subcatchment',
+                         pollutant_name_col='pollutant', unit_col='unit',
+                         how='sum', weight_col=None, pocs=None,
+                         chunksize=1000000):
+    """stream a large pollutant table and aggregate it to one row per
+    subcatchment and pollutant.
+
+    Only one chunk and the running aggregate are held in memory at a time,
+    so tables with rows for, e.g., every land use and event of each
+    subcatchment need not be loaded at once. Subcatchment names are
+    uppercased as they are read.
+
+    Parameters
+    ----------
+    source : string or iterable of pandas.DataFrame
+        a csv or parquet (requires pyarrow) file path, or chunks of the
+        table.
+    value_col : string
+        the column with the load or concentration values.
+    node_name_col, pollutant_name_col, unit_col : string, optional
+        (default='subcatchment', 'pollutant', 'unit')
+    how : {'sum', 'mean'}, optional (default='sum')
+        'sum' adds up the values, e.g., the loads of each land use. 'mean'
+        averages them, e.g., concentrations, weighted by `weight_col` if
+        given.
+    weight_col : string, optional (default=None)
+        weights for 'mean', e.g., the land use area.
+    pocs : list, optional (default=None)
+        if given, rows of other pollutants are dropped as they are read.
+    chunksize : int, optional (default=1000000)
+        rows per chunk of a file.
+
+    Returns
+    -------
+    pandas.DataFrame
+        with the `node_name_col`, `pollutant_name_col`, `value_col` and
+        `unit_col` columns, suitable as the `load_df` or
+        `concentration_df` of a `Scenario`. Other columns are dropped.
+        Pollutants with more than one unit keep a row per unit so that
+        `Scenario.check_units` can report them. Missing names and units
+        are kept as their own group rather than dropped.
+    """
+
+    if how not in ('sum', 'mean'):
+        raise ValueError("`how` must be one of 'sum' or 'mean'.")
+
+    keys = [node_name_col, pollutant_name_col, unit_col]
+    columns = keys + [value_col]
+    if how == 'mean' and weight_col is not None:
+        columns.append(weight_col)
+    if pocs is not None:
+        pocs = list(pocs)
+
+    total = None
+    for chunk in _iter_chunks(source, columns, chunksize):
+        if pocs is not None:
+            chunk = chunk.loc[chunk[pollutant_name_col].isin(pocs)]
+
+        weight = 1.0
+        if how == 'mean' and weight_col is not None:
+            weight = chunk[weight_col].astype(float)
+        names = chunk[node_name_col]
+        part = pandas.DataFrame({
+            node_name_col: names.astype(str).str.upper().where(
+                names.notnull()),
+            pollutant_name_col: chunk[pollutant_name_col],
+            unit_col: chunk[unit_col],
+            '_value': chunk[value_col].astype(float) * weight,
+            '_weight': weight,
+        }, index=chunk.index, columns=keys + ['_value', '_weight'])
+        # rows with a missing name or unit are kept as their own group
+        part = part.groupby(keys, sort=False, dropna=False).sum()
+
+        if total is None:
+            total = part
+        else:
+            total = pandas.concat([total, part]).groupby(
+                level=keys, sort=False, dropna=False).sum()
+
+    if total is None:
+        return pandas.DataFrame(
+            columns=[node_name_col, pollutant_name_col, value_col, unit_col])
+
+    if how == 'mean':
+        total['_value'] = total['_value'] / total['_weight']
+
+    return (
+        total
+        .rename(columns={'_value': value_col})
+        .reset_index()
+        .loc[:, [node_name_col, pollutant_name_col, value_col, unit_col]]
+    )
+
+
 class ScenarioBase(object):
+    """The hydrology of a SWMM model: its links and nodes and the volumes
+    reported for them.
+
+    A base may be parsed once and shared by any number of `Scenario`
+    objects created with `scenario`, which reference its tables rather
+    than re-reading the input and report files.
+    """
 
     def __init__(self, swmm_inp_path=None,
                  swmm_rpt_path=None, proxy_keyword=None,
@@ -157,13 +310,16 @@ class ScenarioBase(object):
             raise(ValueError(e))
 
         if unit_converter is None:
-            self.unit_converter = UnitConverter()
+            unit_converter = UnitConverter()
+        self.unit_converter = unit_converter
 
         # Properties
         self._subcatchment_volume = None
         self._node_inflow_volume = None
         self._edges_df = None
         self._nodes_df = None
+        self._spatial_index = None
+        self._link_position_cache = None
 
     @property
     def subcatchment_volume(self):
@@ -193,6 +349,11 @@ class ScenarioBase(object):
 
         return self._subcatchment_volume
 
+    @subcatchment_volume.setter
+    def subcatchment_volume(self, df):
+        self._subcatchment_volume = df
+        self._volumes_changed()
+
     @property
     def node_inflow_volume(self):
         if self._node_inflow_volume is None:
@@ -208,6 +369,11 @@ class ScenarioBase(object):
 
         return self._node_inflow_volume
 
+    @node_inflow_volume.setter
+    def node_inflow_volume(self, df):
+        self._node_inflow_volume = df
+        self._volumes_changed()
+
     @property
     def edges_df(self):
         """
@@ -215,49 +381,79 @@ class ScenarioBase(object):
         """
 
         if self._edges_df is None:
-            edges = (
-                self.swmm_edges
-                .query("xtype != 'dt'")
-                .set_index('id')
-            )
-            subcatchment_edges = (
-                self.swmm_edges
-                .query("xtype == 'dt'")
-                .set_index('id')
-            )
+            # the report links, then the subcatchment links
+            is_dt = (self.swmm_edges['xtype'] == 'dt').values
+            order = numpy.concatenate(
+                [numpy.flatnonzero(~is_dt), numpy.flatnonzero(is_dt)])
+            edges = self.swmm_edges.iloc[order].set_index('id')
+            n_links = int((~is_dt).sum())
 
-            if self.swmm_rpt_path is not None:
+            volume = numpy.full(len(edges), numpy.nan)
+            unit = numpy.full(len(edges), numpy.nan)
 
-                standard_links_df = load_rpt_link_flows(
-                    self.rpt.link_pollutant_load_results,
-                    self.proxy_keyword,
-                    self.proxy_pollutant_conc,
-                    self.proxy_conc_unit,
-                    self.vol_unit,
-                    self.unit_converter,
-                )
-
-                edges = edges.join(standard_links_df, how='left')
-
-                subcatchment_links_df = (
-                    self.subcatchment_volume
-                    .reindex(columns=['volume', 'unit'])
-                    .assign(id=lambda df: df.index.map(lambda s: '^' + s))
-                    .set_index('id')
-                )
+            if self.swmm_rpt_path is not None:
+                link_index, link_volume = self._link_volumes()
+                sub = self.subcatchment_volume
+                pos = numpy.concatenate([
+                    self._link_positions(link_index, edges.index[:n_links]),
+                    _positions(sub.index,
+                               edges['inlet_node'].values[n_links:]),
+                ])
+                values = numpy.concatenate([
+                    link_volume, sub['volume'].values.astype(float)])
+                found = pos >= 0
+                # subcatchment positions follow the report links
+                pos[n_links:][found[n_links:]] += len(link_volume)
+
+                volume = numpy.zeros(len(edges))
+                volume[found] = values[pos[found]]
+                volume[numpy.isnan(volume)] = 0
+                # links missing from the report have no unit, as before
+                unit = numpy.zeros(len(edges), dtype=object)
+                unit[found] = self.vol_unit
+
+            self._edges_df = pandas.DataFrame({
+                'inlet_node': edges['inlet_node'].values,
+                'outlet_node': edges['outlet_node'].values,
+                'xtype': edges['xtype'].values,
+                'volume': volume,
+                'unit': unit,
+            }, index=edges.index,
+                columns=['inlet_node', 'outlet_node', 'xtype', 'volume',
+                         'unit'])
 
-                subcatchment_edges = (
-                    subcatchment_edges
-                    .join(subcatchment_links_df, how='left')
-                )
+        return self._edges_df
 
-            self._edges_df = (
-                pandas.concat([edges, subcatchment_edges])
-                .fillna(0)
-                .reindex(columns=['inlet_node', 'outlet_node', 'xtype', 'volume', 'unit'])
-            )
+    def _link_volumes(self):
+        """the upper cased link names of the report and their volumes."""
+        table = self.rpt.link_pollutant_load_results
+        proxy_col = _proxy_column(table.columns, self.proxy_keyword)
+        links = load_rpt_link_flows(
+            table.loc[:, [proxy_col]],
+            self.proxy_keyword,
+            self.proxy_pollutant_conc,
+            self.proxy_conc_unit,
+            self.vol_unit,
+            self.unit_converter,
+        )
+        return links.index, links['volume'].values.astype(float)
 
-        return self._edges_df
+    def _link_positions(self, link_index, edge_ids):
+        """the report row of each link. The mapping is kept for the reports
+        of other events, which list the links in the same order.
+        """
+        cached = self._link_position_cache
+        if (cached is not None and cached[0].equals(link_index) and
+                cached[1].equals(edge_ids)):
+            return cached[2].copy()
+        pos = _positions(link_index, edge_ids)
+        self._link_position_cache = (link_index, edge_ids, pos)
+        return pos.copy()
+
+    @edges_df.setter
+    def edges_df(self, df):
+        self._edges_df = df
+        self._hydrology_changed()
 
     @property
     def edge_list(self):
@@ -307,6 +503,67 @@ class ScenarioBase(object):
 
         return self._nodes_df
 
+    @nodes_df.setter
+    def nodes_df(self, df):
+        self._nodes_df = df
+        self._hydrology_changed()
+
+    def _volumes_changed(self):
+        # the edge and node tables are built from the volume tables
+        self._edges_df = None
+        self._nodes_df = None
+        self._link_position_cache = None
+        self._hydrology_changed()
+
+    def _hydrology_changed(self):
+        """hook for subclasses to drop results derived from the tables."""
+        pass
+
+    def compute_hydrology(self):
+        """build every lazily computed hydrology table."""
+        if self.swmm_inp_path is not None:
+            self.edges_df
+            self.nodes_df
+        return self
+
+    def with_report(self, swmm_rpt_path):
+        """a copy of this base with the volumes of another report file of
+        the same model. The input file is not read again.
+        """
+        base = ScenarioBase.__new__(ScenarioBase)
+        base.__dict__.update(self.__dict__)
+        base.swmm_rpt_path = swmm_rpt_path
+        base.rpt = _validate_hymo_rpt(swmm_rpt_path)
+        if base.rpt.unit != base.flow_unit:
+            e = "Input file units do not match report file units"
+            raise(ValueError(e))
+
+        base._subcatchment_volume = None
+        base._node_inflow_volume = None
+        base._edges_df = None
+        base._nodes_df = None
+        return base
+
+    def scenario(self, **kwargs):
+        """a new `Scenario` that shares the hydrology of this one.
+
+        The input and report files are not read again and the volume tables
+        are shared by reference. The tables are copy-on-write: assigning a
+        new table to a derived scenario, e.g., ``sc.edges_df = df``, affects
+        only that scenario. Tables should not be modified in place.
+
+        Parameters
+        ----------
+        **kwargs
+            the pollutant keyword arguments of `Scenario`, e.g., `load_df`,
+            `pollutant_value_col` and `pocs`.
+
+        Returns
+        -------
+        Scenario
+        """
+        return Scenario.from_base(self, **kwargs)
+
     @property
     def node_list(self):
 
@@ -322,12 +579,39 @@ class ScenarioBase(object):
             .rename(columns={'volume': '_ck_volume'})
         )
 
+    @property
+    def spatial_index(self):
+        """a `spatial.GridIndex` of the node and subcatchment positions of
+        the input file, read once.
+        """
+        if self._spatial_index is None:
+            names, xy = convert.swmm_inp_layout(self.inp)
+            self._spatial_index = GridIndex(names, xy)
+        return self._spatial_index
+
     @property
     def plot_positions(self):
-        return convert.swmm_inp_layout_to_pos(self.inp)
+        index = self.spatial_index
+        return dict(zip(index.names.tolist(), index.xy.tolist()))
 
 
 class Scenario(ScenarioBase):
+    """Subcatchment pollutant loading for a SWMM model.
+
+    Pollutant data may be given either as loads or as concentrations, in a
+    tidy table with one row per subcatchment and pollutant. Nothing is
+    computed until the `load`, `concentration` or `wide_load` properties
+    are first accessed. Subcatchment and pollutant names are converted to
+    integer category codes once, and the wide load matrix that is used to
+    build the network is filled by scattering the values directly into a
+    dense (node, pollutant) array.
+
+    The table may be a DataFrame, a file path or an iterable of chunks. It
+    is reduced to one row per subcatchment and pollutant by
+    `read_pollutant_table`: loads are summed and concentrations averaged
+    by default (`pollutant_how`), optionally weighted by a column such as
+    the land use area (`pollutant_weight_col`).
+    """
 
     def __init__(self,
                  swmm_inp_path=None,
@@ -341,11 +625,56 @@ class Scenario(ScenarioBase):
                  pocs=None,  # 'all'
                  pollutant_name_col=None,  # 'pollutant',
                  pollutant_unit_col=None,  # 'unit',
+                 pollutant_how=None,  # 'sum' for loads, 'mean' for conc.
+                 pollutant_weight_col=None,
                  ):
 
         ScenarioBase.__init__(self, swmm_inp_path,
                               swmm_rpt_path, proxy_keyword, unit_converter)
 
+        self._init_pollutants(
+            load_df=load_df,
+            concentration_df=concentration_df,
+            pollutant_value_col=pollutant_value_col,
+            node_name_col=node_name_col,
+            pocs=pocs,
+            pollutant_name_col=pollutant_name_col,
+            pollutant_unit_col=pollutant_unit_col,
+            pollutant_how=pollutant_how,
+            pollutant_weight_col=pollutant_weight_col,
+        )
+
+    @classmethod
+    def from_base(cls, base, load_df=None, concentration_df=None,
+                  pollutant_value_col=None, node_name_col=None, pocs=None,
+                  pollutant_name_col=None, pollutant_unit_col=None,
+                  pollutant_how=None, pollutant_weight_col=None):
+        """create a Scenario that shares the parsed files and hydrology
+        tables of `base`. See `ScenarioBase.scenario`.
+        """
+        base.compute_hydrology()
+
+        scenario = cls.__new__(cls)
+        scenario.__dict__.update(base.__dict__)
+        scenario._init_pollutants(
+            load_df=load_df,
+            concentration_df=concentration_df,
+            pollutant_value_col=pollutant_value_col,
+            node_name_col=node_name_col,
+            pocs=pocs,
+            pollutant_name_col=pollutant_name_col,
+            pollutant_unit_col=pollutant_unit_col,
+            pollutant_how=pollutant_how,
+            pollutant_weight_col=pollutant_weight_col,
+        )
+        return scenario
+
+    def _init_pollutants(self, load_df=None, concentration_df=None,
+                         pollutant_value_col=None, node_name_col=None,
+                         pocs=None, pollutant_name_col=None,
+                         pollutant_unit_col=None, pollutant_how=None,
+                         pollutant_weight_col=None):
+
         if load_df is not None and concentration_df is not None:
             # Can't load as both concentration and as load
             e = 'Please specify either load or concentration, not both.'
@@ -357,8 +686,6 @@ class Scenario(ScenarioBase):
                  )
             raise ValueError(e)
 
-        self.raw_load_df = load_df
-        self.raw_concentration_df = concentration_df
         self.pollutant_value_col = pollutant_value_col
 
         self._node_name_col = node_name_col
@@ -377,50 +704,196 @@ class Scenario(ScenarioBase):
         if self._pollutant_unit_col is None:
             self._pollutant_unit_col = 'unit'
 
+        self._pollutant_how = pollutant_how
+        self._pollutant_weight_col = pollutant_weight_col
+
+        self.raw_load_df = load_df
+        self.raw_concentration_df = concentration_df
+
+    def _read_source(self, source, how):
+        """the pollutant table of a DataFrame, file path or iterable of
+        chunks, aggregated the same way for each. See
+        `read_pollutant_table`.
+        """
+        if source is None:
+            return None
+        if isinstance(source, pandas.DataFrame):
+            source = [source]
+        # every pollutant is kept so that `pocs` may still be changed, since
+        # an iterator of chunks cannot be read twice.
+        return read_pollutant_table(
+            source, self.pollutant_value_col,
+            node_name_col=self._node_name_col,
+            pollutant_name_col=self._pollutant_name_col,
+            unit_col=self._pollutant_unit_col,
+            how=self._pollutant_how or how,
+            weight_col=self._pollutant_weight_col,
+        )
+
+    @property
+    def raw_load_df(self):
+        """the load table, aggregated on first access to one row per
+        subcatchment, pollutant and unit by `read_pollutant_table`. The
+        loads are summed unless `pollutant_how` says otherwise, and only
+        the name, pollutant, value and unit columns are kept. A file path
+        or iterable of chunks is streamed.
+        """
+        if self._raw_load_df is None and self._load_source is not None:
+            self._raw_load_df = self._read_source(self._load_source, 'sum')
+        return self._raw_load_df
+
+    @raw_load_df.setter
+    def raw_load_df(self, source):
+        self._load_source = source
+        self._raw_load_df = None
+        self._hydrology_changed()
+
+    @property
+    def raw_concentration_df(self):
+        """the concentration table, aggregated on first access to one row
+        per subcatchment, pollutant and unit by `read_pollutant_table`.
+        The concentrations are averaged, weighted by `pollutant_weight_col`
+        if given, unless `pollutant_how` says otherwise, and only the name,
+        pollutant, value and unit columns are kept. A file path or
+        iterable of chunks is streamed.
+        """
+        if (self._raw_concentration_df is None and
+                self._concentration_source is not None):
+            self._raw_concentration_df = self._read_source(
+                self._concentration_source, 'mean')
+        return self._raw_concentration_df
+
+    @raw_concentration_df.setter
+    def raw_concentration_df(self, source):
+        self._concentration_source = source
+        self._raw_concentration_df = None
+        self._hydrology_changed()
+
+    def _hydrology_changed(self):
+        # the pollutant tables are aligned to `nodes_df`
         self._concentration = None
         self._load = None
         self._wide_load = None
+        self._pollutant_table = None
 
-        # initialize
+    @property
+    def _raw_pollutant_df(self):
         if self.raw_load_df is not None:
-            if self._pocs in ['all', ['all'], None]:
-                self.pocs = (
-                    self.raw_load_df
-                    .loc[:, self._pollutant_name_col]
-                    .unique()
-                    .tolist()
-                )
-            self.load
-            self.concentration
-            self.wide_load
-            self.check_units()
+            return self.raw_load_df
+        return self.raw_concentration_df
+
+    @property
+    def _value_name(self):
+        return 'load' if self._load_source is not None else 'concentration'
 
-        elif self.raw_concentration_df is not None:
-            if self._pocs in ['all', ['all'], None]:
-                self.pocs = (
-                    self.raw_concentration_df
-                    .loc[:, self._pollutant_name_col]
-                    .unique()
-                    .tolist()
+    @property
+    def pocs(self):
+        if self._pocs in ['all', ['all'], None]:
+            return (
+                pandas.unique(
+                    self._raw_pollutant_df.loc[:, self._pollutant_name_col])
+                .tolist()
+            )
+        if isinstance(self._pocs, str):
+            return [self._pocs]
+        return list(self._pocs)
+
+    @pocs.setter
+    def pocs(self, value):
+        self._pocs = value
+        self._hydrology_changed()
+
+    @property
+    def pollutant_table(self):
+        """The raw pollutant table restricted to `pocs` with standard column
+        names, and the integer codes that align it to the network.
+
+        Returns
+        -------
+        dict with keys:
+            'table' : pandas.DataFrame
+                the rows of the raw table for the `pocs`, with the
+                'subcatchment' and 'pollutant' columns as categoricals.
+            'index' : pandas.Index
+                the node names of the wide load matrix; `nodes_df` nodes
+                followed by subcatchments that are not in the model.
+            'node_codes' : numpy.ndarray
+                position of each row's subcatchment in 'index'.
+            'poc_codes' : numpy.ndarray
+                position of each row's pollutant in `pocs`.
+        """
+        if self._pollutant_table is None:
+            raw = self._raw_pollutant_df
+            pocs = self.pocs
+
+            # uppercase each distinct name once rather than every row.
+            codes, uniques = pandas.factorize(raw[self._node_name_col])
+            upper = pandas.Index(uniques).map(str).str.upper()
+            names = upper.unique()
+            codes = numpy.where(
+                codes >= 0, names.get_indexer(upper)[codes], -1)
+
+            poc_codes = pandas.Index(pocs).get_indexer(
+                raw[self._pollutant_name_col])
+            keep = (poc_codes >= 0) & (codes >= 0)
+
+            table = (
+                raw.loc[keep]
+                .rename(columns={
+                    self.pollutant_value_col: self._value_name,
+                    self._node_name_col: 'subcatchment',
+                    self._pollutant_name_col: 'pollutant',
+                    self._pollutant_unit_col: 'unit'})
+                .reset_index(drop=True)
+                .assign(
+                    subcatchment=pandas.Categorical.from_codes(
+                        codes[keep], names),
+                    pollutant=pandas.Categorical.from_codes(
+                        poc_codes[keep], pocs),
                 )
-            self.concentration
-            self.load
-            self.wide_load
-            self.check_units()
+            )
+
+            nodes_index = self.nodes_df.index
+            unknown = names[nodes_index.get_indexer(names) < 0]
+            index = nodes_index.append(unknown)
+
+            self._pollutant_table = {
+                'table': table,
+                'index': index,
+                'node_codes': index.get_indexer(names)[codes[keep]],
+                'poc_codes': poc_codes[keep],
+            }
+
+        return self._pollutant_table
 
     def check_units(self):
 
-        conc_units = [_.split('/')[-1]
-                      for _ in self.concentration.unit_conc.dropna().unique()]
+        pt = self.pollutant_table
+        table = pt['table']
+
+        if self.raw_load_df is None:
+            conc_units = [_.split('/')[-1]
+                          for _ in table.unit.dropna().unique()]
+        else:
+            # the concentration is the load per node volume unit
+            conc_units = (
+                self.nodes_df.unit
+                .reindex(pt['index'])
+                .take(numpy.unique(pt['node_codes']))
+                .dropna()
+                .unique()
+                .tolist()
+            )
+
         vol_units = (self.nodes_df.unit.unique().tolist() +
                      self.edges_df.unit.unique().tolist())
 
         unique_load_units = (
-            self.load
-            .drop_duplicates(subset=['pollutant', 'unit'])
-            .groupby('pollutant')
-            .count()
-            .unit
+            table
+            .loc[:, ['pollutant', 'unit']]
+            .drop_duplicates()
+            .groupby('pollutant', observed=True)
+            .size()
             .max()
         )
 
@@ -439,6 +912,34 @@ class Scenario(ScenarioBase):
         else:
             pass
 
+    def _tidy(self):
+        """The pollutant table with the node attributes of each subcatchment,
+        plus a row for every node without pollutant data.
+        """
+        pt = self.pollutant_table
+        nodes = (
+            self.nodes_df
+            .loc[:, ['xtype', 'volume', 'unit']]
+            .rename(columns={'unit': 'unit_vol'})
+            .reindex(pt['index'])
+        )
+
+        tidy = pt['table'].assign(
+            subcatchment=lambda df: df.subcatchment.astype(str),
+            pollutant=lambda df: df.pollutant.astype(object))
+        for col in nodes.columns:
+            tidy[col] = nodes[col].values[pt['node_codes']]
+
+        missing = numpy.ones(len(pt['index']), dtype=bool)
+        missing[pt['node_codes']] = False
+        no_data = (
+            nodes.loc[missing]
+            .rename_axis('subcatchment')
+            .reset_index()
+        )
+
+        return pandas.concat([tidy, no_data], ignore_index=True, sort=False)
+
     # tidy vs wide data not hymo
     def calculate_loading(self):
         if self.raw_load_df is None:
@@ -460,20 +961,8 @@ class Scenario(ScenarioBase):
     @property
     def load(self):
         if self._load is None:
-            load = (
-                self.raw_load_df
-                .pipe(_upper_case_column, cols=self._node_name_col)
-                .rename(columns={
-                    self.pollutant_value_col: 'load',
-                    self._node_name_col: 'subcatchment',
-                    self._pollutant_name_col: 'pollutant',
-                    self._pollutant_unit_col: 'unit'})
-                .query('pollutant in @self.pocs')
-                .join(self.nodes_df, on='subcatchment',
-                      how='outer', lsuffix='', rsuffix='_vol')
-                .assign(unit_load=lambda df: df.unit)
-            )
-            self._load = load
+            if self.raw_load_df is not None:
+                self._load = self._tidy().assign(unit_load=lambda df: df.unit)
             self.calculate_loading()
 
         return self._load
@@ -481,39 +970,55 @@ class Scenario(ScenarioBase):
     @property
     def concentration(self):
         if self._concentration is None:
-            concentration = (
-                self.raw_concentration_df
-                .pipe(_upper_case_column, cols=self._node_name_col)
-                .rename(columns={
-                    self.pollutant_value_col: 'concentration',
-                    self._node_name_col: 'subcatchment',
-                    self._pollutant_name_col: 'pollutant',
-                    self._pollutant_unit_col: 'unit'})
-                .query('pollutant in @self.pocs')
-                .join(self.nodes_df, on='subcatchment',
-                      how='outer', lsuffix='', rsuffix='_vol')
-                .assign(unit_conc=lambda df: df.unit)
-            )
-            self._concentration = concentration
+            if self.raw_concentration_df is not None:
+                self._concentration = (
+                    self._tidy().assign(unit_conc=lambda df: df.unit))
             self.calculate_loading()
 
         return self._concentration
 
+    def _wide_values(self, volume=None):
+        """dense (node, pollutant) array of the loads aligned to the
+        'index' of `pollutant_table`. Concentrations are multiplied by
+        `volume`, which must also be aligned to the 'index'.
+        """
+        pt = self.pollutant_table
+        values = pt['table'][self._value_name].values.astype(float)
+        if volume is not None:
+            values = values * volume[pt['node_codes']]
+
+        wide = numpy.zeros((len(pt['index']), len(self.pocs)))
+        numpy.add.at(wide, (pt['node_codes'], pt['poc_codes']), values)
+        wide[numpy.isnan(wide)] = 0
+        return wide
+
     @property
     def wide_load(self):
         if self._wide_load is None:
+            self.check_units()
+
+            pt = self.pollutant_table
+            index = pt['index']
+            nodes = (
+                self.nodes_df
+                .loc[:, ['xtype', 'volume', 'unit']]
+                .rename(columns={'unit': 'unit_vol'})
+                .reindex(index)
+            )
+
+            volume = None
+            if self.raw_load_df is None:
+                volume = nodes.volume.values
+            wide = self._wide_values(volume)
+
             load = (
-                self.load
-                .loc[:, ['subcatchment', 'pollutant', 'xtype',
-                         'volume', 'unit_vol', 'load']]
-                .set_index(['subcatchment', 'pollutant',
-                            'xtype', 'volume', 'unit_vol'])
-                .unstack('pollutant')
-                .fillna(0)
-                .loc[:, 'load']
-                .loc[:, self.pocs]
-                .reset_index()
-                .set_index('subcatchment')
+                pandas.concat([
+                    nodes,
+                    pandas.DataFrame(wide, index=index, columns=self.pocs),
+                ], axis=1)
+                .rename_axis('subcatchment')
+                .rename_axis('pollutant', axis='columns')
+                .sort_index()
             )
             self._wide_load = load
         return self._wide_load
@@ -533,7 +1038,7 @@ class Scenario(ScenarioBase):
     @property
     def node_list(self):
 
-        if self._wide_load is None:
+        if self._raw_pollutant_df is None:
             nodelist = self.nodes_df
         else:
             nodelist = self.wide_load
@@ -546,7 +1051,7 @@ class Scenario(ScenarioBase):
     @property
     def check_node_list(self):
 
-        if self._wide_load is None:
+        if self._raw_pollutant_df is None:
             checknodelist = self.nodes_df
         else:
             checknodelist = self.wide_load
@@ -556,3 +1061,197 @@ class Scenario(ScenarioBase):
             .query('xtype != "subcatchment"')
             .rename(columns={'volume': '_ck_volume'})
         )
+
+
+# the base scenario of the event reader processes
+_EVENT_BASE = {}
+
+
+def _init_event_reader(base):
+    _EVENT_BASE['base'] = base
+
+
+def _read_event_volumes(swmm_rpt_path):
+    """the edge and node volumes of one report file, aligned to the edges
+    and nodes of the base scenario.
+    """
+    base = _EVENT_BASE['base']
+    event = base.with_report(swmm_rpt_path)
+    # the edges of every report of one input file are in the same order
+    edge_volume = event.edges_df['volume'].values
+    node_volume = (
+        event.nodes_df.volume
+        .reindex(base.nodes_df.index)
+        .values
+    )
+    return edge_volume, node_volume
+
+
+class MultiEventScenario(Scenario):
+    """Pollutant loading of one SWMM model under many storm events, e.g.,
+    a suite of design storms or one simulation per year.
+
+    Each event is a report file of the same input file. The first report
+    defines the network; the volumes of every report are read on a process
+    pool into (event, edge) and (event, node) matrices, and all events are
+    solved in a single batched pass of the compiled network.
+
+    Concentration data is applied to the runoff volume of each event.
+    Load data is applied unchanged to every event.
+
+    Parameters
+    ----------
+    swmm_inp_path : string
+    swmm_rpt_paths : list of strings
+        one report file per event.
+    events : list, optional (default=None)
+        a name for each event. Defaults to the report file paths.
+    processes : int, optional (default=None)
+        number of processes that read the report files. Defaults to the
+        number of cores.
+    **kwargs
+        the remaining keyword arguments of `Scenario`.
+
+    """
+
+    def __init__(self, swmm_inp_path, swmm_rpt_paths, events=None,
+                 processes=None, **kwargs):
+
+        self.swmm_rpt_paths = list(swmm_rpt_paths)
+        if len(self.swmm_rpt_paths) == 0:
+            e = 'At least one report file is required.'
+            raise ValueError(e)
+
+        if events is None:
+            events = self.swmm_rpt_paths
+        self.events = list(events)
+        if len(self.events) != len(self.swmm_rpt_paths):
+            e = 'There must be one event name per report file.'
+            raise ValueError(e)
+
+        self.processes = processes
+
+        Scenario.__init__(self, swmm_inp_path, self.swmm_rpt_paths[0],
+                          **kwargs)
+
+        self._event_volumes = None
+
+    def _read_events(self):
+        base = ScenarioBase.with_report(self, self.swmm_rpt_path)
+        base.compute_hydrology()
+
+        processes = self.processes
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = max(1, min(processes, len(self.swmm_rpt_paths)))
+
+        if processes == 1:
+            _init_event_reader(base)
+            try:
+                results = [_read_event_volumes(p)
+                           for p in self.swmm_rpt_paths]
+            finally:
+                _EVENT_BASE.clear()
+        else:
+            pool = _pool_context().Pool(
+                processes, initializer=_init_event_reader, initargs=(base, ))
+            try:
+                results = pool.map(_read_event_volumes, self.swmm_rpt_paths)
+            finally:
+                pool.close()
+                pool.join()
+
+        edge_volumes, node_volumes = zip(*results)
+        index = pandas.Index(self.events, name='event')
+        self._event_volumes = (
+            pandas.DataFrame(numpy.vstack(edge_volumes), index=index,
+                             columns=base.edges_df.index),
+            pandas.DataFrame(numpy.vstack(node_volumes), index=index,
+                             columns=base.nodes_df.index),
+        )
+
+    @property
+    def edge_volumes(self):
+        """pandas.DataFrame of the (event, edge) volumes."""
+        if self._event_volumes is None:
+            self._read_events()
+        return self._event_volumes[0]
+
+    @property
+    def node_volumes(self):
+        """pandas.DataFrame of the (event, node) volumes."""
+        if self._event_volumes is None:
+            self._read_events()
+        return self._event_volumes[1]
+
+    @property
+    def event_loads(self):
+        """numpy.ndarray of the (event, node, pollutant) loads aligned to
+        the 'index' of `pollutant_table`.
+        """
+        self.check_units()
+        index = self.pollutant_table['index']
+        if self.raw_load_df is not None:
+            wide = self._wide_values()
+            return numpy.broadcast_to(
+                wide, (len(self.events), ) + wide.shape)
+
+        volumes = self.node_volumes.reindex(columns=index).values
+        return numpy.stack([self._wide_values(v) for v in volumes])
+
+    def solve(self, **solve_kwargs):
+        """solve every event in one batched pass.
+
+        Parameters
+        ----------
+        **solve_kwargs
+            passed to `compiled.CompiledNetwork.from_graph`, e.g.,
+            `tmnt_flags` and `bmp_performance_mapping_conc`. The
+            `load_cols` default to `pocs` and must be among them.
+
+        Returns
+        -------
+        compiled.BatchResult
+            with one scenario per event. Use `to_frame` for the per event
+            results and `aggregate` for the totals over all events.
+        """
+        solve_kwargs.setdefault('load_cols', self.pocs)
+        network = SwmmNetwork(scenario=self).compile(**solve_kwargs)
+
+        poc_pos = pandas.Index(self.pocs).get_indexer(network.load_cols)
+        if (poc_pos < 0).any():
+            unknown = [c for c, p in zip(network.load_cols, poc_pos) if p < 0]
+            e = 'Pollutants {} are not in `pocs` {}.'.format(
+                unknown, self.pocs)
+            raise ValueError(e)
+
+        # the loads and volumes enter the network at the subcatchments
+        node_pos = self.pollutant_table['index'].get_indexer(network.nodes)
+        xtype = self.nodes_df.xtype.reindex(network.nodes)
+        subcatchment = (xtype == 'subcatchment').values
+        known = (node_pos >= 0) & subcatchment
+
+        loads = numpy.zeros(
+            (len(self.events), network.n_nodes, len(network.load_cols)))
+        event_loads = self.event_loads
+        loads[:, known] = event_loads[:, node_pos[known]][:, :, poc_pos]
+
+        node_volume = numpy.zeros((len(self.events), network.n_nodes))
+        node_volume[:, subcatchment] = (
+            self.node_volumes
+            .reindex(columns=xtype.index[subcatchment])
+            .fillna(0)
+            .values
+        )
+
+        edge_volume = (
+            self.edge_volumes
+            .reindex(columns=network.edge_ids)
+            .fillna(0)
+            .values
+        )
+
+        result = network.solve(
+            loads, edge_volume=edge_volume, node_volume=node_volume)
+        result.scenarios = self.events
+        return result
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import pickle
+import numbers
+
+import numpy
+
+from .cache import _column_array
+from .parallel import SharedArrays
+
+
+MAGIC = b'SWMMNET1'
+
+# the name of each kind of node name or edge key
+_NAME_KINDS = [str, int, float]
+
+_MISSING = object()
+
+
+def _pack_names(values):
+    """store hashable names of mixed string and number types as a string
+    array and a type code array.
+    """
+    kinds = []
+    for v in values:
+        if isinstance(v, str):
+            kinds.append(0)
+        elif isinstance(v, numbers.Integral) and not isinstance(v, bool):
+            kinds.append(1)
+        elif isinstance(v, numbers.Real) and not isinstance(v, bool):
+            kinds.append(2)
+        else:
+            kinds.append(-1)
+
+    if -1 in kinds:
+        return None
+    names = numpy.array([repr(v) if k == 2 else str(v)
+                         for k, v in zip(kinds, values)], dtype=str)
+    return names, numpy.array(kinds, dtype=numpy.int8)
+
+
+def _unpack_names(names, kinds):
+    return [_NAME_KINDS[k](v) for v, k in zip(names.tolist(), kinds.tolist())]
+
+
+def _pickled(obj):
+    return numpy.frombuffer(pickle.dumps(obj, protocol=2), dtype=numpy.uint8)
+
+
+def _unpickled(arr):
+    return pickle.loads(arr.tobytes())
+
+
+def _names_arrays(prefix, values):
+    packed = _pack_names(values)
+    if packed is None:
+        # e.g., tuples as node names
+        return {prefix + '/pickle': _pickled(list(values))}
+    names, kinds = packed
+    return {prefix: names, prefix + '/kind': kinds}
+
+
+def _names_values(arrays, prefix):
+    if prefix + '/pickle' in arrays:
+        return _unpickled(arrays[prefix + '/pickle'])
+    return _unpack_names(arrays[prefix], arrays[prefix + '/kind'])
+
+
+def _typed_column(values):
+    """a typed array of a column whose values are all of one kind, so that
+    they come back with their own type, e.g., an int in a column that
+    also holds floats is pickled rather than stored as a float.
+    """
+    kinds = set()
+    for v in values:
+        if v is None:
+            continue
+        elif isinstance(v, (bool, numpy.bool_)):
+            kinds.add(bool)
+        elif isinstance(v, numbers.Integral):
+            kinds.add(int)
+        elif isinstance(v, numbers.Real):
+            kinds.add(float)
+        else:
+            kinds.add(type(v))
+    if len(kinds) > 1:
+        return None
+    try:
+        return _column_array(values)
+    except OverflowError:
+        # integers beyond 64 bits
+        return None
+
+
+def _attr_arrays(prefix, records):
+    """columnar arrays of a list of attribute dicts. Columns that do not
+    fit a typed array are pickled.
+    """
+    cols = sorted(set([k for r in records for k in r]), key=repr)
+    arrays = {}
+    columns = []
+    for i, col in enumerate(cols):
+        values = [r.get(col, _MISSING) for r in records]
+        key = '{}/{}'.format(prefix, i)
+        packed = None
+        # typed columns mark missing values with None, so columns holding
+        # None itself are pickled.
+        if not any([v is None for v in values]):
+            packed = _typed_column(
+                [None if v is _MISSING else v for v in values])
+        if packed is None:
+            present = numpy.array([v is not _MISSING for v in values],
+                                  dtype=bool)
+            arrays[key + '/pickle'] = _pickled(
+                [v for v in values if v is not _MISSING])
+        else:
+            arr, present = packed
+            arrays[key] = arr
+        arrays[key + '/mask'] = present
+        columns.append(col)
+    arrays[prefix + '/columns'] = _pickled(columns)
+    return arrays
+
+
+def _attr_records(arrays, prefix, n):
+    records = [{} for _ in range(n)]
+    columns = _unpickled(arrays[prefix + '/columns'])
+    for i, col in enumerate(columns):
+        key = '{}/{}'.format(prefix, i)
+        present = numpy.flatnonzero(arrays[key + '/mask'])
+        if key + '/pickle' in arrays:
+            values = _unpickled(arrays[key + '/pickle'])
+            for j, v in zip(present, values):
+                records[j][col] = v
+        else:
+            values = arrays[key].tolist()
+            for j in present:
+                records[j][col] = values[j]
+    return records
+
+
+def to_arrays(G):
+    """contiguous typed arrays of the topology, node and edge attributes
+    and graph attributes of `G`.
+
+    The derived structures of a `SwmmNetwork` and its `scenario` are not
+    stored.
+    """
+    nodes = list(G.nodes())
+    edges = list(G.edges(keys=True, data=True))
+    index = {n: i for i, n in enumerate(nodes)}
+
+    arrays = {}
+    arrays.update(_names_arrays('nodes', nodes))
+    arrays.update(_names_arrays('edges/key', [e[2] for e in edges]))
+    arrays['edges/src'] = numpy.array(
+        [index[e[0]] for e in edges], dtype=numpy.int64)
+    arrays['edges/dst'] = numpy.array(
+        [index[e[1]] for e in edges], dtype=numpy.int64)
+    arrays.update(_attr_arrays('node', [G.node[n] for n in nodes]))
+    arrays.update(_attr_arrays('edge', [e[3] for e in edges]))
+    arrays['graph'] = _pickled(G.graph)
+    return arrays
+
+
+def from_arrays(arrays, create_using=None):
+    """rebuild a graph from `to_arrays`.
+
+    Parameters
+    ----------
+    arrays : dict of numpy.ndarray
+    create_using : networkx.MultiDiGraph, optional (default=None)
+        the (empty) graph to fill. Defaults to a new `SwmmNetwork`.
+
+    Returns
+    -------
+    networkx.MultiDiGraph
+    """
+    if create_using is None:
+        from .swmmnetwork import SwmmNetwork
+        create_using = SwmmNetwork()
+    G = create_using
+
+    nodes = _names_values(arrays, 'nodes')
+    keys = _names_values(arrays, 'edges/key')
+    src = arrays['edges/src'].tolist()
+    dst = arrays['edges/dst'].tolist()
+
+    G.graph.update(_unpickled(arrays['graph']))
+    G.add_nodes_from(zip(nodes, _attr_records(arrays, 'node', len(nodes))))
+    G.add_edges_from(
+        (nodes[u], nodes[v], k, d) for u, v, k, d in
+        zip(src, dst, keys, _attr_records(arrays, 'edge', len(keys))))
+    return G
+
+
+def _write(f, arrays):
+    layout = SharedArrays.make_layout(
+        [(k, v.dtype.str, v.shape) for k, v in arrays.items()])
+    header = json.dumps(
+        [[k, d, list(s), o] for k, d, s, o in layout]).encode()
+    # the data starts at a 64 byte boundary after the header
+    start = -(-(len(MAGIC) + 8 + len(header)) // 64) * 64
+
+    f.write(MAGIC)
+    f.write(numpy.array(len(header), dtype='<u8').tobytes())
+    f.write(header)
+    f.write(b'\0' * (start - len(MAGIC) - 8 - len(header)))
+    pos = 0
+    for key, _, _, offset in layout:
+        f.write(b'\0' * (offset - pos))
+        data = numpy.ascontiguousarray(arrays[key]).tobytes()
+        f.write(data)
+        pos = offset + len(data)
+
+
+def _read(buf):
+    """the arrays of a serialized network, as views into `buf`."""
+    buf = memoryview(buf)
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError('Not a serialized SwmmNetwork.')
+    n = int(numpy.frombuffer(buf, dtype='<u8', count=1, offset=len(MAGIC))[0])
+    head = len(MAGIC) + 8
+    layout = json.loads(bytes(buf[head:head + n]).decode())
+    start = -(-(head + n) // 64) * 64
+    return {
+        key: numpy.ndarray(shape, dtype=dtype, buffer=buf,
+                           offset=start + offset)
+        for key, dtype, shape, offset in layout
+    }
+
+
+def dumps(G):
+    """serialize `G` to bytes. See `save`."""
+    f = io.BytesIO()
+    _write(f, to_arrays(G))
+    return f.getvalue()
+
+
+def loads(data, create_using=None):
+    """rebuild a network from `dumps`."""
+    return from_arrays(_read(data), create_using=create_using)
+
+
+def save(G, path):
+    """write `G` to one file of contiguous, 64 byte aligned typed arrays.
+
+    The file holds the node names, the edge endpoints as integer indices,
+    each node and edge attribute as one column with a presence mask, and
+    the graph attributes, e.g., the diagnostics of the last solve. Columns
+    of mixed or non-numeric python objects are pickled.
+    """
+    with open(path, 'wb') as f:
+        _write(f, to_arrays(G))
+
+
+def load_arrays(path, mmap=True):
+    """the stored arrays of a saved network without building the graph.
+
+    Parameters
+    ----------
+    path : string
+    mmap : bool, optional (default=True)
+        if True, the arrays are read only views of a memory map of the file
+        and are paged in on use, so that selected columns, e.g., the solved
+        loads, can be read from large files cheaply.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+    """
+    if mmap:
+        return _read(numpy.memmap(path, dtype=numpy.uint8, mode='r'))
+    with open(path, 'rb') as f:
+        return _read(f.read())
+
+
+def load(path, mmap=True, create_using=None):
+    """read a network written by `save`."""
+    return from_arrays(load_arrays(path, mmap=mmap),
+                       create_using=create_using)
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+
+"""A long running local solve service.
+
+    swmmnetwork-serve MANIFEST [--port PORT | --socket PATH] [--max-models N]
+
+Models are the named rows of a `cli` manifest. Each is parsed and compiled
+on its first request and kept in memory until it is the least recently
+used of more than `--max-models` models. Requests and responses are one
+line of json each over a tcp or unix stream socket::
+
+    {"model": "existing",
+     "loads": {"S-1": {"TSS": 12.5}},
+     "bmps": {"C-4": "BR", "C-9": null},
+     "nodes": ["OF-1"]}
+
+    {"ok": true, "results": {"OF-1": {"TSS": 8.1}}}
+
+`loads` replace the load of the listed nodes and pollutants, `bmps` place
+(or with null, remove) a bmp on the listed links, and `nodes` selects the
+nodes whose effluent loads are returned (default all). Both deltas apply
+to this request only. Failed requests get ``{"ok": false, "error": ...}``.
+"""
+
+from __future__ import print_function
+
+import sys
+import json
+import socket
+import argparse
+import threading
+import socketserver
+import collections
+
+import pandas
+
+from .core import resolve_treatment_table
+from .util import _to_list
+
+
+class SolveModel(object):
+    """A compiled network that is solved for load and bmp changes.
+
+    Parameters
+    ----------
+    network : compiled.CompiledNetwork
+    bmp_performance_mapping_conc : dict, optional (default=None)
+        every bmp flag of the mapping may be placed by a request.
+    vol_reduced_flags : list of strings, optional (default=['INF'])
+        flags that remove all of a link's load when placed.
+
+    """
+
+    def __init__(self, network, bmp_performance_mapping_conc=None,
+                 vol_reduced_flags=['INF']):
+        if bmp_performance_mapping_conc is None:
+            bmp_performance_mapping_conc = {}
+
+        self.network = network
+        self.vol_reduced_flags = _to_list(vol_reduced_flags)
+
+        for flag in bmp_performance_mapping_conc:
+            if flag not in network.flags:
+                network.flags.append(flag)
+        network.treatment_table, _ = resolve_treatment_table(
+            bmp_performance_mapping_conc, network.load_cols,
+            flags=network.flags)
+
+        self.edge_index = {e: i for i, e in enumerate(network.edge_ids)}
+        self.load_index = {c: i for i, c in enumerate(network.load_cols)}
+
+    def _loads(self, loads):
+        arr = self.network.node_load
+        if not loads:
+            return arr
+        arr = arr.copy()
+        for node, values in loads.items():
+            i = self.network.node_index[node]
+            for load_col, value in values.items():
+                arr[i, self.load_index[load_col]] = value
+        return arr
+
+    def _bmps(self, bmps):
+        edge_bmp = self.network.edge_bmp
+        edge_vol_reduced = self.network.edge_vol_reduced
+        if not bmps:
+            return edge_bmp, edge_vol_reduced
+        edge_bmp = edge_bmp.copy()
+        edge_vol_reduced = edge_vol_reduced.copy()
+        for edge, flag in bmps.items():
+            i = self.edge_index[edge]
+            edge_bmp[i] = -1
+            edge_vol_reduced[i] = flag in self.vol_reduced_flags
+            if flag is not None and not edge_vol_reduced[i]:
+                try:
+                    edge_bmp[i] = self.network.flags.index(flag)
+                except ValueError:
+                    e = 'No performance functions for bmp {!r}.'
+                    raise ValueError(e.format(flag))
+        return edge_bmp, edge_vol_reduced
+
+    def solve(self, loads=None, bmps=None, nodes=None):
+        """the effluent loads after the changes of one request.
+
+        Parameters
+        ----------
+        loads : dict, optional (default=None)
+            {node: {load_col: load}} replacing the compiled loads.
+        bmps : dict, optional (default=None)
+            {edge id: flag or None} replacing the compiled bmps.
+        nodes : list, optional (default=None)
+            the nodes to report. Defaults to every node.
+
+        Returns
+        -------
+        dict
+            {node: {load_col: effluent load}}
+        """
+        edge_bmp, edge_vol_reduced = self._bmps(bmps)
+        result = self.network.solve(
+            self._loads(loads), edge_bmp=edge_bmp,
+            edge_vol_reduced=edge_vol_reduced)
+
+        if nodes is None:
+            nodes = self.network.nodes
+        idx = [self.network.node_index[n] for n in nodes]
+        values = result.node_load_eff[0, idx].tolist()
+        return {
+            n: dict(zip(self.network.load_cols, v))
+            for n, v in zip(nodes, values)
+        }
+
+
+class ModelStore(object):
+    """Least recently used cache of loaded models.
+
+    Parameters
+    ----------
+    loader : callable
+        returns the `SolveModel` of a model name.
+    max_models : int, optional (default=8)
+
+    """
+
+    def __init__(self, loader, max_models=8):
+        self.loader = loader
+        self.max_models = max_models
+        self.models = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, name):
+        with self._lock:
+            if name in self.models:
+                self.models.move_to_end(name)
+                return self.models[name]
+            # one thread loads each model while the others wait for it
+            name_lock = self._loading.setdefault(name, threading.Lock())
+
+        with name_lock:
+            with self._lock:
+                if name in self.models:
+                    self.models.move_to_end(name)
+                    return self.models[name]
+
+            try:
+                model = self.loader(name)
+                with self._lock:
+                    self.models[name] = model
+                    while len(self.models) > self.max_models:
+                        self.models.popitem(last=False)
+            finally:
+                # drop the lock of a failed load too, so it is retried
+                with self._lock:
+                    self._loading.pop(name, None)
+        return model
+
+
+def manifest_loader(manifest):
+    """a `ModelStore` loader for the rows of a `cli` manifest."""
+    from .cli import read_manifest, build_network
+
+    if not isinstance(manifest, pandas.DataFrame):
+        manifest = read_manifest(manifest)
+    rows = {row['name']: row for row in manifest.to_dict('records')}
+
+    def loader(name):
+        if name not in rows:
+            raise KeyError('Unknown model {!r}.'.format(name))
+        G, load_cols, mapping = build_network(rows[name])
+        network = G.compile(load_cols=load_cols,
+                            bmp_performance_mapping_conc=mapping)
+        return SolveModel(network, bmp_performance_mapping_conc=mapping)
+
+    return loader
+
+
+def handle_request(store, request):
+    """the response to one decoded request."""
+    try:
+        model = store.get(request['model'])
+        results = model.solve(loads=request.get('loads'),
+                              bmps=request.get('bmps'),
+                              nodes=request.get('nodes'))
+        return {'ok': True, 'results': results}
+    except Exception as e:
+        return {'ok': False, 'error': '{}: {}'.format(type(e).__name__, e)}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode())
+            except ValueError as e:
+                response = {'ok': False, 'error': 'Invalid json: {}'.format(e)}
+            else:
+                response = handle_request(self.server.store, request)
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def make_server(store, address):
+    """a threaded server of `store`'s models.
+
+    Each connection is served by its own thread. The solves are numpy bound
+    and share the resident models, so threads rather than processes serve
+    concurrent requests.
+
+    Parameters
+    ----------
+    store : ModelStore
+    address : tuple or string
+        a (host, port) tuple or the path of a unix socket.
+
+    Returns
+    -------
+    socketserver.BaseServer
+        call its `serve_forever` method to start serving.
+    """
+    if isinstance(address, str):
+        server = _UnixServer(address, _Handler)
+    else:
+        server = _TCPServer(address, _Handler)
+    server.store = store
+    return server
+
+
+def request(address, model, loads=None, bmps=None, nodes=None,
+            timeout=None):
+    """send one request to a running server and return its response.
+
+    Parameters
+    ----------
+    address : tuple or string
+        the (host, port) or unix socket path of the server.
+    model : string
+    loads, bmps, nodes : optional (default=None)
+        see `SolveModel.solve`.
+    timeout : float, optional (default=None)
+        seconds to wait for the connection and for the response before
+        `socket.timeout` is raised. Defaults to waiting forever.
+
+    Returns
+    -------
+    dict
+    """
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    payload = {'model': model, 'loads': loads, 'bmps': bmps, 'nodes': nodes}
+    with sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        f = sock.makefile('rwb')
+        f.write(json.dumps(payload).encode() + b'\n')
+        f.flush()
+        return json.loads(f.readline().decode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='swmmnetwork-serve',
+        description='Serve solves of the models of a manifest.')
+    parser.add_argument('manifest', help='csv or json model manifest')
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument('--port', type=int, default=8765,
+                       help='localhost port (default: 8765)')
+    where.add_argument('--socket', default=None, help='unix socket path')
+    parser.add_argument('--max-models', type=int, default=8,
+                        help='models kept in memory (default: 8)')
+    args = parser.parse_args(argv)
+
+    address = args.socket or ('127.0.0.1', args.port)
+    store = ModelStore(manifest_loader(args.manifest),
+                       max_models=args.max_models)
+    server = make_server(store, address)
+    print('serving on {}'.format(address), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import numpy
+
+
+class GridIndex(object):
+    """Uniform grid index of named points for nearest neighbor and bounding
+    box queries.
+
+    The points are sorted by the grid cell that holds them, so the points
+    of consecutive cells of one grid column are one contiguous slice of
+    the coordinate arrays. A query reads only the cells that it overlaps,
+    or, for nearest neighbors, the rings of cells around the query point
+    until no unread cell can hold a closer point.
+
+    Parameters
+    ----------
+    names : list
+        the name of each point, e.g., node names.
+    xy : array-like shaped (points, 2)
+    cell_size : float, optional (default=None)
+        the width of the square cells. Defaults to a size that holds about
+        four points per cell for evenly spread points.
+
+    """
+
+    # the most candidate distances sorted at once by `nearest_index`
+    MERGE_CELLS = 2 ** 22
+
+    def __init__(self, names, xy, cell_size=None):
+        xy = numpy.asarray(xy, dtype=float).reshape(-1, 2)
+        if len(names) != len(xy):
+            raise ValueError('There must be one name per point.')
+
+        self.lower = xy.min(axis=0) if len(xy) else numpy.zeros(2)
+        extent = xy.max(axis=0) - self.lower if len(xy) else numpy.zeros(2)
+        if cell_size is None:
+            area = max(extent[0], 1e-12) * max(extent[1], 1e-12)
+            cell_size = numpy.sqrt(4 * area / max(len(xy), 1))
+            # e.g., points on a line
+            cell_size = max(cell_size, extent.max() / max(len(xy), 1))
+        self.cell_size = float(cell_size) or 1.0
+        self.shape = (numpy.floor(extent / self.cell_size).astype(int) + 1)
+
+        cells = self._cells(xy)
+        order = numpy.argsort(cells, kind='stable')
+        self.names = numpy.empty(len(names), dtype=object)
+        self.names[:] = [names[i] for i in order]
+        self.xy = xy[order]
+        self.cell_ptr = numpy.zeros(self.shape.prod() + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(cells, minlength=self.shape.prod()),
+                     out=self.cell_ptr[1:])
+
+    def __len__(self):
+        return len(self.xy)
+
+    def _cell_coords(self, xy):
+        ij = numpy.floor((xy - self.lower) / self.cell_size).astype(int)
+        return numpy.clip(ij, 0, self.shape - 1)
+
+    def _cells(self, xy):
+        ij = self._cell_coords(xy)
+        return ij[:, 0] * self.shape[1] + ij[:, 1]
+
+    def _column_slices(self, i, j0, j1):
+        """the point index ranges of cells j0..j1 of grid columns `i`."""
+        base = i * self.shape[1]
+        return self.cell_ptr[base + j0], self.cell_ptr[base + j1 + 1]
+
+    def _gather(self, columns, j0, j1):
+        columns = numpy.asarray(columns, dtype=int)
+        if len(columns) == 0 or j0 > j1:
+            return numpy.zeros(0, dtype=numpy.int64)
+        start, stop = self._column_slices(columns, j0, j1)
+        lengths = stop - start
+        # the concatenated ranges start:stop of each column
+        offsets = numpy.repeat(start - numpy.cumsum(lengths) + lengths,
+                               lengths)
+        return numpy.arange(lengths.sum()) + offsets
+
+    def box_index(self, xmin, ymin, xmax, ymax):
+        """the sorted point indices within a bounding box, edges included."""
+        if len(self) == 0 or xmin > xmax or ymin > ymax:
+            return numpy.zeros(0, dtype=numpy.int64)
+        (i0, j0), (i1, j1) = self._cell_coords(
+            numpy.array([[xmin, ymin], [xmax, ymax]], dtype=float))
+        idx = self._gather(numpy.arange(i0, i1 + 1), j0, j1)
+        x, y = self.xy[idx, 0], self.xy[idx, 1]
+        inside = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+        return numpy.sort(idx[inside])
+
+    def box(self, xmin, ymin, xmax, ymax):
+        """the names of the points within a bounding box, e.g., a map
+        viewport.
+        """
+        return self.names[self.box_index(xmin, ymin, xmax, ymax)].tolist()
+
+    def _ring_slices(self, ci, cj, r):
+        """the point index ranges of the cells at ring distance `r` from
+        each cell (ci, cj), as (queries, ranges) arrays of starts and
+        stops. Ranges outside the grid are empty.
+        """
+        n_i, n_j = self.shape
+        if r == 0:
+            cells = (ci * n_j + cj)[:, numpy.newaxis]
+            return self.cell_ptr[cells], self.cell_ptr[cells + 1]
+
+        # the two side columns, rows j0..j1 as one range each, then the
+        # top and bottom cells of the columns in between.
+        j0, j1 = numpy.maximum(cj - r, 0), numpy.minimum(cj + r, n_j - 1)
+        side_i = numpy.column_stack([ci - r, ci + r])
+        side = (side_i >= 0) & (side_i < n_i)
+        mid_i = ci[:, numpy.newaxis] + numpy.arange(-r + 1, r)
+        mid_j = [numpy.broadcast_to(j[:, numpy.newaxis], mid_i.shape)
+                 for j in (cj - r, cj + r)]
+        mid = [(mid_i >= 0) & (mid_i < n_i) & (j >= 0) & (j < n_j)
+               for j in mid_j]
+
+        first = numpy.hstack([side_i * n_j + j0[:, numpy.newaxis]] +
+                             [mid_i * n_j + j for j in mid_j])
+        last = numpy.hstack([side_i * n_j + j1[:, numpy.newaxis]] +
+                            [mid_i * n_j + j for j in mid_j])
+        ok = numpy.hstack([side] + mid)
+        start = numpy.where(ok, self.cell_ptr[numpy.where(ok, first, 0)], 0)
+        stop = numpy.where(
+            ok, self.cell_ptr[numpy.where(ok, last, 0) + 1], 0)
+        return start, stop
+
+    def _merge_nearest(self, q, rows, start, stop, idx, dist):
+        """merge the points of the ranges start:stop of each query in
+        `rows` into its `k` nearest so far, nearest first, with the points
+        read earlier first among equal distances.
+        """
+        k = idx.shape[1]
+        lengths = (stop - start).ravel()
+        total = lengths.sum()
+        if total == 0:
+            return
+        # the concatenated ranges, grouped by query in reading order
+        offsets = numpy.repeat(start.ravel() - numpy.cumsum(lengths) +
+                               lengths, lengths)
+        pts = numpy.arange(total) + offsets
+        owner = numpy.repeat(
+            numpy.repeat(numpy.arange(len(rows)), start.shape[1]), lengths)
+        counts = numpy.bincount(owner, minlength=len(rows))
+        col = (k + numpy.arange(total) -
+               numpy.repeat(numpy.cumsum(counts) - counts, counts))
+
+        shape = (len(rows), k + counts.max())
+        cand_dist = numpy.full(shape, numpy.inf)
+        cand_idx = numpy.zeros(shape, dtype=numpy.int64)
+        cand_dist[:, :k], cand_idx[:, :k] = dist[rows], idx[rows]
+        cand_dist[owner, col] = numpy.hypot(*(self.xy[pts] - q[rows][owner]).T)
+        cand_idx[owner, col] = pts
+
+        order = numpy.argsort(cand_dist, axis=1, kind='stable')[:, :k]
+        row = numpy.arange(len(rows))[:, numpy.newaxis]
+        idx[rows], dist[rows] = cand_idx[row, order], cand_dist[row, order]
+
+    def nearest_index(self, x, y, k=1):
+        """the indices and distances of the `k` points nearest to each query
+        point. See `nearest`.
+
+        All the query points are searched together, one ring of cells at
+        a time, with numpy operations over the queries that still need
+        that ring. The candidates of each ring are sorted as one (queries,
+        candidates) array, in blocks of at most `MERGE_CELLS` values.
+        """
+        q = numpy.column_stack([numpy.ravel(x), numpy.ravel(y)]).astype(float)
+        k = min(k, len(self))
+        idx = numpy.zeros((len(q), k), dtype=numpy.int64)
+        dist = numpy.full((len(q), k), numpy.inf)
+        if k == 0 or len(q) == 0:
+            return idx, dist
+
+        n_i, n_j = self.shape
+        lo = self.lower
+        size = self.cell_size
+        ci, cj = self._cell_coords(q).T
+        active = numpy.arange(len(q))
+        r = 0
+        while len(active):
+            start, stop = self._ring_slices(ci[active], cj[active], r)
+            width = k + (stop - start).sum(axis=1).max()
+            block = max(self.MERGE_CELLS // width, 1)
+            for b in range(0, len(active), block):
+                self._merge_nearest(q, active[b:b + block],
+                                    start[b:b + block], stop[b:b + block],
+                                    idx, dist)
+
+            # the closest that any point outside the rings read so far
+            # can be to each query, inf where the rings cover the grid.
+            qa, ia, ja = q[active], ci[active], cj[active]
+            bounds = numpy.full((len(active), 4), numpy.inf)
+            sides = [
+                (ia - r > 0, qa[:, 0] - (lo[0] + (ia - r) * size)),
+                (ia + r < n_i - 1, lo[0] + (ia + r + 1) * size - qa[:, 0]),
+                (ja - r > 0, qa[:, 1] - (lo[1] + (ja - r) * size)),
+                (ja + r < n_j - 1, lo[1] + (ja + r + 1) * size - qa[:, 1]),
+            ]
+            for b, (ok, bound) in enumerate(sides):
+                bounds[ok, b] = bound[ok]
+            bound = bounds.min(axis=1)
+
+            kth = dist[active, k - 1]
+            done = numpy.isinf(bound) | (kth <= numpy.maximum(bound, 0))
+            active = active[~done]
+            r += 1
+
+        return idx, dist
+
+    def nearest(self, x, y, k=1):
+        """the names of the `k` points nearest to each query point, e.g.,
+        the node nearest to a click on a map.
+
+        Parameters
+        ----------
+        x, y : float or array-like
+            one or many query points.
+        k : int, optional (default=1)
+
+        Returns
+        -------
+        names : numpy.ndarray of objects shaped (queries, k)
+            nearest first.
+        distance : numpy.ndarray shaped (queries, k)
+        """
+        idx, dist = self.nearest_index(x, y, k=k)
+        return self.names[idx], dist
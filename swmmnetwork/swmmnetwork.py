@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import division
+import copy
 import warnings
 
 import numpy
@@ -10,6 +11,17 @@ import networkx as nx
 
 from . import core
 from . import convert
+from . import serialize
+from .compiled import CompiledNetwork
+from .dag import NetworkDag
+from .delta import graph_delta
+from .optimize import required_removal
+from .patch import apply_patch
+from .ordering import IncrementalOrder
+from .reachability import ReachabilityIndex
+from .rollup import rollup
+from .spatial import GridIndex
+from .util import _to_list, validate_swmmnetwork, NetworkCycleError
 
 
 class SwmmNetwork(nx.MultiDiGraph):
@@ -20,8 +32,33 @@ class SwmmNetwork(nx.MultiDiGraph):
     def __init__(self,
                  data=None,
                  scenario=None,
+                 on_cycle='raise',
                  **kwargs):
 
+        if on_cycle not in ('raise', 'warn'):
+            raise ValueError("`on_cycle` must be one of 'raise' or 'warn'.")
+
+        # the topological order is updated as each edge is added after
+        # construction; it is None while the network has a cycle.
+        self.on_cycle = on_cycle
+        self._order = None
+        self._check_cycles = False
+
+        # incremented whenever nodes or edges are added or removed so that
+        # derived structures can be rebuilt lazily.
+        self._structure_version = 0
+        self._dag = None
+        self._dag_version = None
+        self._reachability = None
+        self._reachability_version = None
+
+        # nodes whose results are stale after an edit, see `apply_patch`.
+        self.dirty_nodes = set()
+
+        self._positions = None
+        self._spatial_index = None
+        self._spatial_version = None
+
         nx.MultiDiGraph.__init__(self, data, **kwargs)
 
         """
@@ -30,6 +67,12 @@ class SwmmNetwork(nx.MultiDiGraph):
         scenario : scenario.Scenario, optional (default=None)
             if defined this will load the edges, nodes, and check_nodes
             from the scenario object to build the network.
+        on_cycle : {'raise', 'warn'}, optional (default='raise')
+            what to do when an edge added after construction would close a
+            cycle. 'raise' rejects the edge with a `util.NetworkCycleError`;
+            'warn' adds it and warns. A network built with a cycle from
+            `data` or `scenario`, or copied from one, cannot be solved
+            until the cycle is removed.
 
         """
 
@@ -39,6 +82,148 @@ class SwmmNetwork(nx.MultiDiGraph):
             self.add_nodes_from(scenario.node_list)
             self.add_nodes_from(scenario.check_node_list)
 
+        self._order = IncrementalOrder.from_graph(self)
+        self._check_cycles = True
+
+    def __getstate__(self):
+        # pickle the compact array format of `serialize` rather than the
+        # nested dicts of networkx. The scenario and the derived structures
+        # are not pickled.
+        return {
+            'network': serialize.dumps(self),
+            'on_cycle': self.on_cycle,
+            'dirty_nodes': self.dirty_nodes,
+            'positions': self._positions,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(on_cycle=state['on_cycle'])
+        serialize.loads(state['network'], create_using=self)
+        self.dirty_nodes = set(state['dirty_nodes'])
+        self._positions = state['positions']
+
+    def __copy__(self):
+        # `copy` keeps the networkx semantics, which `__getstate__` would
+        # otherwise change: a shallow copy shares the graph dicts and a
+        # deep copy copies every attribute, including the scenario.
+        cls = self.__class__
+        G = cls.__new__(cls)
+        G.__dict__.update(self.__dict__)
+        return G
+
+    def __deepcopy__(self, memo):
+        cls = self.__class__
+        G = cls.__new__(cls)
+        memo[id(self)] = G
+        for k, v in self.__dict__.items():
+            G.__dict__[k] = copy.deepcopy(v, memo)
+        return G
+
+    def save(self, path):
+        """write this network to a file. See `serialize.save`."""
+        serialize.save(self, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """read a network written by `save`. See `serialize.load`."""
+        return serialize.load(path, mmap=mmap, create_using=cls())
+
+    def _structure_changed(self):
+        self._structure_version += 1
+
+    def add_node(self, *args, **kwargs):
+        self._structure_changed()
+        return nx.MultiDiGraph.add_node(self, *args, **kwargs)
+
+    def add_nodes_from(self, *args, **kwargs):
+        self._structure_changed()
+        return nx.MultiDiGraph.add_nodes_from(self, *args, **kwargs)
+
+    def remove_node(self, n):
+        self._structure_changed()
+        self.dirty_nodes.discard(n)
+        if self._order is not None:
+            self._order.remove_node(n)
+        return nx.MultiDiGraph.remove_node(self, n)
+
+    def remove_nodes_from(self, nodes):
+        self._structure_changed()
+        nodes = list(nodes)
+        self.dirty_nodes.difference_update(nodes)
+        if self._order is not None:
+            for n in nodes:
+                self._order.remove_node(n)
+        return nx.MultiDiGraph.remove_nodes_from(self, nodes)
+
+    def add_edge(self, u_for_edge, v_for_edge, key=None, **attr):
+        if self._check_cycles and self._order is not None:
+            try:
+                self._order.add_edge(self, u_for_edge, v_for_edge)
+            except NetworkCycleError as err:
+                if self.on_cycle == 'raise':
+                    raise
+                warnings.warn(str(err))
+                self._order = None
+        self._structure_changed()
+        return nx.MultiDiGraph.add_edge(
+            self, u_for_edge, v_for_edge, key=key, **attr)
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        ebunch = list(ebunch_to_add)
+        self._structure_changed()
+
+        # large batches, e.g., whole models, are ordered in one pass.
+        if (self._check_cycles and self._order is not None and
+                len(ebunch) > 1 and
+                10 * len(ebunch) >= self.number_of_edges()):
+            order = IncrementalOrder.from_graph(
+                self, edges=[(e[0], e[1]) for e in ebunch])
+            # the edges of a network without edges, e.g., of `copy` or
+            # `reverse` of a network that has a cycle, are accepted as they
+            # would be from `data`, so that the copy can be fixed.
+            if order is not None or self.number_of_edges() == 0:
+                self._check_cycles = False
+                try:
+                    keys = nx.MultiDiGraph.add_edges_from(
+                        self, ebunch, **attr)
+                finally:
+                    self._check_cycles = True
+                self._order = order
+                return keys
+
+        # otherwise networkx adds each edge through `add_edge`, so each is
+        # checked for cycles in turn. The edges before a rejected one are
+        # kept.
+        return nx.MultiDiGraph.add_edges_from(self, ebunch, **attr)
+
+    def remove_edge(self, *args, **kwargs):
+        self._structure_changed()
+        return nx.MultiDiGraph.remove_edge(self, *args, **kwargs)
+
+    def remove_edges_from(self, *args, **kwargs):
+        self._structure_changed()
+        return nx.MultiDiGraph.remove_edges_from(self, *args, **kwargs)
+
+    def clear(self):
+        self._structure_changed()
+        self.dirty_nodes.clear()
+        self._order = IncrementalOrder()
+        return nx.MultiDiGraph.clear(self)
+
+    def topological_sort(self):
+        """the nodes in topological order.
+
+        The order is kept up to date as edges are added. After a cycle was
+        added with ``on_cycle='warn'``, it is rebuilt once the cycle is
+        removed, and a `util.NetworkCycleError` listing the cycles is
+        raised until then.
+        """
+        if self._order is None:
+            self._order = IncrementalOrder.from_graph(self)
+            if self._order is None:
+                validate_swmmnetwork(self)
+        return self._order.sorted_nodes(self)
+
     @classmethod
     def from_swmm_inp(cls, inp):
         return convert.from_swmm_inp(inp, cls())
@@ -46,8 +231,251 @@ class SwmmNetwork(nx.MultiDiGraph):
     def add_edges_from_swmm_inp(self, inp):
         return convert.add_edges_from_swmm_inp(self, inp)
 
+    def apply_patch(self, patch, **kwargs):
+        """edit this network in place from a patch table or a SWMM input
+        fragment, and return the nodes that need a re-solve. See
+        `patch.apply_patch`.
+        """
+        return apply_patch(self, patch, **kwargs)
+
     def to_dataframe(self, index_col='id'):
         return convert.network_to_df(self, index_col=index_col)
 
-    def solve_network(self, **kwargs):
-        return core.solve_network(self, **kwargs)
+    def to_arrow(self, kind='node', columns=None):
+        """the node or edge attributes as a pyarrow.Table of typed
+        columns. See `arrow.graph_table`.
+        """
+        from .arrow import graph_table
+        return graph_table(self, kind=kind, columns=columns)
+
+    def to_parquet(self, path, kind='node', columns=None):
+        """write the node or edge attributes to a parquet file. See
+        `arrow.graph_table`.
+        """
+        from .arrow import write_parquet
+        write_parquet(self, path, kind=kind, columns=columns)
+
+    def solve_network(self, targets=None, changed=None, cache=None,
+                      cache_version=None, **kwargs):
+        """solve the network. See `core.solve_network` for the keyword
+        arguments.
+
+        Parameters
+        ----------
+        targets : list, optional (default=None)
+            solve only these nodes and everything upstream of them.
+        changed : list, optional (default=None)
+            solve only these nodes and everything downstream of them. The
+            rest of the network keeps the results of the previous solve.
+        cache : cache.ResultCache, optional (default=None)
+            reuse the stored results of an identical full solve. Use
+            `cache.ResultCache.solve` directly to learn whether the results
+            were read from the cache.
+        cache_version : string, optional (default=None)
+            tag identifying the `bmp_performance_mapping_conc` functions in
+            the cache key.
+
+        The solved nodes are removed from `dirty_nodes`, so after a patch
+        ``G.solve_network(changed=G.dirty_nodes)`` re-solves only the
+        region that the patch affected.
+
+        Returns
+        -------
+        None
+            The operation occurs inplace.
+        """
+        kwargs['dag'] = self.dag
+
+        if cache is not None and targets is None and changed is None:
+            cache.solve(self, version=cache_version, **kwargs)
+            self.dirty_nodes.clear()
+            return
+
+        if targets is not None or changed is not None:
+            nodes = set(self.nodes())
+            if targets is not None:
+                nodes &= self.reachability.all_ancestors(targets)
+            if changed is not None:
+                nodes &= self.reachability.all_descendants(changed)
+            kwargs['nodes'] = nodes
+
+        core.solve_network(self, **kwargs)
+        if 'nodes' in kwargs:
+            self.dirty_nodes.difference_update(kwargs['nodes'])
+        else:
+            self.dirty_nodes.clear()
+
+    @property
+    def dag(self):
+        """the integer indexed `dag.NetworkDag` of this network used by the
+        solver and the queries, rebuilt on first use after nodes or edges
+        are added or removed.
+        """
+        if self._dag is None or self._dag_version != self._structure_version:
+            self._dag = NetworkDag(self, order=self.topological_sort())
+            self._dag_version = self._structure_version
+        return self._dag
+
+    @property
+    def reachability(self):
+        """the `ReachabilityIndex` of this network, rebuilt on first use
+        after nodes or edges are added or removed.
+        """
+        if (self._reachability is None or
+                self._reachability_version != self._structure_version):
+            self._reachability = ReachabilityIndex(self, dag=self.dag)
+            self._reachability_version = self._structure_version
+        return self._reachability
+
+    @property
+    def positions(self):
+        """{node: [x, y]} map positions of the nodes, e.g., for drawing.
+        Defaults to the `plot_positions` of the scenario, if any.
+        """
+        if self._positions is None and hasattr(self, 'scenario'):
+            self._positions = self.scenario.plot_positions
+        return self._positions
+
+    @positions.setter
+    def positions(self, pos):
+        self._positions = pos
+        self._spatial_index = None
+
+    @property
+    def spatial_index(self):
+        """a `spatial.GridIndex` of the `positions` of the nodes of this
+        network, rebuilt on first use after nodes are added or removed.
+        """
+        if (self._spatial_index is None or
+                self._spatial_version != self._structure_version):
+            pos = self.positions or {}
+            nodes = [n for n in pos if n in self]
+            self._spatial_index = GridIndex(nodes, [pos[n] for n in nodes])
+            self._spatial_version = self._structure_version
+        return self._spatial_index
+
+    def nearest_nodes(self, x, y, k=1):
+        """the names and distances of the `k` nodes nearest to each (x, y)
+        point. See `spatial.GridIndex.nearest`.
+        """
+        return self.spatial_index.nearest(x, y, k=k)
+
+    def nodes_in_box(self, xmin, ymin, xmax, ymax):
+        """the nodes positioned within a bounding box."""
+        return self.spatial_index.box(xmin, ymin, xmax, ymax)
+
+    def upstream(self, node, xtype=None):
+        """set of nodes that drain to `node`, optionally only those of one
+        node `xtype`, e.g., 'subcatchment'.
+        """
+        nodes = self.reachability.ancestors(node)
+        if xtype is not None:
+            nodes = set([n for n in nodes if self.node[n].get('xtype') == xtype])
+        return nodes
+
+    def downstream(self, node, xtype=None):
+        """set of nodes that `node` drains to, optionally only those of one
+        node `xtype`, e.g., 'outfall'.
+        """
+        nodes = self.reachability.descendants(node)
+        if xtype is not None:
+            nodes = set([n for n in nodes if self.node[n].get('xtype') == xtype])
+        return nodes
+
+    def downstream_edges(self, node, flags=None, edge_name_col='id',
+                         split_on='-'):
+        """list of (from, to, data) edges downstream of `node`, optionally
+        only those with one of `flags` in their `edge_name_col`.
+        """
+        nodes = self.reachability.descendants(node, include_self=True)
+        dag = self.dag
+        edges = [e for n in nodes for e in dag.out_edges(n, data=True)]
+        if flags is not None:
+            flags = _to_list(flags)
+            edges = [
+                e for e in edges
+                if any([f in str(e[2].get(edge_name_col)).split(split_on)
+                        for f in flags])
+            ]
+        return list(edges)
+
+    def compile(self, **kwargs):
+        """integer indexed arrays of this network for batched solves. See
+        `compiled.CompiledNetwork.from_graph` for the keyword arguments.
+        """
+        kwargs.setdefault('dag', self.dag)
+        return CompiledNetwork.from_graph(self, **kwargs)
+
+    def sensitivities(self, outfall, **kwargs):
+        """the change in the load leaving `outfall` per unit change of each
+        subcatchment load and of each bmp's effluent concentration. See
+        `compiled.CompiledNetwork.sensitivities`.
+
+        Parameters
+        ----------
+        outfall : hashable
+        **kwargs
+            passed to `compiled.CompiledNetwork.from_graph`, e.g.,
+            `load_cols` and `bmp_performance_mapping_conc`.
+
+        Returns
+        -------
+        node_sensitivity, bmp_sensitivity : pandas.DataFrame
+            with a column per pollutant, indexed by node name and by the
+            `edge_name_col` of the treated edges.
+        """
+        network = self.compile(**kwargs)
+        res = network.sensitivities(outfall)
+
+        node_sensitivity = pandas.DataFrame(
+            res['node_load'][0],
+            index=pandas.Index(network.nodes, name='node'),
+            columns=network.load_cols,
+        )
+
+        bmps = numpy.flatnonzero(network.edge_bmp >= 0)
+        bmp_sensitivity = pandas.DataFrame(
+            res['edge_conc_eff'][0, bmps],
+            index=pandas.Index([network.edge_ids[i] for i in bmps],
+                               name='edge'),
+            columns=network.load_cols,
+        )
+
+        return node_sensitivity, bmp_sensitivity
+
+    def required_removal(self, targets, edges, **kwargs):
+        """the smallest removal efficiency at `edges` that meets the target
+        load of each outfall. See `optimize.required_removal`.
+        """
+        return required_removal(self, targets, edges, **kwargs)
+
+    def rollup(self, by='outfall', kind='node', load_cols=None,
+               vol_col='volume'):
+        """totals of the solved node or edge results by terminal outfall,
+        by attribute, e.g., 'xtype', or by a {node: group} mapping. See
+        `rollup.rollup`.
+        """
+        return rollup(self, by=by, kind=kind, load_cols=load_cols,
+                      vol_col=vol_col)
+
+    def compare(self, other, columns=None, kind='node', edge_name_col='id'):
+        """the differences of the solved results of `other`, a network
+        with the same nodes and edges, from this one. See
+        `delta.graph_delta`.
+        """
+        return graph_delta(self, other, columns=columns, kind=kind,
+                           edge_name_col=edge_name_col)
+
+    @property
+    def mass_balance(self):
+        """table of the solved vs. check volume of each node from the most
+        recent solve. See `core.mass_balance`.
+        """
+        return self.graph.get('mass_balance')
+
+    @property
+    def treatment_diagnostics(self):
+        """table of the bmp types and pollutants that had no performance
+        function during the most recent solve.
+        """
+        return self.graph.get('treatment_diagnostics')
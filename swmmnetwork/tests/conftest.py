@@ -0,0 +1,93 @@
+import pytest
+
+from swmmnetwork import SwmmNetwork
+from swmmnetwork.compiled import CompiledNetwork
+
+
+@pytest.fixture
+def links_and_nodes():
+    """
+                    J4     S1
+                   / \    /
+                  /   \  /
+          S3     /     J3   S2
+           \    /       |  /
+            \  /        | /
+             J6         BR
+             |         // \
+             |        //   \
+            ~BI      J2    INF
+             |       |
+             |       |
+             J5     BF
+              \    //
+               \  //
+                J1
+                |
+                |
+                OF
+    """
+    s = [
+        ('S1', {"load1": 6, "load2": 10, "volume": 12}),
+        ('S2', {"load1": 8, "load2": 10, "volume": 13}),
+        ('S3', {"load1": 5, "load2": 10, "volume": 10}),
+    ]
+
+    l = [
+        ('S1', 'J3', {'id': "^S1", "volume": 12}),
+        ('S2', 'BR', {'id': "^S2", "volume": 13}),
+        ('J3', 'BR', {'id': "C3", "volume": 12}),
+        ('BR', 'J2', {'id': "w2", "volume": 2}),
+        ('BR', 'J2', {'id': "TR-BR", "volume": 13}),
+        ('BR', 'INF-OF', {'id': "INF-1", "volume": 10}),
+        ('J2', 'BF', {'id': "C2", "volume": 15}),
+        ('BF', 1, {'id': "w1", "volume": 2}),
+        ('BF', 1, {'id': "TR-BF", "volume": 13}),
+        (1, 'OF', {'id': "C1", "volume": 16.8}),
+        ('J4', 'J3', {'id': "C4", "volume": 0}),
+        ('J4', 'J6', {'id': "C7", "volume": 0}),
+        ('S3', 'J6', {'id': "^S3", "volume": 10}),
+        ('J6', 'BI', {'id': 2, "volume": 10}),
+        ('BI', 'J5', {'id': "w3", "volume": 1.8}),
+        ('J5', 1, {'id': "C5", "volume": 1.8}),
+    ]
+    return l, s
+
+
+@pytest.fixture
+def bmp_mapping():
+    """the `bmp_performance_mapping_conc` of the `SN` network."""
+    return {
+        "BR": {
+            "load1": lambda x: .2 * x  # 80% reduced
+        },
+        "BI": {
+            "load1": lambda x: .2 * x  # 80% reduced
+        },
+        "BF": {
+            "load1": lambda x: .5 * x  # 50% reduced
+        },
+    }
+
+
+@pytest.fixture
+def SN(links_and_nodes, bmp_mapping):
+    l, s = links_and_nodes
+
+    G = SwmmNetwork()
+    G.add_edges_from(l)
+    G.add_nodes_from(s)
+    G.solve_network(
+        load_cols='load1',
+        tmnt_flags=['TR'],
+        vol_reduced_flags=['INF'],
+        bmp_performance_mapping_conc=bmp_mapping)
+
+    return G
+
+
+@pytest.fixture
+def CN(SN, bmp_mapping):
+    return CompiledNetwork.from_graph(
+        SN, load_cols=['load1', 'load2'],
+        bmp_performance_mapping_conc=bmp_mapping)
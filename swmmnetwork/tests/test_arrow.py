@@ -0,0 +1,54 @@
+import numpy
+import pytest
+
+from swmmnetwork.compiled import CompiledNetwork
+
+pyarrow = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def test_graph_table(SN, tmpdir):
+    table = SN.to_arrow()
+    assert table.num_rows == SN.number_of_nodes()
+    assert table.schema.field('load1_load_eff').type == pyarrow.float64()
+
+    df = table.to_pandas().set_index('node')
+    for node, data in SN.nodes(data=True):
+        assert numpy.isclose(df.loc[str(node), 'load1_load_eff'],
+                             data['load1_load_eff'])
+
+    edges = SN.to_arrow(kind='edge', columns=['id', 'volume'])
+    assert edges.column_names == ['from', 'to', 'key', 'id', 'volume']
+    assert edges.num_rows == SN.number_of_edges()
+
+    path = str(tmpdir.join('nodes.parquet'))
+    SN.to_parquet(path)
+    assert pq.read_table(path).equals(table)
+
+
+def test_batch_record_batches(SN, tmpdir, bmp_mapping):
+    cn = CompiledNetwork.from_graph(
+        SN, load_cols=['load1', 'load2'],
+        bmp_performance_mapping_conc=bmp_mapping)
+    loads = numpy.random.RandomState(0).rand(3, cn.n_nodes, 2)
+    result = cn.solve(loads)
+
+    path = str(tmpdir.join('batch.parquet'))
+    result.to_parquet(path)
+    f = pq.ParquetFile(path)
+    assert f.num_row_groups == 3
+
+    table = f.read()
+    assert table.column_names == [
+        'scenario', 'node', 'volume_in', 'load1_load_in', 'load2_load_in',
+        'load1_load_eff', 'load2_load_eff']
+    df = table.to_pandas().set_index(['scenario', 'node'])
+    frame = result.to_frame('node_load_eff')
+    numpy.testing.assert_allclose(
+        df[['load1_load_eff', 'load2_load_eff']].values, frame.values)
+
+    edges = result.to_arrow(edges=True)
+    assert edges.num_rows == 3 * cn.n_edges
+    numpy.testing.assert_allclose(
+        edges.column('load1_load_eff').to_numpy(),
+        result.edge_load_eff[:, :, 0].ravel())
@@ -0,0 +1,100 @@
+import pandas
+import pytest
+
+from swmmnetwork import SwmmNetwork
+from swmmnetwork.cache import ResultCache
+
+
+KWARGS = dict(
+    load_cols='load1',
+    tmnt_flags=['TR'],
+    vol_reduced_flags=['INF'],
+    bmp_performance_mapping_conc={
+        "BR": {"load1": lambda x: .2 * x},
+        "BF": {"load1": lambda x: .5 * x},
+    },
+)
+
+
+def _network(links_and_nodes):
+    l, s = links_and_nodes
+    G = SwmmNetwork()
+    G.add_edges_from(l)
+    G.add_nodes_from(s)
+    return G
+
+
+def test_cache_hit_restores_results(tmpdir, links_and_nodes):
+    cache = ResultCache(str(tmpdir))
+
+    G1 = _network(links_and_nodes)
+    assert not cache.solve(G1, version='v1', **KWARGS)
+    known = G1.to_dataframe(index_col='id')
+
+    G2 = _network(links_and_nodes)
+    assert G2.solve_network(cache=cache, cache_version='v1', **KWARGS) is None
+    pandas.testing.assert_frame_equal(
+        G2.to_dataframe(index_col='id').reindex(columns=known.columns),
+        known, check_dtype=False)
+
+
+@pytest.mark.parametrize(('change', 'hit'), [
+    (lambda G, kw: None, True),
+    (lambda G, kw: G.node['S1'].update(load1=1), False),
+    (lambda G, kw: G.edges['BR', 'J2', 0].update(volume=3), False),
+    (lambda G, kw: G.add_edge('S4', 'J4', id='^S4'), False),
+    (lambda G, kw: kw.update(version='v2'), False),
+    (lambda G, kw: kw.update(tmnt_flags=['BR']), False),
+])
+def test_cache_key(tmpdir, links_and_nodes, change, hit):
+    cache = ResultCache(str(tmpdir))
+    _network(links_and_nodes).solve_network(
+        cache=cache, cache_version='v1', **KWARGS)
+
+    G = _network(links_and_nodes)
+    kwargs = dict(KWARGS, version='v1')
+    change(G, kwargs)
+    assert cache.solve(G, **kwargs) == hit
+
+
+def test_cache_eviction(tmpdir, links_and_nodes):
+    cache = ResultCache(str(tmpdir))
+    for version in ['a', 'b', 'c']:
+        _network(links_and_nodes).solve_network(
+            cache=cache, cache_version=version, **KWARGS)
+    entry_size = cache.size // 3
+
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert cache.size <= 2 * entry_size
+    assert len(tmpdir.listdir()) == 2
+
+
+def test_cache_restores_mass_balance(tmpdir, links_and_nodes):
+    cache = ResultCache(str(tmpdir))
+
+    G1 = _network(links_and_nodes)
+    G1.node['J2']['_ck_volume'] = 10.
+    with pytest.warns(UserWarning):
+        G1.solve_network(cache=cache, **KWARGS)
+
+    G2 = _network(links_and_nodes)
+    G2.node['J2']['_ck_volume'] = 10.
+    assert cache.solve(G2, **KWARGS)
+    pandas.testing.assert_frame_equal(G2.mass_balance, G1.mass_balance)
+
+
+def test_cache_hit_keeps_other_attributes(tmpdir, links_and_nodes):
+    cache = ResultCache(str(tmpdir))
+    G = _network(links_and_nodes)
+    G.node['J2']['xtype'] = 'junction'
+    cache.solve(G, **KWARGS)
+    known = G.node['BR']['load1_load_eff']
+
+    G.node['J2']['xtype'] = 'storage'
+    G.node['BR']['load1_load_eff'] = -1
+    G.edges['BR', 'J2', 0]['label'] = 'a'
+    assert cache.solve(G, **KWARGS)
+    assert G.node['J2']['xtype'] == 'storage'
+    assert G.edges['BR', 'J2', 0]['label'] == 'a'
+    assert G.node['BR']['load1_load_eff'] == known
@@ -0,0 +1,95 @@
+import os
+
+import numpy
+import pandas as pd
+import pytest
+
+from swmmnetwork import cli
+from .utils import data_path
+
+
+def _manifest(tmpdir, rows):
+    path = str(tmpdir.join('manifest.csv'))
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return path
+
+
+def test_read_manifest(tmpdir):
+    path = _manifest(tmpdir, [
+        {'name': 'a', 'inp': 'm.inp', 'rpt': 'm.rpt', 'load': 'l.csv'},
+        {'name': 'b', 'inp': 'm.inp', 'rpt': 'm.rpt',
+         'concentration': 'c.csv', 'value_col': 'conc'},
+    ])
+    manifest = cli.read_manifest(path)
+    assert manifest['kind'].tolist() == ['load', 'concentration']
+    assert manifest['value_col'].tolist() == ['load', 'conc']
+    assert manifest['table'].tolist() == [
+        str(tmpdir.join('l.csv')), str(tmpdir.join('c.csv'))]
+    assert manifest['performance'].tolist() == [None, None]
+
+    path = _manifest(tmpdir, [
+        {'name': 'a', 'inp': 'm.inp', 'rpt': 'm.rpt', 'load': 'l.csv',
+         'concentration': 'c.csv'},
+    ])
+    with pytest.raises(ValueError):
+        cli.read_manifest(path)
+
+
+def test_read_performance_curves():
+    curves = pd.DataFrame({
+        'bmp': ['BR', 'BR', 'BR'],
+        'pollutant': ['TSS'] * 3,
+        'influent': [100., 0., 50.],
+        'effluent': [40., 0., 30.],
+    })
+    fxn = cli.read_performance_curves(curves)['BR']['TSS']
+    numpy.testing.assert_allclose(fxn(numpy.array([25., 75., 200.])),
+                                  [15., 35., 40.])
+
+
+def test_run_manifest_resume_and_failures(tmpdir):
+    out = str(tmpdir.join('out'))
+    path = _manifest(tmpdir, [
+        {'name': 'a', 'inp': 'missing.inp', 'rpt': 'missing.rpt',
+         'load': 'l.csv'},
+        {'name': 'b', 'inp': 'missing.inp', 'rpt': 'missing.rpt',
+         'load': 'l.csv'},
+    ])
+    os.makedirs(out)
+    open(cli.result_path(out, 'a'), 'w').close()
+
+    status = cli.run_manifest(path, out, processes=1, resume=True)
+    assert status['status'].tolist() == ['skipped', 'failed']
+
+    assert cli.main([path, out, '--resume']) == 1
+
+
+def test_run_manifest(tmpdir):
+    out = str(tmpdir.join('out'))
+    path = _manifest(tmpdir, [
+        {'name': n, 'inp': data_path('test.inp'), 'rpt': data_path('test.rpt'),
+         'concentration': data_path('conc.csv')}
+        for n in ['a', 'b']
+    ])
+    assert cli.main([path, out, '-p', '2']) == 0
+
+    a = pd.read_csv(cli.result_path(out, 'a'), index_col=[0])
+    b = pd.read_csv(cli.result_path(out, 'b'), index_col=[0])
+    pd.testing.assert_frame_equal(a, b)
+
+
+def test_model_tasks():
+    manifest = pd.DataFrame({
+        'name': list('abcdefg'),
+        'inp': ['m1.inp'] * 6 + ['m2.inp'],
+        'rpt': ['m1.rpt'] * 6 + ['m2.rpt'],
+        'kind': 'load', 'table': 'l.csv', 'value_col': 'load',
+        'performance': None,
+    })
+    tasks = cli._model_tasks(manifest, 'out', 4)
+    names = [[row['name'] for row in t[2]] for t in tasks]
+    # the scenarios of one model are spread over the workers
+    assert names == [['a', 'b'], ['c', 'd'], ['e', 'f'], ['g']]
+    assert [t[0] for t in tasks] == ['m1.inp'] * 3 + ['m2.inp']
+
+    assert len(cli._model_tasks(manifest, 'out', 1)) == 2
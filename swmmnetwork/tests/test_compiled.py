@@ -0,0 +1,147 @@
+import numpy
+import pandas
+import pytest
+
+from swmmnetwork import SwmmNetwork
+from swmmnetwork.compiled import CompiledNetwork
+
+
+def test_compiled_topology(CN):
+    # every edge leaves an earlier node than the one it enters
+    assert (CN.edge_src < CN.edge_dst).all()
+    assert (numpy.diff(CN.edge_src) >= 0).all()
+    assert CN.level_ptr[0] == 0 and CN.level_ptr[-1] == CN.n_nodes
+    assert sorted(CN.flags) == ['BF', 'BR']
+
+
+def test_compiled_solve_matches_network(SN, CN):
+    result = CN.solve()
+    for node, i in CN.node_index.items():
+        data = SN.node[node]
+        # the fixture network is solved for 'load1' only
+        assert numpy.isclose(
+            result.node_load_in[0, i, 0], data['load1_load_in'])
+        assert numpy.isclose(
+            result.node_load_eff[0, i, 0], data['load1_load_eff'])
+        assert numpy.isclose(result.node_vol_in[0, i], data['volume_in'])
+
+
+def test_compiled_solve_batch(CN):
+    base = CN.node_load
+    loads = numpy.stack([base, 2 * base, 0 * base])
+    result = CN.solve(loads)
+    assert result.n_scenarios == 3
+    numpy.testing.assert_allclose(
+        result.node_load_eff[1], 2 * result.node_load_eff[0])
+    assert (result.node_load_eff[2] == 0).all()
+
+
+def test_load_matrix_from_frames(CN):
+    df = pandas.DataFrame({'load1': [1.0], 'load2': [2.0]}, index=['S1'])
+    loads = CN.load_matrix([df, 2 * df])
+    assert loads.shape == (2, CN.n_nodes, 2)
+    assert loads[1, CN.node_index['S1']].tolist() == [2.0, 4.0]
+    assert loads.sum() == 9.0
+
+    with pytest.raises(ValueError):
+        CN.load_matrix(numpy.zeros((3, 2)))
+
+
+def test_scalar_performance_function():
+    G = SwmmNetwork()
+    G.add_edges_from([
+        ('S1', 'J1', {'id': '^S1', 'volume': 2}),
+        ('J1', 'OF', {'id': 'C1-TR-BR', 'volume': 2}),
+    ])
+    G.add_nodes_from([('S1', {'volume': 2, 'poc': 4})])
+
+    def scalar_only(x):
+        return min(float(x), 1.5)
+
+    CN = G.compile(load_cols='poc',
+                   bmp_performance_mapping_conc={'BR': {'poc': scalar_only}})
+    result = CN.solve()
+    assert result.node_frame().loc['OF', 'poc'] == 3.0
+
+
+def test_compiled_solve_event_volumes(CN):
+    # doubling every volume leaves the concentrations unchanged, so with
+    # linear treatment the loads scale with the volume.
+    edge_volume = numpy.stack([CN.edge_volume, 2 * CN.edge_volume])
+    node_volume = numpy.stack([CN.node_volume, 2 * CN.node_volume])
+    loads = numpy.stack([CN.node_load, 2 * CN.node_load])
+    result = CN.solve(loads, edge_volume=edge_volume, node_volume=node_volume)
+
+    numpy.testing.assert_allclose(
+        result.node_vol_in[1], 2 * result.node_vol_in[0])
+    numpy.testing.assert_allclose(
+        result.node_load_eff[1], 2 * result.node_load_eff[0])
+
+    frame = result.to_frame()
+    assert frame.index.names == ['scenario', 'node']
+    numpy.testing.assert_allclose(
+        result.aggregate().values, 3 * result.node_load_eff[0])
+
+
+def test_compiled_solve_reduced_results(CN):
+    rs = numpy.random.RandomState(2)
+    loads = rs.rand(7, CN.n_nodes, 2)
+    edge_bmp = numpy.tile(CN.edge_bmp, (7, 1))
+    edge_bmp[::2] = -1
+    known = CN.solve(loads, edge_bmp=edge_bmp)
+
+    outfalls = ['OF', 'J5']
+    idx = [CN.node_index[n] for n in outfalls]
+    budget = 2 * CN.scenario_nbytes
+    assert CN.chunk_size(budget) == 2
+
+    result = CN.solve(loads, edge_bmp=edge_bmp, dtype=numpy.float32,
+                      results=['node_load_eff'], result_nodes=outfalls,
+                      memory_budget=budget)
+    assert result.node_load_in is None and result.edge_load_eff is None
+    assert result.node_load_eff.dtype == numpy.float32
+    assert result.node_load_eff.shape == (7, 2, 2)
+    # the loads are solved in float64 and rounded once when stored
+    numpy.testing.assert_allclose(
+        result.node_load_eff, known.node_load_eff[:, idx], rtol=1e-7)
+    assert result.to_frame().index.get_level_values('node')[:2].tolist() == \
+        outfalls
+
+    chunked = CN.solve(loads, edge_bmp=edge_bmp, memory_budget=1)
+    numpy.testing.assert_array_equal(chunked.node_load_eff,
+                                     known.node_load_eff)
+    numpy.testing.assert_array_equal(chunked.edge_load_eff,
+                                     known.edge_load_eff)
+
+    with pytest.raises(ValueError):
+        CN.solve(loads, results=['pct_reduced'])
+
+
+def test_sensitivities_match_finite_differences(SN):
+    mapping = {
+        "BR": {"load1": lambda x: .2 * x, "load2": lambda x: x ** .5},
+        "BF": {"load1": lambda x: .5 * x, "load2": lambda x: .5 * x},
+    }
+    cn = CompiledNetwork.from_graph(
+        SN, load_cols=['load1', 'load2'], bmp_performance_mapping_conc=mapping)
+    j = cn.node_index['OF']
+    sens = cn.sensitivities('OF')['node_load'][0]
+
+    base = cn.solve().node_load_eff[0, j]
+    for node in ['S1', 'S2', 'S3']:
+        i = cn.node_index[node]
+        loads = cn.node_load.copy()
+        h = 1e-6 * max(loads[i].max(), 1)
+        loads[i] += h
+        fd = (cn.solve(loads).node_load_eff[0, j] - base) / h
+        numpy.testing.assert_allclose(sens[i], fd, rtol=1e-4, atol=1e-8)
+
+
+def test_sensitivities_of_linear_network(SN, bmp_mapping):
+    node_sens, bmp_sens = SN.sensitivities(
+        'OF', load_cols=['load1'], bmp_performance_mapping_conc=bmp_mapping)
+    # linear treatment leaves at most all of each subcatchment's load
+    assert ((node_sens.load1 >= 0) & (node_sens.load1 <= 1 + 1e-12)).all()
+    assert node_sens.loc['OF', 'load1'] == 1
+    assert bmp_sens.index.name == 'edge'
+    assert (bmp_sens.load1 >= 0).all()
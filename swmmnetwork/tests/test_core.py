@@ -134,3 +134,82 @@ def test_solve_network(GT_VOL):
         val = G.node[0][k]
         assert swmmnetwork.util.sigfigs(
             val, 5) == swmmnetwork.util.sigfigs(v, 5)
+
+
+def test_solve_network_treatment_diagnostics(GT_VOL):
+    G, exp = GT_VOL
+
+    mapping = {
+        'BR': {'poc1': lambda x: .5 * x},
+        'DD': {'poc2': lambda x: .5 * x},
+    }
+
+    with pytest.warns(UserWarning) as record:
+        for _ in range(3):
+            core.solve_network(G, edge_name_col='name', split_on='-',
+                               vol_col='vol', load_cols=['poc1', 'poc2'],
+                               tmnt_flags=['TR'], vol_reduced_flags=['INF'],
+                               bmp_performance_mapping_conc=mapping)
+
+    # one aggregated warning per solve rather than one per edge and pollutant
+    assert len(record) == 3
+
+    diagnostics = G.graph['treatment_diagnostics']
+    assert diagnostics.to_dict('records') == [
+        {'flag': 'BR', 'pollutant': 'poc2', 'edges': 1},
+        {'flag': 'DD', 'pollutant': 'poc1', 'edges': 1},
+    ]
+
+    # provenance is a compact code that does not grow on repeated solves
+    flags = sorted(d.get('_bmp_tmnt_flag', '') for _, _, d in G.edges(data=True))
+    assert flags == ['', '', '', 'BR', 'DD']
+
+    # the DD edge receives no reduction for poc1
+    dd = [d for _, _, d in G.out_edges(0, data=True) if d['name'] == 'DD-5-TR'][0]
+    assert dd['poc1_conc_eff'] == dd['poc1_conc_in']
+
+
+def test_resolve_treatment_table():
+    table, missing = core.resolve_treatment_table(
+        {'BR': {'poc1': abs}}, ['poc1', 'poc2'])
+    assert table['BR']['poc1'] is abs
+    assert table['BR']['poc2'](5) == 5
+    assert missing == [('BR', 'poc2')]
+
+
+def test_solve_node_ck_vol_col(GT_VOL):
+    G, exp = GT_VOL
+    G.node[0]['ck_vol'] = 1.
+
+    for node in [1, 2, 0]:
+        core.solve_node(G, node, edge_name_col='name', split_on='-',
+                        vol_col='vol', ck_vol_col='ck_vol', load_cols='poc1',
+                        tmnt_flags=['TR'], vol_reduced_flags=['INF'])
+
+    assert G.node[0]['vol_diff_ck'] == G.node[0]['vol_in'] - 1.
+
+
+def test_mass_balance(GT_VOL):
+    G, exp = GT_VOL
+    core.solve_network(G, edge_name_col='name', split_on='-',
+                       vol_col='vol', load_cols='poc1', tmnt_flags=['TR'],
+                       vol_reduced_flags=['INF'])
+    # no check volumes, nothing to compare
+    assert len(G.graph['mass_balance']) == 0
+
+    vol_in = G.node[0]['vol_in']
+    G.node[0]['_ck_volume'] = vol_in * 1.01
+    G.node[1]['_ck_volume'] = G.node[1]['vol_in'] + 1
+
+    with pytest.warns(UserWarning):
+        core.solve_network(G, edge_name_col='name', split_on='-',
+                           vol_col='vol', load_cols='poc1', tmnt_flags=['TR'],
+                           vol_reduced_flags=['INF'])
+
+    table = G.graph['mass_balance']
+    assert table.index.tolist() == [1, 0]
+    assert table['exceeds'].tolist() == [True, False]
+    assert table.loc[1, 'diff'] == -1
+
+    table = core.mass_balance(G, vol_col='vol', atol=0, rtol=0)
+    assert table['exceeds'].all()
@@ -0,0 +1,67 @@
+import networkx as nx
+import pytest
+
+from swmmnetwork import SwmmNetwork
+from swmmnetwork.dag import NetworkDag
+
+
+def _network(links_and_nodes):
+    l, s = links_and_nodes
+    G = SwmmNetwork()
+    G.add_edges_from(l)
+    G.add_nodes_from(s)
+    return G
+
+
+def test_dag_matches_graph(links_and_nodes):
+    G = _network(links_and_nodes)
+    dag = G.dag
+
+    assert dag.n_nodes == G.number_of_nodes()
+    assert dag.n_edges == G.number_of_edges()
+    for node in G.nodes():
+        assert dag.out_edges(node, keys=True) == list(
+            G.out_edges(node, keys=True))
+        assert dag.in_edges(node, keys=True) == list(
+            G.in_edges(node, keys=True))
+        assert dag.successors(node) == list(G.successors(node))
+        assert dag.predecessors(node) == list(G.predecessors(node))
+
+    position = {n: i for i, n in enumerate(dag.topological_sort())}
+    assert all(position[u] < position[v] for u, v in G.edges())
+
+    levels = dag.levels
+    assert all(levels[dag.index[u]] < levels[dag.index[v]]
+               for u, v in G.edges())
+
+
+def test_dag_shares_attributes(links_and_nodes):
+    G = _network(links_and_nodes)
+    dag = G.dag
+
+    dag.out_edges('S1', data=True)[0][2]['volume'] = 99
+    assert G.edges['S1', 'J3', 0]['volume'] == 99
+
+    G.node['S1']['load1'] = 1
+    assert dag.node['S1']['load1'] == 1
+
+
+def test_dag_stays_in_sync(links_and_nodes):
+    G = _network(links_and_nodes)
+    dag = G.dag
+    assert G.dag is dag
+
+    G.add_edge('S4', 'J4', id='^S4', volume=1)
+    assert G.dag is not dag
+    assert G.dag.out_edges('S4') == [('S4', 'J4')]
+
+    G.remove_node('S4')
+    assert 'S4' not in G.dag.index
+
+
+def test_dag_cycle():
+    G = nx.MultiDiGraph()
+    G.add_edges_from([(1, 2), (2, 3), (3, 1)])
+    with pytest.raises(Exception) as err:
+        NetworkDag(G)
+    assert 'cycle' in str(err.value)
@@ -0,0 +1,67 @@
+import numpy
+import pytest
+
+from swmmnetwork.delta import Delta, graph_delta
+
+
+def test_delta_stats():
+    d = Delta(['a', 'b', 'c'], ['x'],
+              [[10.], [0.], [5.]], [[11.], [2.], [5.]])
+    numpy.testing.assert_array_equal(d.diff.ravel(), [1, 2, 0])
+    numpy.testing.assert_array_equal(d.pct_change.ravel(),
+                                     [10, numpy.inf, 0])
+    numpy.testing.assert_array_equal(d.changed(), [True, True, False])
+    numpy.testing.assert_array_equal(
+        d.changed(abs_tol=1.5), [False, True, False])
+    numpy.testing.assert_array_equal(
+        d.changed(pct_tol=20), [False, True, False])
+
+    df = d.to_frame(abs_tol=1.5)
+    assert df.index.tolist() == ['b']
+    assert df.columns.tolist() == [
+        'x_base', 'x_other', 'x_diff', 'x_pct_change']
+
+
+def test_graph_delta(SN, bmp_mapping):
+    other = SN.copy()
+    other.node['S1']['load1'] = 12
+    other.solve_network(load_cols='load1', tmnt_flags=['TR'],
+                        vol_reduced_flags=['INF'],
+                        bmp_performance_mapping_conc=bmp_mapping)
+
+    d = SN.compare(other, columns=['load1_load_in', 'volume_eff'])
+    changed = set(d.to_frame(abs_tol=1e-9).index)
+    # S1 and everything downstream of it
+    assert changed == set(['S1', 'J3', 'BR', 'J2', 'BF', 1, 'OF'])
+    row = d.to_frame().loc['S1']
+    assert row['load1_load_in_diff'] == pytest.approx(6)
+    assert row['load1_load_in_pct_change'] == pytest.approx(100)
+    assert (d.diff[:, 1] == 0).all()
+
+    assert 'load1_load_eff' in graph_delta(SN, other).columns
+    edges = SN.compare(other, kind='edge', columns=['load1_load_eff'])
+    assert len(edges.index) == SN.number_of_edges()
+
+    other.remove_node('S1')
+    with pytest.raises(ValueError):
+        SN.compare(other)
+
+
+def test_batch_delta(SN, bmp_mapping):
+    network = SN.compile(load_cols=['load1'],
+                         bmp_performance_mapping_conc=bmp_mapping)
+    loads = numpy.stack([network.node_load, 2 * network.node_load])
+    result = network.solve(loads)
+    result.scenarios = ['existing', 'proposed']
+
+    d = result.compare('existing', 'proposed',
+                       attrs=['node_load_in', 'node_load_eff'])
+    assert d.columns == ['volume_in', 'load1_load_in', 'load1_load_eff']
+    numpy.testing.assert_allclose(d.diff[:, 1:], d.base[:, 1:])
+    assert (d.diff[:, 0] == 0).all()
+
+    df = d.to_frame(pct_tol=50)
+    numpy.testing.assert_allclose(df['load1_load_eff_pct_change'], 100)
+
+    with pytest.raises(KeyError):
+        result.compare('existing', 'missing')
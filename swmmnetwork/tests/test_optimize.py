@@ -0,0 +1,154 @@
+from itertools import combinations
+
+import numpy
+import pandas
+import pytest
+
+from swmmnetwork.compiled import CompiledNetwork
+from swmmnetwork.optimize import site_bmps
+
+
+@pytest.fixture
+def mapping(bmp_mapping):
+    # a candidate bmp that is not in the network
+    return dict(bmp_mapping, WET={"load1": lambda x: numpy.minimum(x, 0.3)})
+
+
+CANDIDATES = pandas.DataFrame([
+    {'edge': 'C2', 'flag': 'WET', 'cost': 3.0},
+    {'edge': 'C2', 'flag': 'INF', 'cost': 8.0},
+    {'edge': 'C3', 'flag': 'WET', 'cost': 2.0},
+    {'edge': 'C5', 'flag': 'INF', 'cost': 1.0},
+    {'edge': '^S3', 'flag': 'WET', 'cost': 2.0},
+    {'edge': 'C1', 'flag': 'WET', 'cost': 6.0},
+])
+
+
+def _brute_force(G, budget, mapping):
+    """the outfall load removed by every affordable set of candidates,
+    with at most one per edge, solved in one batch of the compiled
+    network.
+    """
+    cn = CompiledNetwork.from_graph(
+        G, load_cols=['load1'], bmp_performance_mapping_conc=mapping)
+    cn.flags = cn.flags + ['WET']
+    cn.treatment_table['WET'] = mapping['WET']
+
+    subsets = []
+    for r in range(len(CANDIDATES) + 1):
+        for rows in combinations(range(len(CANDIDATES)), r):
+            sub = CANDIDATES.loc[list(rows)]
+            if sub.cost.sum() <= budget and not sub.edge.duplicated().any():
+                subsets.append(rows)
+
+    edge_bmp = numpy.tile(cn.edge_bmp, (len(subsets), 1))
+    edge_vol_reduced = numpy.tile(cn.edge_vol_reduced, (len(subsets), 1))
+    for i, rows in enumerate(subsets):
+        for row in rows:
+            edge, flag = CANDIDATES.loc[row, ['edge', 'flag']]
+            pos = cn.edge_ids.index(edge)
+            if flag == 'INF':
+                edge_vol_reduced[i, pos] = True
+            else:
+                edge_bmp[i, pos] = cn.flags.index(flag)
+
+    res = cn.solve(edge_bmp=edge_bmp, edge_vol_reduced=edge_vol_reduced)
+    load = res.node_load_eff[:, cn.node_index['OF'], 0]
+    return load[0], dict(zip(subsets, load[0] - load))
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_site_bmps(SN, processes, mapping):
+    budget = 8.0
+    selected, frontier = site_bmps(
+        SN, CANDIDATES, budget=budget, outfalls=['OF'], load_cols=['load1'],
+        bmp_performance_mapping_conc=mapping, processes=processes)
+
+    assert selected.cost.sum() <= budget
+    assert not selected.edge.duplicated().any()
+    greedy = frontier.loc[frontier.edge.notnull()]
+    assert (numpy.diff(greedy.cost) > 0).all()
+    assert (numpy.diff(frontier.load_removed) > 0).all()
+    assert (selected.load_removed > 0).all()
+
+    base, removed = _brute_force(SN, budget, mapping)
+    best = max(removed.values())
+    assert 0 < best <= base
+    assert frontier.load_removed.iloc[-1] <= best + 1e-9
+
+    # one INF at C2 takes the whole budget and removes more than the
+    # greedy steps, so it is kept and is the optimum of this network
+    chosen = tuple(sorted(selected.index))
+    assert abs(removed[chosen] - best) < 1e-9
+    assert frontier.edge.iloc[-1] is None
+    assert frontier.cost.iloc[-1] == selected.cost.sum()
+    assert abs(frontier.load_removed.iloc[-1] - best) < 1e-9
+
+
+def test_site_bmps_fills_budget_after_swap(SN, mapping):
+    candidates = pandas.DataFrame([
+        {'edge': '^S2', 'flag': 'INF', 'cost': 1.0},
+        {'edge': '^S1', 'flag': 'INF', 'cost': 1.5},
+        {'edge': 'C5', 'flag': 'INF', 'cost': 3.0},
+        {'edge': 'C3', 'flag': 'WET', 'cost': 1.0},
+    ])
+    selected, frontier = site_bmps(
+        SN, candidates, budget=5.0, outfalls=['OF'], load_cols=['load1'],
+        bmp_performance_mapping_conc=mapping, processes=1)
+
+    # the greedy steps pick both INFs at the subcatchments. Swapping ^S1
+    # for C5 removes more and leaves room for the WET at C3.
+    assert frontier.edge.tolist() == [None, '^S2', '^S1', None]
+    assert sorted(selected.index) == [0, 2, 3]
+    assert frontier.cost.iloc[-1] == 5.0
+    assert frontier.load_removed.iloc[-1] > frontier.load_removed.iloc[-2]
+
+
+def test_site_bmps_local_search_not_worse(SN, mapping):
+    kwargs = dict(outfalls=['OF'], load_cols=['load1'],
+                  bmp_performance_mapping_conc=mapping, processes=1)
+    _, frontier = site_bmps(
+        SN, CANDIDATES, budget=8.0, local_search=False, **kwargs)
+    searched, _ = site_bmps(SN, CANDIDATES, budget=8.0, **kwargs)
+    assert searched.cost.sum() <= 8.0
+
+    # re-solve the searched placement on its own to get its total removal
+    _, again = site_bmps(SN, searched.drop('load_removed', axis=1),
+                         budget=searched.cost.sum(), local_search=False,
+                         **kwargs)
+    assert again.step.iloc[-1] == len(searched)
+    assert again.load_removed.iloc[-1] >= frontier.load_removed.iloc[-1] - 1e-9
+
+
+def test_site_bmps_unknown_edge(SN, mapping):
+    with pytest.raises(ValueError):
+        site_bmps(SN, [{'edge': 'nope', 'flag': 'WET', 'cost': 1}],
+                  budget=1, outfalls=['OF'], load_cols=['load1'],
+                  bmp_performance_mapping_conc=mapping)
+
+
+def test_required_removal(SN, mapping):
+    cn = CompiledNetwork.from_graph(
+        SN, load_cols=['load1'], bmp_performance_mapping_conc=mapping)
+    base = cn.solve().node_load_eff[0, cn.node_index['OF'], 0]
+    targets = pandas.DataFrame({'load1': [base / 2, 0.]},
+                               index=['OF', 'INF-OF'])
+
+    # all of the load reaches OF through C1, so half must be removed there
+    res = SN.required_removal(targets, ['C1'], tol=1e-6,
+                              bmp_performance_mapping_conc=mapping)
+    assert res.index.tolist() == ['OF', 'INF-OF']
+    assert abs(res.loc['OF', 'load1'] - 0.5) < 1e-5
+    assert res.loc['INF-OF', 'load1'] == 0
+
+    res = SN.required_removal(targets, ['C1', 'C5'], per_edge=True,
+                              bmp_performance_mapping_conc=mapping)
+    assert res.index.names == ['edge', 'outfall']
+    assert abs(res.loc[('C1', 'OF'), 'load1'] - 0.5) < 1e-3
+    # C5 carries too little of the load to meet the target alone
+    assert numpy.isnan(res.loc[('C5', 'OF'), 'load1'])
+
+    # treating both edges together needs less than C1 alone
+    both = SN.required_removal(targets.loc[['OF']], ['C1', 'C5'],
+                               bmp_performance_mapping_conc=mapping)
+    assert both.loc['OF', 'load1'] < 0.5
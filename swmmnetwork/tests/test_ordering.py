@@ -0,0 +1,95 @@
+import copy
+import random
+import warnings
+
+import networkx as nx
+import pytest
+
+from swmmnetwork import SwmmNetwork
+from swmmnetwork.ordering import IncrementalOrder
+from swmmnetwork.util import NetworkCycleError
+
+
+def _is_sorted(G, order):
+    pos = {n: i for i, n in enumerate(order)}
+    return (set(pos) == set(G.nodes()) and
+            all(pos[u] < pos[v] for u, v in G.edges()))
+
+
+def test_incremental_order_random_edits():
+    rs = random.Random(0)
+    G = nx.MultiDiGraph()
+    order = IncrementalOrder()
+    for _ in range(400):
+        u, v = rs.randrange(40), rs.randrange(40)
+        try:
+            order.add_edge(G, u, v)
+        except NetworkCycleError as err:
+            # the reported cycle closes through the rejected edge
+            assert err.cycle[0] == err.cycle[-1] == u and err.cycle[1] == v
+            assert nx.has_path(G, v, u)
+            continue
+        G.add_edge(u, v)
+        assert _is_sorted(G, order.sorted_nodes(G))
+    assert nx.is_directed_acyclic_graph(G)
+
+
+def test_swmmnetwork_rejects_cycles(SN):
+    n_edges = SN.number_of_edges()
+    with pytest.raises(NetworkCycleError) as err:
+        SN.add_edge('OF', 'S1', id='C99')
+    assert err.value.cycle[:2] == ['OF', 'S1']
+    assert SN.number_of_edges() == n_edges
+
+    SN.add_edge('S1', 'J5', id='C99')
+    assert _is_sorted(SN, SN.topological_sort())
+    assert SN.dag.topological_sort() == SN.topological_sort()
+
+
+def test_swmmnetwork_bulk_edges():
+    G = SwmmNetwork()
+    G.add_edges_from([(3, 4), (1, 2), (2, 3)])
+    assert G.topological_sort() == [1, 2, 3, 4]
+
+    with pytest.raises(NetworkCycleError):
+        G.add_edges_from([(4, 5), (5, 6), (6, 1)])
+    # the edges before the rejected one are kept
+    assert G.has_edge(5, 6) and not G.has_edge(6, 1)
+
+
+def test_swmmnetwork_warns_on_cycle():
+    G = SwmmNetwork(on_cycle='warn')
+    G.add_edges_from([(1, 2), (2, 3)])
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        G.add_edge(3, 1)
+    assert len(w) == 1 and G.has_edge(3, 1)
+    with pytest.raises(NetworkCycleError):
+        G.topological_sort()
+
+    G.remove_edge(3, 1)
+    assert G.topological_sort() == [1, 2, 3]
+
+    # networks built with a cycle fail when they are solved, as before
+    H = SwmmNetwork([(1, 2), (2, 1)])
+    with pytest.raises(NetworkCycleError):
+        H.solve_network()
+
+
+def test_copy_network_with_cycle():
+    G = SwmmNetwork([('a', 'b'), ('b', 'a'), ('b', 'c')])
+
+    for H in [G.copy(), copy.deepcopy(G)]:
+        assert sorted(H.edges()) == sorted(G.edges())
+        # the copy can be fixed
+        H.remove_edge('b', 'a')
+        assert H.topological_sort() == ['a', 'b', 'c']
+
+    # edges added to a copy that has edges are still checked
+    with pytest.raises(NetworkCycleError):
+        H.copy().add_edges_from([('c', 'd'), ('d', 'a')])
+
+    R = G.reverse()
+    assert R.has_edge('c', 'b')
+    R.remove_edge('a', 'b')
+    assert R.topological_sort() == ['c', 'b', 'a']
@@ -0,0 +1,49 @@
+import numpy
+import pytest
+
+from swmmnetwork.parallel import run_scenarios, SharedArrays, shared_memory
+
+
+pytestmark = pytest.mark.skipif(
+    shared_memory is None, reason='requires multiprocessing.shared_memory')
+
+
+def test_shared_arrays_roundtrip():
+    arrays = {'a': numpy.arange(5.0), 'b': numpy.ones((2, 3), dtype=bool)}
+    shared = SharedArrays.from_arrays(arrays)
+    try:
+        attached = SharedArrays(shared.layout, name=shared.name)
+        numpy.testing.assert_array_equal(attached.arrays['a'], arrays['a'])
+        numpy.testing.assert_array_equal(attached.arrays['b'], arrays['b'])
+        attached.close()
+    finally:
+        shared.unlink()
+
+
+@pytest.mark.parametrize('processes', [1, 3])
+def test_run_scenarios(CN, processes):
+    loads = numpy.random.RandomState(0).rand(20, CN.n_nodes, 2)
+    known = CN.solve(loads)
+    result = run_scenarios(CN, loads, processes=processes, chunksize=4,
+                           edge_results=True)
+    numpy.testing.assert_allclose(result.node_load_in, known.node_load_in)
+    numpy.testing.assert_allclose(result.node_load_eff, known.node_load_eff)
+    numpy.testing.assert_allclose(result.edge_load_eff, known.edge_load_eff)
+
+
+def test_run_scenarios_from_graph(SN, CN, bmp_mapping):
+    loads = numpy.random.RandomState(1).rand(4, CN.n_nodes, 2)
+    result = run_scenarios(SN, loads, processes=2,
+                           load_cols=['load1', 'load2'],
+                           bmp_performance_mapping_conc=bmp_mapping)
+    numpy.testing.assert_allclose(
+        result.node_load_eff, CN.solve(loads).node_load_eff)
+
+
+def test_run_scenarios_float32(CN):
+    loads = numpy.random.RandomState(3).rand(6, CN.n_nodes, 2)
+    result = run_scenarios(CN, loads, processes=2, dtype=numpy.float32)
+    assert result.node_load_eff.dtype == numpy.float32
+    assert result.edge_load_eff is None
+    numpy.testing.assert_allclose(
+        result.node_load_eff, CN.solve(loads).node_load_eff, rtol=1e-7)
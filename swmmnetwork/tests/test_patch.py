@@ -0,0 +1,100 @@
+import pandas
+import pytest
+
+from swmmnetwork import SwmmNetwork
+from swmmnetwork.convert import network_to_df
+from swmmnetwork.patch import read_inp_patch
+from swmmnetwork.util import NetworkCycleError
+
+
+KWARGS = dict(
+    load_cols='load1', tmnt_flags=['TR'], vol_reduced_flags=['INF'],
+    bmp_performance_mapping_conc={
+        'BR': {'load1': lambda x: .2 * x},
+        'BI': {'load1': lambda x: .2 * x},
+        'BF': {'load1': lambda x: .5 * x},
+    })
+
+
+def _results(G):
+    df = network_to_df(G, index_col='id')
+    cols = ['volume_in', 'load1_load_in', 'load1_load_eff']
+    return df.loc[df['type'] == 'node', cols].sort_index()
+
+
+def test_apply_patch_matches_rebuild(SN, links_and_nodes):
+    patch = pandas.DataFrame([
+        # rename a conduit to carry a treatment flag
+        {'id': 'C2', 'new_id': 'TR-BI'},
+        # reroute a link
+        {'id': 'C5', 'outlet_node': 'OF'},
+        # a new subcatchment draining to J4
+        {'type': 'node', 'id': 'S4', 'load1': 4.0, 'volume': 5.0},
+        {'id': '^S4', 'inlet_node': 'S4', 'outlet_node': 'J4',
+         'volume': 5.0},
+        {'id': 'C4', 'volume': 5.0},
+    ])
+    G = SN
+    dirty = G.apply_patch(patch)
+    assert dirty == G.dirty_nodes == set(['J2', 'J5', 1, 'S4', 'J4'])
+    assert G.edges['J2', 'BF', 0]['id'] == 'TR-BI'
+
+    G.solve_network(changed=G.dirty_nodes, **KWARGS)
+    assert not G.dirty_nodes
+
+    l, s = links_and_nodes
+    renamed = {'C2': 'TR-BI'}
+    edges = []
+    for u, v, d in l:
+        d = dict(d)
+        d['id'] = renamed.get(d['id'], d['id'])
+        if d['id'] == 'C5':
+            v = 'OF'
+        if d['id'] == 'C4':
+            d['volume'] = 5.0
+        edges.append((u, v, d))
+    edges.append(('S4', 'J4', {'id': '^S4', 'volume': 5.0}))
+    H = SwmmNetwork()
+    H.add_edges_from(edges)
+    H.add_nodes_from(s + [('S4', {'load1': 4.0, 'volume': 5.0})])
+    H.solve_network(**KWARGS)
+
+    pandas.testing.assert_frame_equal(_results(G), _results(H))
+
+
+def test_apply_patch_rolls_back(SN):
+    known = network_to_df(SN, index_col='id')
+    patch = pandas.DataFrame([
+        {'id': 'C1', 'new_id': 'C1-X'},
+        {'type': 'node', 'id': 'J5', 'action': 'remove'},
+        {'id': 'C9', 'inlet_node': 'OF', 'outlet_node': 'S1'},
+    ])
+    with pytest.raises(NetworkCycleError):
+        SN.apply_patch(patch)
+
+    assert not SN.dirty_nodes
+    pandas.testing.assert_frame_equal(
+        network_to_df(SN, index_col='id'), known)
+    assert SN.topological_sort() == SN.dag.topological_sort()
+
+    with pytest.raises(KeyError):
+        SN.apply_patch(pandas.DataFrame([{'id': 'C99', 'action': 'remove'}]))
+
+
+def test_read_inp_patch():
+    fragment = """
+    [SUBCATCHMENTS]
+    ;;Name  Rain Gage  Outlet  Area
+    s4      RG1        j4      5.0
+
+    [CONDUITS]
+    C10     J4         J5      400   0.01  ; a new conduit
+
+    [REPORT]
+    INPUT   YES
+    """
+    patch = read_inp_patch(fragment, rename={'C2': 'C2-TR'}, remove='C7')
+    assert patch['id'].tolist() == ['C2', 'C7', 'S4', '^S4', 'C10']
+    assert patch['action'].tolist()[1] == 'remove'
+    assert patch['outlet_node'].tolist()[3:] == ['J4', 'J5']
+    assert patch['xtype'].tolist()[2:] == ['subcatchment', 'dt', 'conduit']
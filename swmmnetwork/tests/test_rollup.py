@@ -0,0 +1,84 @@
+import numpy
+import pandas
+import pytest
+
+from swmmnetwork.rollup import group_sum, node_groups
+
+
+def test_group_sum():
+    values = numpy.arange(12.).reshape(4, 3)
+    res = group_sum(values, numpy.array([1, -1, 1, 0]), 3)
+    numpy.testing.assert_array_equal(
+        res, [[9, 10, 11], [6, 8, 10], [0, 0, 0]])
+
+
+def test_rollup_by_outfall(SN):
+    groups = node_groups(SN)
+    # BR splits its flow, and drains mostly to OF
+    assert groups['BR'] == groups['S1'] == 'OF'
+    assert groups['INF-OF'] == 'INF-OF'
+
+    res = SN.rollup()
+    assert res.index.tolist() == ['INF-OF', 'OF']
+    for col in ['volume_capture', 'load1_load_reduced', 'load1_load_in']:
+        known = sum([d[col] for n, d in SN.nodes(data=True)
+                     if groups[n] == 'OF'])
+        assert res.loc['OF', col] == pytest.approx(known)
+
+    edges = SN.rollup(kind='edge')
+    assert edges['volume'].sum() == pytest.approx(
+        sum([d['volume'] for _, _, d in SN.edges(data=True)]))
+
+
+def test_rollup_by_attribute(SN):
+    for n in SN:
+        SN.node[n]['xtype'] = 'subcatchment' if str(n)[0] == 'S' else None
+    res = SN.rollup('xtype')
+    assert res.index.tolist() == ['subcatchment']
+    assert res.loc['subcatchment', 'load1_load_in'] == 6 + 8 + 5
+
+    res = SN.rollup({'S1': 'a', 'J3': 'a', 'BR': 'b'})
+    assert res.loc['a', 'volume_in'] == 24
+    assert res.index.name == 'group'
+
+
+def test_batch_rollup(SN, bmp_mapping):
+    network = SN.compile(load_cols=['load1'],
+                         bmp_performance_mapping_conc=bmp_mapping)
+    loads = numpy.stack([network.node_load, 2 * network.node_load])
+    result = network.solve(loads)
+    result.scenarios = ['a', 'b']
+
+    res = result.rollup()
+    known = SN.rollup()
+    pandas.testing.assert_frame_equal(
+        res.loc['a'], known, check_names=False)
+    numpy.testing.assert_allclose(
+        res.loc['b', 'load1_load_eff'], 2 * known['load1_load_eff'])
+
+    res = result.rollup({'S1': 'a', 'J3': 'a', 'BR': 'b'})
+    assert res.loc[('b', 'a'), 'volume_in'] == 24
+
+
+def test_batch_rollup_terminal_volume(SN, bmp_mapping):
+    # an outfall with its own volume passes on only its edge inflow
+    SN.node['OF']['volume'] = 5
+    kwargs = dict(load_cols='load1', tmnt_flags=['TR'],
+                  vol_reduced_flags=['INF'],
+                  bmp_performance_mapping_conc=bmp_mapping)
+    SN.solve_network(**kwargs)
+
+    network = SN.compile(load_cols=['load1'],
+                         bmp_performance_mapping_conc=bmp_mapping)
+    res = network.solve().rollup()
+    pandas.testing.assert_frame_equal(
+        res.loc[0], SN.rollup(), check_names=False)
+
+    # per scenario volume reducing edges, e.g., of siting alternatives
+    no_inf = numpy.zeros((2, network.n_edges), dtype=bool)
+    no_inf[0] = network.edge_vol_reduced
+    res = network.solve(edge_vol_reduced=no_inf).rollup(
+        edge_vol_reduced=no_inf)
+    SN.solve_network(**dict(kwargs, vol_reduced_flags=[]))
+    pandas.testing.assert_frame_equal(
+        res.loc[1], SN.rollup(), check_names=False)
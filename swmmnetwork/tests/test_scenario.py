@@ -11,7 +11,8 @@ import pandas.util.testing as pdtest
 from swmmnetwork import SwmmNetwork
 from swmmnetwork.scenario import Scenario  # , ScenarioLoading,
 from swmmnetwork.util import _upper_case_column
-from swmmnetwork.scenario import load_rpt_link_flows
+from swmmnetwork.scenario import load_rpt_link_flows, read_pollutant_table
+from swmmnetwork.unit_conversions import UnitConverter
 from .utils import data_path
 
 
@@ -51,6 +52,24 @@ def test_load_rpt_link_flow_volumes():
             round(df.volume / c_fac, 4), round(volume_mg, 4))
 
 
+def test_load_rpt_link_flows_keyword():
+    link_test = pd.DataFrame({'pol_lbs': [1.0], 'other_lbs': [2.0]},
+                             index=['a'])
+    uc = UnitConverter()
+    for keyword in ['missing', '_lbs']:
+        with pytest.raises(ValueError):
+            load_rpt_link_flows(link_test, keyword, 1, 'mg/l', 'acre-ft',
+                                unit_converter=uc)
+
+    df = load_rpt_link_flows(link_test, 'pol', 1, 'mg/l', 'acre-ft',
+                             unit_converter=uc)
+    assert df.columns.tolist() == ['volume', 'unit']
+    assert len(uc._factors) == 1
+    load_rpt_link_flows(link_test, 'pol', 2, 'mg/l', 'acre-ft',
+                        unit_converter=uc)
+    assert len(uc._factors) == 1
+
+
 class TestScenario(object):
 
     def setup(self):
@@ -132,3 +151,199 @@ def test_load_equals_concentration():
                   pollutant_value_col='load')
 
     pd.testing.assert_frame_equal(sc.wide_load, sl.wide_load)
+
+
+def test_scenario_is_lazy():
+    inp = data_path('test.inp')
+    rpt = data_path('test.rpt')
+    sub_conc = pd.read_csv(data_path('conc.csv'))
+
+    sc = Scenario(inp, rpt, concentration_df=sub_conc,
+                  pollutant_value_col='concentration')
+    assert sc._wide_load is None
+    assert sc._load is None
+    assert sc._concentration is None
+
+    pocs = sc.pocs
+    assert sc.wide_load.columns.tolist() == ['xtype', 'volume', 'unit_vol'] + pocs
+    assert (sc.wide_load.index == sc.wide_load.index.sort_values()).all()
+
+    sp = Scenario(inp, rpt, concentration_df=sub_conc,
+                  pollutant_value_col='concentration', pocs=pocs[:1])
+    pd.testing.assert_frame_equal(
+        sp.wide_load, sc.wide_load.loc[:, ['xtype', 'volume', 'unit_vol'] + pocs[:1]])
+
+
+def test_scenarios_share_base():
+    from swmmnetwork.scenario import ScenarioBase
+
+    base = ScenarioBase(data_path('test.inp'), data_path('test.rpt'))
+    sub_conc = pd.read_csv(data_path('conc.csv'))
+
+    sc1 = base.scenario(concentration_df=sub_conc,
+                        pollutant_value_col='concentration')
+    sc2 = base.scenario(concentration_df=sub_conc.assign(
+        concentration=lambda df: 2 * df.concentration),
+        pollutant_value_col='concentration')
+
+    assert isinstance(sc1, Scenario)
+    assert sc1.inp is sc2.inp is base.inp
+    assert sc1.edges_df is sc2.edges_df is base.edges_df
+    assert sc1.nodes_df is sc2.nodes_df is base.nodes_df
+
+    known = Scenario(data_path('test.inp'), data_path('test.rpt'),
+                     concentration_df=sub_conc,
+                     pollutant_value_col='concentration')
+    pd.testing.assert_frame_equal(sc1.wide_load, known.wide_load)
+
+    pocs = sc1.pocs
+    pd.testing.assert_frame_equal(
+        sc2.wide_load.loc[:, pocs], 2 * sc1.wide_load.loc[:, pocs])
+
+    # replacing a table affects only the scenario it is assigned to
+    sc2.nodes_df = sc2.nodes_df.assign(volume=lambda df: 2 * df.volume)
+    assert sc1.nodes_df is base.nodes_df
+    assert (sc2.nodes_df.volume == 2 * base.nodes_df.volume).all()
+
+
+def test_scenario_volume_setters():
+    sub_conc = pd.read_csv(data_path('conc.csv'))
+    sc = Scenario(data_path('test.inp'), data_path('test.rpt'),
+                  concentration_df=sub_conc,
+                  pollutant_value_col='concentration')
+    sc.compute_hydrology()
+    known = sc.nodes_df.volume.copy()
+
+    sc.subcatchment_volume = sc.subcatchment_volume.assign(
+        volume=lambda df: 2 * df.volume)
+    subs = sc.subcatchment_volume.index
+    assert (sc.nodes_df.loc[subs, 'volume'] == 2 * known.loc[subs]).all()
+    dt = sc.edges_df.query('xtype == "dt"')
+    assert (dt.volume.values ==
+            sc.nodes_df.loc[dt.inlet_node, 'volume'].values).all()
+
+    sc.node_inflow_volume = sc.node_inflow_volume.assign(volume=0.)
+    nodes = sc.node_inflow_volume.index
+    assert (sc.nodes_df.loc[nodes, 'volume'] == 0).all()
+
+
+def test_multi_event_scenario():
+    from swmmnetwork.scenario import MultiEventScenario
+
+    inp = data_path('test.inp')
+    rpt = data_path('test.rpt')
+    sub_conc = pd.read_csv(data_path('conc.csv'))
+
+    me = MultiEventScenario(inp, [rpt, rpt], events=['a', 'b'],
+                            concentration_df=sub_conc,
+                            pollutant_value_col='concentration',
+                            processes=2)
+
+    assert me.edge_volumes.index.tolist() == ['a', 'b']
+    pdtest.assert_frame_equal(me.node_volumes.loc[['a']],
+                              me.node_volumes.loc[['b']].rename({'b': 'a'}))
+
+    result = me.solve()
+    frame = result.to_frame()
+    pdtest.assert_frame_equal(frame.loc['a'], frame.loc['b'])
+    pdtest.assert_frame_equal(result.aggregate(), 2 * frame.loc['a'])
+
+    sc = Scenario(inp, rpt, concentration_df=sub_conc,
+                  pollutant_value_col='concentration')
+    G = SwmmNetwork(scenario=sc)
+    G.solve_network(load_cols=sc.pocs)
+    for node in frame.loc['a'].index:
+        for poc in sc.pocs:
+            assert abs(frame.loc[('a', node), poc] -
+                       G.node[node][poc + '_load_eff']) < 1e-6
+
+    with pytest.raises(ValueError) as err:
+        me.solve(load_cols=sc.pocs + ['nope'])
+    assert 'nope' in str(err.value)
+
+
+def test_read_pollutant_table(tmpdir):
+    df = pd.DataFrame({
+        'subcatchment': ['a', 'A', 'b', 'a', 'b', 'b'],
+        'landuse': ['res', 'com', 'res', 'res', 'res', 'com'],
+        'pollutant': ['TSS', 'TSS', 'TSS', 'TP', 'TP', 'TP'],
+        'value': [1., 2., 3., 4., 5., 7.],
+        'area': [1., 3., 1., 1., 1., 3.],
+        'unit': ['lbs'] * 6,
+    })
+    path = str(tmpdir.join('table.csv'))
+    df.to_csv(path, index=False)
+
+    loads = read_pollutant_table(path, 'value', chunksize=2)
+    assert loads.columns.tolist() == [
+        'subcatchment', 'pollutant', 'value', 'unit']
+    loads = loads.set_index(['subcatchment', 'pollutant'])['value']
+    assert loads.to_dict() == {
+        ('A', 'TSS'): 3., ('B', 'TSS'): 3., ('A', 'TP'): 4., ('B', 'TP'): 12.}
+
+    chunks = (df.iloc[i:i + 4] for i in range(0, len(df), 4))
+    conc = read_pollutant_table(chunks, 'value', how='mean',
+                                weight_col='area', pocs=['TP'])
+    conc = conc.set_index(['subcatchment', 'pollutant'])['value']
+    assert conc.to_dict() == {('A', 'TP'): 4., ('B', 'TP'): 6.5}
+
+    empty = read_pollutant_table([df.iloc[:0]], 'value')
+    assert empty.columns.tolist() == [
+        'subcatchment', 'pollutant', 'value', 'unit']
+
+
+def test_read_pollutant_table_missing_keys():
+    df = pd.DataFrame({
+        'subcatchment': ['a', 'a', 'a', 'b'],
+        'pollutant': ['TSS', 'TSS', 'TSS', None],
+        'value': [1., 2., 3., 4.],
+        'unit': ['lbs', None, 'lbs', 'lbs'],
+    })
+    chunks = [df.iloc[:2], df.iloc[2:]]
+    loads = read_pollutant_table(chunks, 'value')
+    assert loads['value'].sum() == df['value'].sum()
+    assert loads['value'].tolist() == [4., 2., 4.]
+    assert loads['unit'].isnull().tolist() == [False, True, False]
+    assert loads['pollutant'].isnull().tolist() == [False, False, True]
+
+    sc = Scenario(load_df=df, pollutant_value_col='value')
+    assert sc.raw_load_df['value'].sum() == df['value'].sum()
+
+
+def test_scenario_aggregates_every_source():
+    df = pd.DataFrame({
+        'subcatchment': ['a', 'A', 'b', 'b'],
+        'pollutant': ['TSS'] * 4,
+        'conc': [1., 2., 3., 7.],
+        'area': [1., 3., 1., 3.],
+        'unit': ['mg/l'] * 4,
+    })
+    chunks = (df.iloc[i:i + 3] for i in range(0, len(df), 3))
+    tables = [
+        Scenario(concentration_df=source, pollutant_value_col='conc',
+                 pollutant_weight_col='area').raw_concentration_df
+        for source in [df, chunks]
+    ]
+    pd.testing.assert_frame_equal(tables[0], tables[1])
+    conc = tables[0].set_index('subcatchment')['conc']
+    assert conc.to_dict() == {'A': 1.75, 'B': 6.}
+
+    sc = Scenario(concentration_df=df, pollutant_value_col='conc',
+                  pollutant_how='sum')
+    assert sc.raw_concentration_df['conc'].tolist() == [3., 10.]
+
+
+def test_scenario_streams_table():
+    inp = data_path('test.inp')
+    rpt = data_path('test.rpt')
+    sub_conc_path = data_path('conc.csv')
+    sub_conc = pd.read_csv(sub_conc_path)
+
+    sc = Scenario(inp, rpt, concentration_df=sub_conc,
+                  pollutant_value_col='concentration')
+
+    chunks = (sub_conc.iloc[i:i + 3] for i in range(0, len(sub_conc), 3))
+    for source in [sub_conc_path, chunks]:
+        ss = Scenario(inp, rpt, concentration_df=source,
+                      pollutant_value_col='concentration')
+        pd.testing.assert_frame_equal(sc.wide_load, ss.wide_load)
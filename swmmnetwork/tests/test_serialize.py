@@ -0,0 +1,81 @@
+import copy
+import pickle
+
+import pandas
+import pytest
+
+from swmmnetwork import SwmmNetwork
+from swmmnetwork import serialize
+
+
+def _assert_same(G1, G2):
+    assert list(G1.nodes(data=True)) == list(G2.nodes(data=True))
+    assert (list(G1.edges(keys=True, data=True)) ==
+            list(G2.edges(keys=True, data=True)))
+    assert sorted(G1.graph) == sorted(G2.graph)
+
+
+def test_dumps_roundtrip(SN):
+    SN.node['S1']['tags'] = ['a', 'b']
+    SN.node['S2']['note'] = None
+
+    G = serialize.loads(serialize.dumps(SN))
+    assert isinstance(G, SwmmNetwork)
+    _assert_same(SN, G)
+    pandas.testing.assert_frame_equal(
+        G.treatment_diagnostics, SN.treatment_diagnostics)
+    assert G.node[1] is not None  # integer node names keep their type
+    assert G.node['S1']['tags'] == ['a', 'b']
+    assert G.node['S2']['note'] is None
+
+
+def test_pickle(SN):
+    G = pickle.loads(pickle.dumps(SN))
+    assert type(G) is SwmmNetwork
+    _assert_same(SN, G)
+
+    # derived structures are rebuilt for the copy
+    assert G.reachability.is_upstream('S1', 'OF')
+    _assert_same(SN, copy.deepcopy(SN))
+
+
+def test_copy_keeps_scenario_and_types(SN):
+    SN.scenario = 'a scenario'
+    SN.node['S1']['count'] = 2**60 + 1
+    SN.node['S2']['count'] = 1.5
+    SN.dirty_nodes.add('S1')
+
+    G = copy.deepcopy(SN)
+    assert G.scenario == 'a scenario'
+    _assert_same(SN, G)
+    G.node['S1']['count'] = 0
+    assert SN.node['S1']['count'] == 2**60 + 1
+
+    assert copy.copy(SN).scenario == 'a scenario'
+
+    G = pickle.loads(pickle.dumps(SN))
+    assert not hasattr(G, 'scenario')
+    assert G.node['S1']['count'] == 2**60 + 1
+    assert type(G.node['S1']['count']) is int
+    assert G.node['S2']['count'] == 1.5
+    assert G.dirty_nodes == set(['S1'])
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_load(tmpdir, SN, mmap):
+    path = str(tmpdir.join('network.swmmnet'))
+    SN.save(path)
+
+    G = SwmmNetwork.load(path, mmap=mmap)
+    _assert_same(SN, G)
+
+    arrays = serialize.load_arrays(path, mmap=mmap)
+    assert arrays['edges/src'].shape == (SN.number_of_edges(), )
+
+
+def test_load_invalid(tmpdir):
+    path = str(tmpdir.join('bad'))
+    with open(path, 'wb') as f:
+        f.write(b'not a network')
+    with pytest.raises(ValueError):
+        serialize.load(path, mmap=False)
@@ -0,0 +1,105 @@
+import socket
+import threading
+
+import numpy
+import pytest
+
+from swmmnetwork.compiled import CompiledNetwork
+from swmmnetwork.server import SolveModel, ModelStore, make_server, request
+
+
+@pytest.fixture
+def mapping(bmp_mapping):
+    return dict(bmp_mapping, WET={"load1": lambda x: .1 * x})
+
+
+@pytest.fixture
+def model(SN, mapping):
+    cn = CompiledNetwork.from_graph(
+        SN, load_cols=['load1'], bmp_performance_mapping_conc=mapping)
+    return SolveModel(cn, bmp_performance_mapping_conc=mapping)
+
+
+def test_solve_model_deltas(SN, model, mapping):
+    base = model.solve(nodes=['OF'])['OF']['load1']
+    assert numpy.isclose(base, SN.node['OF']['load1_load_eff'])
+
+    # deltas apply to one request only
+    more = model.solve(loads={'S1': {'load1': 12}}, nodes=['OF'])
+    assert more['OF']['load1'] > base
+    assert model.solve(nodes=['OF'])['OF']['load1'] == base
+
+    G = SN.copy()
+    G.node['S1']['load1'] = 12
+    for _, _, d in G.edges(data=True):
+        if d['id'] == 'C3':
+            d['id'] = 'C3-TR-WET'
+    G.solve_network(load_cols=['load1'], bmp_performance_mapping_conc=mapping)
+    res = model.solve(loads={'S1': {'load1': 12}}, bmps={'C3': 'WET'})
+    assert numpy.isclose(res['OF']['load1'], G.node['OF']['load1_load_eff'])
+
+    inf = model.solve(bmps={'C1': 'INF'}, nodes=['OF'])
+    assert inf['OF']['load1'] == 0
+
+    with pytest.raises(ValueError):
+        model.solve(bmps={'C3': 'NOPE'})
+
+
+def test_model_store_lru():
+    loaded = []
+
+    def loader(name):
+        loaded.append(name)
+        return name.upper()
+
+    store = ModelStore(loader, max_models=2)
+    assert [store.get(n) for n in 'aba'] == ['A', 'B', 'A']
+    store.get('c')  # evicts b
+    store.get('a')
+    store.get('b')
+    assert loaded == ['a', 'b', 'c', 'b']
+    assert list(store.models) == ['a', 'b']
+
+
+def test_model_store_failed_load():
+    calls = []
+
+    def loader(name):
+        calls.append(name)
+        if len(calls) == 1:
+            raise IOError('busy')
+        return name.upper()
+
+    store = ModelStore(loader)
+    with pytest.raises(IOError):
+        store.get('a')
+    assert store._loading == {}
+    assert store.get('a') == 'A'
+
+
+def test_server_roundtrip(model):
+    store = ModelStore(lambda name: model)
+    server = make_server(store, ('127.0.0.1', 0))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        address = server.server_address
+        res = request(address, 'm', bmps={'C1': 'INF'}, nodes=['OF'])
+        assert res == {'ok': True, 'results': {'OF': {'load1': 0.0}}}
+
+        res = request(address, 'm', loads={'nope': {'load1': 1}})
+        assert not res['ok'] and 'nope' in res['error']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_request_timeout():
+    # a server that accepts the connection but never responds
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    with listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        with pytest.raises(socket.timeout):
+            request(listener.getsockname(), 'm', timeout=0.1)
@@ -0,0 +1,75 @@
+import numpy
+import pytest
+
+from swmmnetwork.spatial import GridIndex
+
+
+@pytest.fixture
+def points():
+    rs = numpy.random.RandomState(0)
+    xy = rs.rand(500, 2) * [1000, 300]
+    # a dense cluster and an outlier
+    xy[:50] = rs.rand(50, 2) * 5
+    xy[50] = [5000, 5000]
+    return xy
+
+
+def test_grid_index_nearest(points):
+    index = GridIndex(['n{}'.format(i) for i in range(len(points))], points)
+    q = numpy.array([[-100, -100], [500, 150], [2.5, 2.5], [6000, 10]])
+    names, dist = index.nearest(q[:, 0], q[:, 1], k=3)
+
+    all_dist = numpy.hypot(points[:, 0] - q[:, 0, numpy.newaxis],
+                           points[:, 1] - q[:, 1, numpy.newaxis])
+    known = numpy.argsort(all_dist, axis=1)[:, :3]
+    numpy.testing.assert_allclose(
+        dist, numpy.take_along_axis(all_dist, known, axis=1))
+    assert names.shape == (4, 3)
+    assert names[0, 0] == 'n{}'.format(known[0, 0])
+
+
+def test_grid_index_nearest_many(points):
+    index = GridIndex(list(range(len(points))), points)
+    rs = numpy.random.RandomState(1)
+    q = rs.rand(2000, 2) * [1200, 400] - 100
+    idx, dist = index.nearest_index(q[:, 0], q[:, 1], k=4)
+
+    all_dist = numpy.hypot(points[:, 0] - q[:, 0, numpy.newaxis],
+                           points[:, 1] - q[:, 1, numpy.newaxis])
+    numpy.testing.assert_allclose(
+        dist, numpy.sort(all_dist, axis=1)[:, :4])
+    numpy.testing.assert_allclose(
+        numpy.hypot(*(index.xy[idx] - q[:, numpy.newaxis]).T).T, dist)
+
+    # the candidates are sorted in blocks of queries
+    index.MERGE_CELLS = 16
+    blocked = index.nearest_index(q[:, 0], q[:, 1], k=4)
+    numpy.testing.assert_array_equal(blocked[0], idx)
+    numpy.testing.assert_array_equal(blocked[1], dist)
+
+
+def test_grid_index_box(points):
+    index = GridIndex(list(range(len(points))), points)
+    res = index.box(100, 50, 400, 120)
+    x, y = points.T
+    known = numpy.flatnonzero((x >= 100) & (x <= 400) & (y >= 50) & (y <= 120))
+    assert sorted(res) == known.tolist()
+    assert index.box(-10, -10, 6000, 6000) == index.names.tolist()
+    assert index.box(2000, 2000, 3000, 3000) == []
+
+
+def test_grid_index_empty():
+    index = GridIndex([], numpy.zeros((0, 2)))
+    names, dist = index.nearest(0, 0)
+    assert names.shape == (1, 0)
+    assert index.box(0, 0, 1, 1) == []
+
+
+def test_swmmnetwork_nearest_nodes(SN):
+    SN.positions = {n: [i, 0] for i, n in enumerate(SN.topological_sort())}
+    names, dist = SN.nearest_nodes(2.2, 0.5)
+    assert names[0, 0] == SN.topological_sort()[2]
+    assert set(SN.nodes_in_box(0, -1, 1, 1)) == set(SN.topological_sort()[:2])
+
+    SN.remove_node(SN.topological_sort()[0])
+    assert len(SN.spatial_index) == SN.number_of_nodes()
@@ -1,5 +1,4 @@
 import pandas
-import pytest
 import networkx as nx
 
 from swmmnetwork import SwmmNetwork
@@ -9,84 +8,6 @@ from swmmnetwork.convert import network_to_df
 from .utils import data_path
 
 
-@pytest.fixture
-def links_and_nodes():
-    """
-                    J4     S1
-                   / \    /
-                  /   \  /
-          S3     /     J3   S2
-           \    /       |  /
-            \  /        | /
-             J6         BR
-             |         // \
-             |        //   \
-            ~BI      J2    INF
-             |       |
-             |       |
-             J5     BF
-              \    //
-               \  //
-                J1
-                |
-                |
-                OF
-    """
-    s = [
-        ('S1', {"load1": 6, "load2": 10, "volume": 12}),
-        ('S2', {"load1": 8, "load2": 10, "volume": 13}),
-        ('S3', {"load1": 5, "load2": 10, "volume": 10}),
-    ]
-
-    l = [
-        ('S1', 'J3', {'id': "^S1", "volume": 12}),
-        ('S2', 'BR', {'id': "^S2", "volume": 13}),
-        ('J3', 'BR', {'id': "C3", "volume": 12}),
-        ('BR', 'J2', {'id': "w2", "volume": 2}),
-        ('BR', 'J2', {'id': "TR-BR", "volume": 13}),
-        ('BR', 'INF-OF', {'id': "INF-1", "volume": 10}),
-        ('J2', 'BF', {'id': "C2", "volume": 15}),
-        ('BF', 1, {'id': "w1", "volume": 2}),
-        ('BF', 1, {'id': "TR-BF", "volume": 13}),
-        (1, 'OF', {'id': "C1", "volume": 16.8}),
-        ('J4', 'J3', {'id': "C4", "volume": 0}),
-        ('J4', 'J6', {'id': "C7", "volume": 0}),
-        ('S3', 'J6', {'id': "^S3", "volume": 10}),
-        ('J6', 'BI', {'id': 2, "volume": 10}),
-        ('BI', 'J5', {'id': "w3", "volume": 1.8}),
-        ('J5', 1, {'id': "C5", "volume": 1.8}),
-    ]
-    return l, s
-
-
-@pytest.fixture
-def SN(links_and_nodes):
-    bmp_performance_mapping_conc = {
-        "BR": {
-            "load1": lambda x: .2 * x  # 80% reduced
-        },
-        "BI": {
-            "load1": lambda x: .2 * x  # 80% reduced
-        },
-        "BF": {
-            "load1": lambda x: .5 * x  # 50% reduced
-        },
-    }
-
-    l, s = links_and_nodes
-
-    G = SwmmNetwork()
-    G.add_edges_from(l)
-    G.add_nodes_from(s)
-    G.solve_network(
-        load_cols='load1',
-        tmnt_flags=['TR'],
-        vol_reduced_flags=['INF'],
-        bmp_performance_mapping_conc=bmp_performance_mapping_conc)
-
-    return G
-
-
 def test_SwmmNetwork_no_mutation(SN, links_and_nodes):
     G = SN
     l, s = links_and_nodes
@@ -123,3 +44,46 @@ def test_SwmmNetwork_constructors():
     G = SwmmNetwork()
     G.add_edges_from_swmm_inp(inp_path)
     assert len(G) > 0
+
+
+def test_SwmmNetwork_reachability(SN):
+    G = SN
+    for node in G.nodes():
+        assert G.upstream(node) == nx.ancestors(G, node)
+        assert G.downstream(node) == nx.descendants(G, node)
+
+    assert G.reachability.is_upstream('S1', 'OF')
+    assert not G.reachability.is_upstream('OF', 'S1')
+    assert G.reachability.is_downstream(1, 'S3')
+    assert not G.reachability.is_upstream('S3', 'INF-OF')
+
+    bmps = G.downstream_edges('S2', flags='TR')
+    assert sorted(d['id'] for _, _, d in bmps) == ['TR-BF', 'TR-BR']
+
+    # the index is rebuilt after the structure changes
+    index = G.reachability
+    G.add_edge('S4', 'J4', id='^S4', volume=0)
+    assert G.reachability is not index
+    assert 'S4' in G.upstream('OF')
+
+
+def test_SwmmNetwork_targeted_and_incremental_solve(SN):
+    G = SN
+    known = G.to_dataframe(index_col='id')
+    kwargs = dict(load_cols='load1', tmnt_flags=['TR'], vol_reduced_flags=['INF'],
+                  bmp_performance_mapping_conc={'BR': {'load1': lambda x: .2 * x},
+                                                'BF': {'load1': lambda x: .5 * x}})
+
+    G.node['S3']['load1'] = 10
+    G.solve_network(changed=['S3'], **kwargs)
+
+    # nodes that S3 does not drain to are untouched
+    assert G.node['BR']['load1_load_in'] == known.loc['BR', 'load1_load_in']
+    assert G.node['J6']['load1_load_in'] == 10
+    assert G.node['OF']['load1_load_in'] > known.loc['OF', 'load1_load_in']
+
+    G.node['S1']['load1'] = 0
+    G.solve_network(targets=['J3'], **kwargs)
+    assert G.node['J3']['load1_load_in'] == 0
+    # OF is downstream of the target, so it is not solved
+    assert G.node['OF']['load1_load_in'] > known.loc['OF', 'load1_load_in']
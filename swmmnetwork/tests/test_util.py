@@ -1,4 +1,5 @@
 import numpy
+import pandas
 import pytest
 import networkx as nx
 
@@ -91,3 +92,56 @@ def test_validate(G, exp):
 ])
 def test_sigfigs(x, n, exp):
     numpy.testing.assert_array_equal(util.sigfigs(x, n), exp)
+
+
+@pytest.mark.parametrize(('x', 'n', 'exp'), [
+    (numpy.array([0.0, numpy.nan, numpy.inf, -numpy.inf, -6.62]), 2,
+     numpy.array([0.0, numpy.nan, numpy.inf, -numpy.inf, -6.6])),
+    (numpy.array([[151354845, 6.999111], [.0000000012, 0.33333]]), 1,
+     numpy.array([[200000000, 7.0], [.000000001, 0.3]])),
+    (numpy.array([151354845, 12]), 2, numpy.array([150000000, 12])),
+])
+def test_sigfigs_array(x, n, exp):
+    numpy.testing.assert_array_equal(util.sigfigs(x, n), exp)
+
+
+def test_sigfigs_matches_scalar():
+    x = numpy.random.RandomState(0).lognormal(0, 8, size=1000)
+    x[::7] *= -1
+    exp = numpy.array([util.sigfigs(float(i), 3) for i in x])
+    numpy.testing.assert_array_equal(util.sigfigs(x, 3), exp)
+
+
+def test_sigfigs_dataframe():
+    df = pandas.DataFrame({
+        'name': ['a', 'b'],
+        'value': [6.62, 55001.52],
+        'count': [12345, 6],
+    })
+    res = util.sigfigs(df, 2)
+    assert res.columns.tolist() == df.columns.tolist()
+    assert res['value'].tolist() == [6.6, 55000]
+    assert res['count'].tolist() == [12000, 6]
+    assert res['name'].tolist() == ['a', 'b']
+    assert df['value'].tolist() == [6.62, 55001.52]
+
+    assert res.dtypes.tolist() == df.dtypes.tolist()
+
+    assert util.sigfigs(df, 2, inplace=True) is None
+    assert df['value'].tolist() == [6.6, 55000]
+    assert df['count'].tolist() == [12000, 6]
+
+
+def test_sigfigs_dataframe_dtypes():
+    df = pandas.DataFrame({
+        'single': numpy.array([1.2345, 2.5], dtype=numpy.float32),
+        'double': [1.2345, 2.5],
+        'count': numpy.array([12345, 6], dtype=numpy.int32),
+        'flag': [True, False],
+    })
+    res = util.sigfigs(df, 2)
+    assert res.dtypes.tolist() == df.dtypes.tolist()
+    assert res['count'].tolist() == [12000, 6]
+
+    util.sigfigs(df, 2, inplace=True)
+    pandas.testing.assert_frame_equal(df, res)
@@ -26,6 +26,7 @@ class UnitConverter(object):
 
         self.ureg = pint.UnitRegistry()
         self._pint_alias = None
+        self._factors = {}
 
     @property
     def pint_alias(self):
@@ -37,3 +38,15 @@ class UnitConverter(object):
     def pint_alias(self, dct):
         self._pint_alias = dct.copy()
         return self._pint_alias
+
+    def factor(self, from_unit, to_unit):
+        """the multiplier that converts values in `from_unit` to `to_unit`.
+
+        Units may be pint expressions, e.g., 'lbs / (mg/l)'. Each factor is
+        computed by pint once and cached.
+        """
+        key = (from_unit, to_unit)
+        if key not in self._factors:
+            self._factors[key] = (
+                (1 * self.ureg(from_unit)).to(to_unit).m)
+        return self._factors[key]
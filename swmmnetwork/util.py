@@ -7,6 +7,24 @@ import networkx as nx
 import hymo
 
 
+class NetworkCycleError(Exception):
+    """Raised when the network contains, or an edge would create, a cycle.
+
+    Attributes
+    ----------
+    cycle : list
+        the nodes of one cycle, starting and ending with the same node,
+        if known.
+    """
+
+    def __init__(self, cycle=None, msg=None):
+        self.cycle = cycle
+        if msg is None:
+            msg = 'The edge {!r} closes the network cycle: {}'.format(
+                tuple(cycle[:2]), cycle)
+        Exception.__init__(self, msg)
+
+
 def find_cycle(G, **kwargs):
     """Wraps networkx.find_cycle to return empty list
     if no cycle is found.
@@ -34,7 +52,10 @@ def validate_swmmnetwork(G):
             '\nLink Cycles [(from, to)]: {}'.format(
                 simplecycles, findcycles)
         )
-        raise Exception(e)
+        cycle = None
+        if simplecycles:
+            cycle = simplecycles[0] + simplecycles[0][:1]
+        raise NetworkCycleError(cycle, e)
 
     return
 
@@ -112,7 +133,59 @@ def _to_list(val):
     return val
 
 
-def sigfigs(x, n=None):
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and numpy.isnan(value))
+
+
+def _round_sigfigs(x, n):
+    """round every element of a numeric array to `n` significant figures.
+
+    This mirrors `numpy.around` (scale by a power of ten, round half to
+    even, and unscale) with the number of decimals computed per element,
+    so that the whole array is rounded in a few vectorized operations.
+    Zeros, NaN and inf are returned unchanged.
+    """
+    x = numpy.asarray(x)
+    values = x.astype(float)
+
+    with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        mag = numpy.floor(numpy.log10(numpy.abs(values)))
+        mag[~numpy.isfinite(mag)] = 0
+        rnd = n - mag - 1
+
+        scale = 10.0 ** numpy.abs(rnd)
+        pos = rnd >= 0
+        res = numpy.where(
+            pos,
+            numpy.rint(values * scale) / scale,
+            numpy.rint(values / scale) * scale,
+        )
+
+    # extremely small or large values can overflow the scale factor.
+    bad = ~numpy.isfinite(res) & numpy.isfinite(values)
+    res[bad] = values[bad]
+
+    if numpy.issubdtype(x.dtype, numpy.integer):
+        return res.astype(x.dtype)
+    return res
+
+
+def sigfigs(x, n=None, inplace=False):
+    """round numbers to `n` significant figures.
+
+    Parameters
+    ----------
+    x : number, list, numpy.ndarray, pandas.Series or pandas.DataFrame
+    n : int, optional (default=None)
+        number of significant figures. If None, `x` is returned unchanged.
+    inplace : bool, optional (default=False)
+        for DataFrames, write the rounded values into `x` and return None.
+        Only numeric columns are touched.
+
+    Returns
+    -------
+    rounded object of the same type as `x`, or None if `inplace`
+    """
     if n is None:
         return x
     if isinstance(x, (int, float, numpy.number)):
@@ -121,18 +194,31 @@ def sigfigs(x, n=None):
     if isinstance(x, list):
         return [sigfigs(i, n) for i in x]
     if isinstance(x, numpy.ndarray):
-        tmp = numpy.floor(numpy.log10(numpy.abs(x), where=(x != 0)))
-        tmp[~numpy.isfinite(tmp)] = 0
-        rnd = n - tmp - 1
-        return numpy.array(list(map(numpy.around, x, rnd.astype(int))))
+        return _round_sigfigs(x, n)
     if isinstance(x, pandas.Series):
         return pandas.Series(data=sigfigs(x.values, n), index=x.index, name=x.name)
     if isinstance(x, pandas.DataFrame):
-        out = []
-        nums = x.select_dtypes(include=numpy.number).copy()
-        others = x.select_dtypes(exclude=numpy.number).copy()
-        for c in nums:
-            out.append(sigfigs(nums[c], n))
-        out.append(others)
-        df = pandas.concat(out, axis=1)
-        return df.reindex(x.columns, axis=1)
+        # round the numeric columns of each dtype as one block, so that
+        # integer columns are not upcast to floats.
+        blocks = {}
+        for i, dtype in enumerate(x.dtypes):
+            if dtype.kind in 'iuf':
+                blocks.setdefault(dtype, []).append(i)
+
+        rounded = {}
+        for dtype, pos in blocks.items():
+            values = _round_sigfigs(x.iloc[:, pos].values, n).astype(
+                dtype, copy=False)
+            rounded.update(zip(pos, values.T))
+        if inplace:
+            for i, values in rounded.items():
+                x.iloc[:, i] = values
+            return None
+
+        # the other columns are passed through without a copy
+        columns = [rounded[i] if i in rounded else x.iloc[:, i]
+                   for i in range(x.shape[1])]
+        df = pandas.DataFrame(dict(enumerate(columns)), index=x.index,
+                              copy=False)
+        df.columns = x.columns
+        return df